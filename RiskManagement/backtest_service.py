@@ -0,0 +1,123 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from backtrader_complex import backtest
+from result_cache import ResultCache, cache_key
+from tinkoff_data import TinkoffDataClient
+
+
+def summarize(results_df: pd.DataFrame, capital: float) -> Dict[str, Any]:
+    """
+    Headline figures of a backtest
+
+    Args:
+        results_df: Frame returned by backtrader_complex.backtest
+        capital: Starting balance
+
+    Returns:
+        initial_balance, final_balance, profit_loss, profit_percent, trade_count
+        and win_rate, empty when the backtest had no bars
+    """
+    if results_df.empty:
+        return {}
+
+    final_balance = float(results_df["Balance"].iloc[-1])
+    trade_count = int(results_df["Entry"].count()) if "Entry" in results_df else 0
+    wins = int((results_df["Profit/Loss"] > 0).sum()) if "Profit/Loss" in results_df else 0
+    return {
+        "initial_balance": capital,
+        "final_balance": final_balance,
+        "profit_loss": final_balance - capital,
+        "profit_percent": (final_balance - capital) / capital * 100,
+        "trade_count": trade_count,
+        "win_rate": wins / trade_count * 100 if trade_count > 0 else 0,
+    }
+
+
+def balance_curve(results_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Date and Balance per bar, timezone-aware dates as '%Y-%m-%d %H:%M:%S' strings"""
+    curve = results_df[["Date", "Balance"]].copy()
+    if getattr(curve["Date"].dtype, "tz", None) is not None:
+        curve["Date"] = curve["Date"].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return curve.to_dict(orient="records")
+
+
+def cached_result(config: Dict[str, Any], client: TinkoffDataClient, cache: ResultCache) -> Optional[Dict[str, Any]]:
+    """
+    Result of an identical earlier backtest, without downloading anything
+
+    Returns:
+        The cached result, or None when it is not cached or the candles
+        of the configured range are not all in the candle store yet
+    """
+    data = client.get_stored_data(
+        ticker=config["TICKER"],
+        interval=config["INTERVAL"],
+        from_date=config["START_DATE"],
+        to_date=config["END_DATE"],
+        download=False
+    )
+    if data is None or data.empty:
+        return None
+    return cache.get(cache_key(config, data))
+
+
+def run_backtest(
+    config: Dict[str, Any],
+    data: Optional[pd.DataFrame] = None,
+    client: Optional[TinkoffDataClient] = None,
+    progress: Optional[Callable[[float], None]] = None,
+    cache: Optional[ResultCache] = None
+) -> Dict[str, Any]:
+    """
+    Backtest one strategy configuration
+
+    Everything the run needs comes in through the arguments, so concurrent
+    calls in one process are independent: no module globals are changed
+    and nothing is written besides the candle store of `client` and `cache`.
+
+    Args:
+        config: Ticker configuration as for backtrader_complex.backtest.
+                TICKER, EXCHANGE, INTERVAL, START_DATE and END_DATE select
+                the candles when `data` is not given.
+        data: Market data to run on instead of loading it
+        client: Client that loads the candles, a new TinkoffDataClient by default
+        progress: Called with the finished fraction of the work
+        cache: Results of earlier runs; a run on the same candles with the
+               same configuration is returned from it instead of repeated
+
+    Returns:
+        summary (see summarize), trades and balance_curve
+    """
+    if data is None:
+        client = client or TinkoffDataClient()
+        data = client.load_market_data(
+            ticker=config["TICKER"],
+            exchange=config["EXCHANGE"],
+            interval=config["INTERVAL"],
+            start_date=config["START_DATE"],
+            end_date=config["END_DATE"],
+            csv_file_name=None
+        )
+    if progress is not None:
+        progress(0.4)
+
+    key = cache_key(config, data) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    results_df, trades = backtest(data, config)
+    if progress is not None:
+        progress(0.9)
+
+    result = {
+        "summary": summarize(results_df, config["CAPITAL"]),
+        "trades": trades,
+        "balance_curve": balance_curve(results_df),
+    }
+    if key is not None:
+        cache.put(key, result)
+    return result
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 import numpy as np
 import logging
+from concurrent.futures import ProcessPoolExecutor
 import backtrader as bt
 import backtrader.feeds as btfeeds
 import talib
@@ -11,6 +12,9 @@ from typing import Dict, Any, Union, List
 from tinkoff_data import TinkoffDataClient
 from config_utils import ConfigFileOperator
 from plot_utils import save_plot_and_output
+from features import FeatureMatrix, min_period
+from shared_data import SharedFrame, attach_frame
+from vector_backtest import run_vectorized
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +45,7 @@ def volatility_stop(datafeed, atr, multiplier=1.5, position_type="long"):
         return datafeed.close[0] + atr[0] * multiplier
 
 
-def period_minmax_stop(datafeed, period=5, position_type="long"):
+def period_minmax_stop(datafeed, period=5, position_type="long", features=None):
     """
     Calculate stop loss based on min/max values over a specified period.
     
@@ -49,6 +53,7 @@ def period_minmax_stop(datafeed, period=5, position_type="long"):
     datafeed: Backtrader data feed
     period: Number of bars to look back
     position_type: "long" or "short" position
+    features: FeatureMatrix of the data to read the min/max from
     
     Returns:
     float: Stop loss price
@@ -59,6 +64,10 @@ def period_minmax_stop(datafeed, period=5, position_type="long"):
     if effective_period <= 0:
         return datafeed.close[0] * (0.95 if position_type == "long" else 1.05)
     
+    if features is not None:
+        extremes = features.low_min(period) if position_type == "long" else features.high_max(period)
+        return extremes[available_bars - 1]
+    
     if position_type == "long":
         low_values: List[float] = [datafeed.low[-i] for i in range(effective_period)]
         if low_values:
@@ -106,7 +115,7 @@ def takeprofit_ma_distance(datafeed, ma_medium, ma_fast, position_type="long"):
         return close - (distance_to_ma * distance_factor)
 
 
-def period_minmax_takeprofit(datafeed, period=5, position_type="long"):
+def period_minmax_takeprofit(datafeed, period=5, position_type="long", features=None):
     """
     Calculate take profit based on min/max values over a specified period.
     
@@ -114,6 +123,7 @@ def period_minmax_takeprofit(datafeed, period=5, position_type="long"):
     datafeed: Backtrader data feed
     period: Number of bars to look back (5=weekly, 20=monthly, 60=quarterly)
     position_type: "long" or "short" position
+    features: FeatureMatrix of the data to read the min/max from
     
     Returns:
     float: Take profit price
@@ -127,6 +137,11 @@ def period_minmax_takeprofit(datafeed, period=5, position_type="long"):
     close = datafeed.close[0]
     tp_factor = 1.25
     
+    if features is not None:
+        if position_type == "long":
+            return close + ((features.high_max(period)[available_bars - 1] - close) * tp_factor)
+        return close - ((close - features.low_min(period)[available_bars - 1]) * tp_factor)
+    
     if position_type == "long":
         high_values: List[float] = [datafeed.high[-i] for i in range(effective_period)]
         if high_values:
@@ -162,17 +177,17 @@ def percentage_takeprofit(datafeed, percent=5.0, position_type="long"):
         return close * (1.0 - (percent / 100.0))
 
 
-def choose_stop_loss(method, datafeed, atr, ma_medium, ma_slow, position_type="long"):
+def choose_stop_loss(method, datafeed, atr, ma_medium, ma_slow, position_type="long", features=None):
     if method == "daily_minmax":
         return daily_minmax_stop(datafeed, position_type)
     elif method == "volatility_stop":
         return volatility_stop(datafeed, atr, multiplier=1.5, position_type=position_type)
     elif method == "weekly_minmax":
-        return period_minmax_stop(datafeed, period=5, position_type=position_type)
+        return period_minmax_stop(datafeed, period=5, position_type=position_type, features=features)
     elif method == "monthly_minmax":
-        return period_minmax_stop(datafeed, period=20, position_type=position_type)
+        return period_minmax_stop(datafeed, period=20, position_type=position_type, features=features)
     elif method == "quarterly_minmax":
-        return period_minmax_stop(datafeed, period=60, position_type=position_type)
+        return period_minmax_stop(datafeed, period=60, position_type=position_type, features=features)
     elif method == "MA_50_18":
         return ma_50_18_stop(datafeed, ma_medium, ma_slow, position_type=position_type)
     else:
@@ -180,15 +195,15 @@ def choose_stop_loss(method, datafeed, atr, ma_medium, ma_slow, position_type="l
         return daily_minmax_stop(datafeed, position_type)
 
 
-def choose_take_profit(method, datafeed, ma_medium, ma_slow, position_type="long", atr=None):
+def choose_take_profit(method, datafeed, ma_medium, ma_slow, position_type="long", atr=None, features=None):
     if method == "ma_distance":
         return takeprofit_ma_distance(datafeed, ma_medium, ma_slow, position_type=position_type)
     elif method == "weekly_minmax":
-        return period_minmax_takeprofit(datafeed, period=5, position_type=position_type)
+        return period_minmax_takeprofit(datafeed, period=5, position_type=position_type, features=features)
     elif method == "monthly_minmax":
-        return period_minmax_takeprofit(datafeed, period=20, position_type=position_type)
+        return period_minmax_takeprofit(datafeed, period=20, position_type=position_type, features=features)
     elif method == "quarterly_minmax":
-        return period_minmax_takeprofit(datafeed, period=60, position_type=position_type)
+        return period_minmax_takeprofit(datafeed, period=60, position_type=position_type, features=features)
     elif method == "prev_bar_5_percent":
         return percentage_takeprofit(datafeed, percent=5.0, position_type=position_type)
     else:
@@ -223,6 +238,7 @@ class MultiStopTakeStrategy(bt.Strategy):
         ("ma_slow", 60),
         ("rsi_period", 7),
         ("min_trade_bars", 3),            # Minimum bars between trades
+        ("features", None),               # Precomputed FeatureMatrix of the data
     )
 
     def __init__(self):
@@ -233,24 +249,27 @@ class MultiStopTakeStrategy(bt.Strategy):
         self.stop_price = None
         self.take_profit_price = None
         
-        self.atr = bt.ind.ATR(self.data, period=self.p.atr_period)
-        self.rsi = bt.ind.RSI(self.data.close, period=self.p.rsi_period)
- 
-        self.ema_fast = bt.ind.EMA(self.data.close, period=self.p.ma_fast)
-        self.ema_medium = bt.ind.EMA(self.data.close, period=self.p.ma_medium)
-        self.ema_slow = bt.ind.EMA(self.data.close, period=self.p.ma_slow)
-        
-        close_array = np.array([self.data.close[i] for i in range(-50, 1)])
-        
-        self.ma_fast_values = talib.SMA(close_array, timeperiod=self.p.ma_fast)
-        self.ma_medium_values = talib.SMA(close_array, timeperiod=self.p.ma_medium)
-        self.ma_slow_values = talib.SMA(close_array, timeperiod=self.p.ma_slow)
-        
-        self.ma_fast = bt.ind.SMA(self.data.close, period=self.p.ma_fast)
-        self.ma_medium = bt.ind.SMA(self.data.close, period=self.p.ma_medium)
-        self.ma_slow = bt.ind.SMA(self.data.close, period=self.p.ma_slow)
-        self.crossover_fast = bt.ind.CrossOver(self.ma_fast, self.ma_medium)
-        self.crossover_medium = bt.ind.CrossOver(self.ma_medium, self.ma_slow)
+        if self.p.features is not None:
+            # Shared with the other runs on this data: read the precomputed
+            # series by bar and wait out their warm-up in next()
+            params = {name: getattr(self.p, name) for name in self.p._getkeys()}
+            for name, line in self.p.features.lines(params, self.data).items():
+                setattr(self, name, line)
+            self.warmup = min_period(params)
+        else:
+            self.atr = bt.ind.ATR(self.data, period=self.p.atr_period)
+            self.rsi = bt.ind.RSI(self.data.close, period=self.p.rsi_period)
+     
+            self.ema_fast = bt.ind.EMA(self.data.close, period=self.p.ma_fast)
+            self.ema_medium = bt.ind.EMA(self.data.close, period=self.p.ma_medium)
+            self.ema_slow = bt.ind.EMA(self.data.close, period=self.p.ma_slow)
+            
+            self.ma_fast = bt.ind.SMA(self.data.close, period=self.p.ma_fast)
+            self.ma_medium = bt.ind.SMA(self.data.close, period=self.p.ma_medium)
+            self.ma_slow = bt.ind.SMA(self.data.close, period=self.p.ma_slow)
+            self.crossover_fast = bt.ind.CrossOver(self.ma_fast, self.ma_medium)
+            self.crossover_medium = bt.ind.CrossOver(self.ma_medium, self.ma_slow)
+            self.warmup = 0
 
         self.completed_trades = []
 
@@ -271,6 +290,9 @@ class MultiStopTakeStrategy(bt.Strategy):
         logger.info(f"{dt} - {txt}")
 
     def next(self):
+        if len(self.data) < self.warmup:
+            return
+
         self.log('Close, %.2f' % self.dataclose[0])
 
         if self.order:
@@ -309,7 +331,8 @@ class MultiStopTakeStrategy(bt.Strategy):
             self.atr,
             self.ma_medium,
             self.ma_slow,
-            position_type=self.p.position_type
+            position_type=self.p.position_type,
+            features=self.p.features
         )
         
         entry_price = self.data.close[0]
@@ -330,7 +353,8 @@ class MultiStopTakeStrategy(bt.Strategy):
             self.ma_medium,
             self.ma_slow,
             position_type=self.p.position_type,
-            atr=self.atr
+            atr=self.atr,
+            features=self.p.features
         )
         
         self.original_tp_method = self.p.take_profit_method
@@ -801,17 +825,125 @@ def run_backtrader_with_config(config):
 # ----------------------------------------------------------------------
 # 4) BACKTEST FUNCTION & STRATEGY VARIATIONS
 # ----------------------------------------------------------------------
-def backtest(data, config):
+def strategy_params(config):
+    """
+    MultiStopTakeStrategy parameters for a strategy configuration.
+    
+    Parameters:
+    config (dict): Strategy configuration
+    
+    Returns:
+    dict: Strategy defaults overridden by the configured values, then by
+          config["STRATEGY_PARAMS"] (any MultiStopTakeStrategy parameter)
+    """
+    params = dict(MultiStopTakeStrategy.params._getitems())
+    params.update(
+        stop_loss_method=config["STOP_LOSS_METHOD"],
+        take_profit_method=config["TAKE_PROFIT_METHOD"],
+        position_type=config["POSITION"],
+        risk_percent=config["RISK_PERCENT"],
+        profit_to_risk=config["PROFIT_TO_RISK"],
+        atr_multiplier=config["ATR_MULTIPLIER"],
+        atr_period=config["ATR_WINDOW"]
+    )
+    overrides = config.get("STRATEGY_PARAMS", {})
+    unknown = set(overrides) - set(params)
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {', '.join(sorted(unknown))}")
+    params.update(overrides)
+    return params
+
+
+def results_frame(data, start_value, completed_trades):
+    """
+    Balance curve and trade markers for every bar of a backtest.
+    
+    A trade lands on the first bar at or after its datetime (compared as
+    wall time, the index timezone dropped) and adds its pnl to the balance
+    from that bar on. When several trades land on one bar, the markers
+    show the last of them.
+    
+    Parameters:
+    data (DataFrame): Market data the backtest ran on, sorted by time
+    start_value (float): Starting balance
+    completed_trades (list): Trades as collected by MultiStopTakeStrategy
+    
+    Returns:
+    DataFrame: Date, Close and Balance per bar with the trade columns filled on trade bars
+    """
+    trades_df = pd.DataFrame(completed_trades)
+    
+    results_df = pd.DataFrame({
+        "Date": data.index,
+        "Close": data["close"],
+        "Balance": np.full(len(data), float(start_value))
+    })
+    
+    if trades_df.empty:
+        return results_df
+    
+    dates = pd.DatetimeIndex(data.index)
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    bar_times = dates.values
+    trade_times = pd.to_datetime(trades_df["datetime"], format='%Y-%m-%d %H:%M:%S').values.astype(bar_times.dtype)
+    
+    positions = np.searchsorted(bar_times, trade_times, side="left")
+    landed = np.flatnonzero(positions < len(data))
+    if not len(landed):
+        return results_df
+    positions = positions[landed]
+    pnl = trades_df["pnl"].to_numpy(dtype=np.float64)[landed]
+    
+    # Balance at a bar: start plus the pnl of every trade up to the last
+    # one (in trade order) that landed on or before it
+    last_trade = np.full(len(data), -1)
+    np.maximum.at(last_trade, positions, np.arange(len(landed)))
+    last_trade = np.maximum.accumulate(last_trade)
+    balance = start_value + np.r_[0.0, np.cumsum(pnl)][last_trade + 1]
+    results_df["Balance"] = balance
+    
+    markers = trades_df.iloc[landed].assign(position=positions).drop_duplicates("position", keep="last")
+    marked = markers["position"].to_numpy()
+    for column, field in (
+        ("Entry", "entry_price"),
+        ("Type", "type"),
+        ("Stop_Loss", "stop_price"),
+        ("Take_Profit", "take_profit_price"),
+        ("Profit/Loss", "pnl")
+    ):
+        values = markers[field]
+        dtype = values.dtype if values.dtype.kind == "f" else object
+        column_values = np.full(len(data), np.nan, dtype=dtype)
+        column_values[marked] = values.to_numpy()
+        results_df[column] = column_values
+    
+    return results_df
+
+
+def backtest(data, config, features=None):
     """
     Run backtest for a single strategy configuration and return results.
     
+    config["ENGINE"] selects how: "backtrader" (default) runs Cerebro,
+    "vectorized" runs the same rules through vector_backtest, which gives
+    identical trades many times faster and suits parameter sweeps.
+    
     Parameters:
     data (DataFrame): Market data 
     config (dict): Strategy configuration
+    features (FeatureMatrix): Indicators of `data` shared between runs, built per run when not given
     
     Returns:
     DataFrame: Results of the backtest with trades and performance
     """
+    params = strategy_params(config)
+    params["features"] = features
+    
+    if config.get("ENGINE", "backtrader") == "vectorized":
+        completed_trades, _ = run_vectorized(data, params, config["CAPITAL"], COMMISSION, features)
+        return results_frame(data, config["CAPITAL"], completed_trades), completed_trades
+    
     cerebro = bt.Cerebro()
     cerebro.broker.setcash(config["CAPITAL"])
     cerebro.broker.setcommission(commission=COMMISSION)
@@ -824,16 +956,7 @@ def backtest(data, config):
 
     cerebro.adddata(data_feed)
     
-    cerebro.addstrategy(
-        MultiStopTakeStrategy,
-        stop_loss_method=config["STOP_LOSS_METHOD"],
-        take_profit_method=config["TAKE_PROFIT_METHOD"],
-        position_type=config["POSITION"],
-        risk_percent=config["RISK_PERCENT"],
-        profit_to_risk=config["PROFIT_TO_RISK"],
-        atr_multiplier=config["ATR_MULTIPLIER"],
-        atr_period=config["ATR_WINDOW"]
-    )
+    cerebro.addstrategy(MultiStopTakeStrategy, **params)
     
     cerebro.addanalyzer(bt.analyzers.SharpeRatio)
     cerebro.addanalyzer(bt.analyzers.DrawDown)
@@ -842,46 +965,167 @@ def backtest(data, config):
     # Run backtest
     start_value = cerebro.broker.getvalue()
     results = cerebro.run()
-    end_value = cerebro.broker.getvalue()
     strat = results[0]
+
+    return results_frame(data, start_value, strat.completed_trades), strat.completed_trades
+
+def variant_config(ticker_config, stop_loss_method, take_profit_method, engine="backtrader"):
+    """
+    Backtest configuration of one SL/TP variant for a ticker.
     
-    trades_df = pd.DataFrame(strat.completed_trades)
+    Parameters:
+    ticker_config (dict): Ticker entry of the main configuration
+    stop_loss_method (str): Stop-loss method
+    take_profit_method (str): Take-profit method
+    engine (str): Backtest engine, see backtest()
     
-    balance_values = [start_value]
-    current_balance = start_value
+    Returns:
+    dict: Strategy configuration
+    """
+    return {
+        "TICKER": ticker_config["TICKER"],
+        "EXCHANGE": ticker_config["EXCHANGE"],
+        "START_DATE": ticker_config["START_DATE"],
+        "END_DATE": ticker_config["END_DATE"],
+        "INTERVAL": ticker_config["INTERVAL"],
+        "CAPITAL": ticker_config["CAPITAL"],
+        "RISK_PERCENT": ticker_config["RISK_PERCENT"],
+        "PROFIT_TO_RISK": ticker_config["PROFIT_TO_RISK"],
+        "ATR_MULTIPLIER": ticker_config["ATR_MULTIPLIER"],
+        "ATR_WINDOW": ticker_config["ATR_WINDOW"],
+        "STOP_LOSS_METHOD": stop_loss_method,
+        "TAKE_PROFIT_METHOD": take_profit_method,
+        "POSITION": ticker_config.get("POSITION", "long"),
+        "STRATEGY_PARAMS": ticker_config.get("STRATEGY_PARAMS", {}),
+        "ENGINE": engine
+    }
+
+
+def run_variant(data, local_config, strategies_results_path, features=None):
+    """
+    Backtest one variant, save its plot and output, and summarize it.
     
-    results_df = pd.DataFrame({
-        "Date": data.index,
-        "Close": data["close"],
-        "Balance": [start_value] * len(data)
-    })
+    Parameters:
+    data (DataFrame): Market data
+    local_config (dict): Variant configuration, see variant_config()
+    strategies_results_path (str): Directory for the plot and output files
+    features (FeatureMatrix): Indicators of `data` shared between variants
     
-    if not trades_df.empty:
-        for idx, trade in trades_df.iterrows():
-            trade_date = datetime.strptime(trade["datetime"], '%Y-%m-%d %H:%M:%S')
-            
-            date_series = results_df["Date"]
-            if hasattr(date_series.dtype, 'tz') and date_series.dtype.tz is not None:
-                date_series = date_series.dt.tz_localize(None)
-            
-            pd_trade_date = pd.Timestamp(trade_date)
-            
-            mask = date_series >= pd_trade_date
-            if mask.any():
-                trade_date_idx = mask.idxmax()
-                
-                current_balance += trade["pnl"]
-                results_df.loc[trade_date_idx:, "Balance"] = current_balance
-                
-                results_df.loc[trade_date_idx, "Entry"] = trade["entry_price"]
-                results_df.loc[trade_date_idx, "Type"] = trade["type"]
-                results_df.loc[trade_date_idx, "Stop_Loss"] = trade["stop_price"]  
-                results_df.loc[trade_date_idx, "Take_Profit"] = trade["take_profit_price"]
-                results_df.loc[trade_date_idx, "Profit/Loss"] = trade["pnl"]
+    Returns:
+    dict: Row of the comparison table
+    """
+    bt_results, completed_trades = backtest(data, local_config, features)
+    final_balance = bt_results["Balance"].iloc[-1] if not bt_results.empty else local_config["CAPITAL"]
+    trade_count = bt_results["Entry"].count()
+    
+    profit_losses = bt_results["Profit/Loss"].dropna()
+    non_zero_trades = profit_losses[profit_losses != 0]
+    wins = non_zero_trades[non_zero_trades > 0].shape[0]
+    losses = non_zero_trades[non_zero_trades < 0].shape[0]
+    win_rate = wins / (wins + losses) if (wins + losses) else 0
+
+    save_plot_and_output(data, bt_results, local_config["TICKER"], local_config, strategies_results_path,
+                        completed_trades=completed_trades)
+
+    return {
+        "Ticker": local_config["TICKER"],
+        "Stop_Loss_Method": local_config["STOP_LOSS_METHOD"],
+        "Take_Profit_Method": local_config["TAKE_PROFIT_METHOD"],
+        "Final_Balance": final_balance,
+        "Trades": trade_count,
+        "Win_Rate (%)": round(win_rate * 100, 2)
+    }
+
+
+def _run_shared_variant(job):
+    """Pool task: run_variant on market data and features attached from shared memory"""
+    data_descriptor, features_descriptor, local_config, strategies_results_path = job
+    data = attach_frame(data_descriptor)
+    features = FeatureMatrix.from_frame(data, attach_frame(features_descriptor))
+    return run_variant(data, local_config, strategies_results_path, features)
+
+
+def run_sweep(datasets, main_config, workers=None, strategies_results_path=None):
+    """
+    Run every SL/TP variant for several tickers on a process pool.
+    
+    Indicators of each ticker are computed once for all its variants. They
+    and the market data are copied once into shared memory and read from
+    there by the workers. Rows come back in the order of `datasets`,
+    then STOP_LOSS_METHODS, then TAKE_PROFIT_METHODS, whatever the workers'
+    timing.
+    
+    Parameters:
+    datasets (dict): Market data DataFrame per ticker
+    main_config (dict): Main configuration with strategy options
+    workers (int): Worker processes, defaults to main_config["WORKERS"] or the CPU count;
+                   1 runs everything in this process
+    strategies_results_path (str): Directory for per-variant files, defaults to STRATEGIES_RESULTS_PATH
+    
+    Returns:
+    dict: Comparison DataFrame per ticker found in the configuration
+    """
+    if strategies_results_path is None:
+        strategies_results_path = STRATEGIES_RESULTS_PATH
+    if workers is None:
+        workers = main_config.get("WORKERS") or os.cpu_count() or 1
+    engine = main_config.get("ENGINE", "backtrader")
+
+    ticker_configs = {item["TICKER"]: item for item in main_config["TICKERS"] if "TICKER" in item}
+    jobs = []
+    for ticker in datasets:
+        if ticker not in ticker_configs:
+            logger.warning(f"Configuration for ticker {ticker} not found.")
+            continue
+        for slm in main_config["STOP_LOSS_METHODS"]:
+            for tpm in main_config["TAKE_PROFIT_METHODS"]:
+                jobs.append((ticker, variant_config(ticker_configs[ticker], slm, tpm, engine)))
+
+    # Variants of a ticker differ only in SL/TP methods, so they share all indicators
+    features = {}
+    for ticker, local_config in jobs:
+        if ticker not in features:
+            features[ticker] = FeatureMatrix(datasets[ticker], strategy_params(local_config))
+
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        rows = [
+            run_variant(datasets[ticker], local_config, strategies_results_path, features[ticker])
+            for ticker, local_config in jobs
+        ]
+    else:
+        shared = {}
+        try:
+            for ticker in features:
+                shared[ticker] = (SharedFrame(datasets[ticker]), SharedFrame(features[ticker].to_frame(), columns=None))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rows = list(executor.map(
+                    _run_shared_variant,
+                    [
+                        (shared[ticker][0].descriptor, shared[ticker][1].descriptor, local_config, strategies_results_path)
+                        for ticker, local_config in jobs
+                    ]
+                ))
+        finally:
+            for frames in shared.values():
+                for frame in frames:
+                    frame.close()
+
+    comparisons = {}
+    for (ticker, _), row in zip(jobs, rows):
+        comparisons.setdefault(ticker, []).append(row)
+    return {ticker: pd.DataFrame(ticker_rows) for ticker, ticker_rows in comparisons.items()}
+
+
+def save_comparison(df_compare, ticker):
+    """Save a comparison table to compare_results_{ticker}_{timestamp}.csv"""
+    compare_file_name = os.path.join(RESULTS_PATH,
+                                   f"compare_results_{ticker}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv")
+    df_compare.to_csv(compare_file_name, index=False)
+    logger.info(f"Comparative test results for {ticker} saved to {compare_file_name}")
 
-    return results_df, strat.completed_trades
 
-def run_all_variants(data, main_config, ticker):
+def run_all_variants(data, main_config, ticker, workers=None):
     """
     Run backtests for all combinations of stop-loss and take-profit methods for a ticker.
     Saves results to compare_results_{ticker}.csv
@@ -890,65 +1134,16 @@ def run_all_variants(data, main_config, ticker):
     data (DataFrame): Market data
     main_config (dict): Main configuration with strategy options
     ticker (str): Ticker symbol to test
+    workers (int): Worker processes, see run_sweep()
     
     Returns:
     DataFrame: Comparison of all strategy combinations
     """
-    sl_methods = main_config["STOP_LOSS_METHODS"]
-    tp_methods = main_config["TAKE_PROFIT_METHODS"]
-
-    ticker_config = next((item for item in main_config["TICKERS"] if item["TICKER"] == ticker), None)
-    if ticker_config is None:
-        logger.warning(f"Configuration for ticker {ticker} not found.")
+    df_compare = run_sweep({ticker: data}, main_config, workers).get(ticker)
+    if df_compare is None:
         return None
 
-    results_list = []
-    for slm in sl_methods:
-        for tpm in tp_methods:
-            local_config = {            
-                "TICKER": ticker_config["TICKER"],
-                "EXCHANGE": ticker_config["EXCHANGE"],
-                "START_DATE": ticker_config["START_DATE"],
-                "END_DATE": ticker_config["END_DATE"],
-                "INTERVAL": ticker_config["INTERVAL"],
-                "CAPITAL": ticker_config["CAPITAL"],
-                "RISK_PERCENT": ticker_config["RISK_PERCENT"],
-                "PROFIT_TO_RISK": ticker_config["PROFIT_TO_RISK"],
-                "ATR_MULTIPLIER": ticker_config["ATR_MULTIPLIER"],
-                "ATR_WINDOW": ticker_config["ATR_WINDOW"],
-                "STOP_LOSS_METHOD": slm,
-                "TAKE_PROFIT_METHOD": tpm,
-                "POSITION": ticker_config.get("POSITION", "long")
-            }
-
-            # Run backtest
-            bt_results, completed_trades = backtest(data, local_config)
-            final_balance = bt_results["Balance"].iloc[-1] if not bt_results.empty else local_config["CAPITAL"]
-            trade_count = bt_results["Entry"].count()
-            
-            profit_losses = bt_results["Profit/Loss"].dropna()
-            non_zero_trades = profit_losses[profit_losses != 0]
-            wins = non_zero_trades[non_zero_trades > 0].shape[0]
-            losses = non_zero_trades[non_zero_trades < 0].shape[0]
-            win_rate = wins / (wins + losses) if (wins + losses) else 0
-
-            save_plot_and_output(data, bt_results, ticker, local_config, STRATEGIES_RESULTS_PATH,
-                                completed_trades=completed_trades)
-
-            results_list.append({
-                "Ticker": ticker,
-                "Stop_Loss_Method": slm,
-                "Take_Profit_Method": tpm,
-                "Final_Balance": final_balance,
-                "Trades": trade_count,
-                "Win_Rate (%)": round(win_rate * 100, 2)
-            })
-
-    df_compare = pd.DataFrame(results_list)
-    compare_file_name = os.path.join(RESULTS_PATH,
-                                   f"compare_results_{ticker}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv")
-    df_compare.to_csv(compare_file_name, index=False)
-    logger.info(f"Comparative test results for {ticker} saved to {compare_file_name}")
+    save_comparison(df_compare, ticker)
     return df_compare
 
 def main():
@@ -981,6 +1176,7 @@ def main():
         
         if run_variants:
             tinkoff_client = TinkoffDataClient()
+            datasets = {}
             
             for ticker_cfg in config["TICKERS"]:
                 ticker = ticker_cfg["TICKER"]
@@ -992,7 +1188,7 @@ def main():
                 csv_file = config_operator.get_csv_file_path(ticker, start_date, end_date, interval)
                 
                 try:
-                    df = tinkoff_client.load_market_data(
+                    datasets[ticker] = tinkoff_client.load_market_data(
                         ticker=ticker,
                         exchange=exchange,
                         interval=interval,
@@ -1000,11 +1196,12 @@ def main():
                         end_date=end_date,
                         csv_file_name=csv_file
                     )
-                    
-                    run_all_variants(df, config, ticker)
-                    
                 except Exception as e:
                     logger.exception(f"Error processing ticker {ticker}: {str(e)}")
+            
+            # One pool for all tickers keeps every worker busy until the whole grid is done
+            for ticker, df_compare in run_sweep(datasets, config).items():
+                save_comparison(df_compare, ticker)
         else:
             run_backtrader_with_config(config)
             
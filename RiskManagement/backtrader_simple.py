@@ -8,6 +8,7 @@ from typing import Dict, Any, Union
 import numpy as np
 
 from tinkoff_data import TinkoffDataClient
+from resample import parse_interval
 from config_utils import ConfigFileOperator
 from plot_utils import save_plot_and_output
 
@@ -282,6 +283,16 @@ class LongShortDynamicStopStrategy(bt.Strategy):
             self.take_profit_price = None
 
 
+# Backtrader timeframe and units per interval unit
+BT_TIMEFRAMES = {
+    "m": (bt.TimeFrame.Minutes, 1),
+    "h": (bt.TimeFrame.Minutes, 60),
+    "d": (bt.TimeFrame.Days, 1),
+    "w": (bt.TimeFrame.Weeks, 1),
+    "M": (bt.TimeFrame.Months, 1),
+}
+
+
 class CSVData(bt.feeds.GenericCSVData):
     params = (
         ("dtformat", "%Y-%m-%d %H:%M:%S"),
@@ -333,24 +344,19 @@ def run_strategy(config):
             bt_df = tinkoff_client.convert_tinkoff_df_to_bt(df)
             bt_df.to_csv(csv_file, index=False)
             
+            parsed_interval = parse_interval(interval)
+            bt_timeframe, units = BT_TIMEFRAMES[parsed_interval.unit]
             data_feed = CSVData(
                 dataname=csv_file,
                 fromdate=ConfigFileOperator.try_parse_datetime(start_date),
                 todate=ConfigFileOperator.try_parse_datetime(end_date),
-                timeframe=bt.TimeFrame.Minutes if interval in ['1m', '5m', '15m', '1h', '4h'] else
-                          bt.TimeFrame.Days if interval in ['1d'] else
-                          bt.TimeFrame.Weeks if interval in ['1w'] else
-                          bt.TimeFrame.Months,
-                compression=1 if interval in ['1m', '1d', '1w', '1M'] else
-                           5 if interval == '5m' else
-                           15 if interval == '15m' else
-                           60 if interval == '1h' else
-                           240,
+                timeframe=bt_timeframe,
+                compression=parsed_interval.multiple * units,
             )
             cerebro.adddata(data_feed, name=ticker)
             
             # market session hours
-            if interval in ['1m', '5m', '15m', '1h', '4h']:
+            if parsed_interval.intraday:
                 data_feed.sessionstart = time(9, 50)
                 data_feed.sessionend = time(18, 39)
             
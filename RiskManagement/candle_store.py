@@ -0,0 +1,256 @@
+import os
+import json
+import threading
+import logging
+import numpy as np
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CANDLE_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv_data", "candles")
+
+CANDLE_DTYPE = np.dtype([
+    ("time", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.int64),
+    ("is_complete", np.bool_),
+])
+
+# Intraday intervals are partitioned by month, the rest by year
+MONTHLY_PARTITIONS = {"1m", "5m", "15m"}
+
+COVERAGE_FILE = "coverage.json"
+LOCK_DIRECTORY = ".locks"
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        elif start < end:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(start: int, end: int, covered: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Parts of [start, end) not covered by the sorted, merged `covered` ranges
+
+    Args:
+        start: Range start, epoch seconds
+        end: Range end (exclusive), epoch seconds
+        covered: Covered ranges as returned by CandleStore.coverage
+
+    Returns:
+        Missing [from, to) ranges in ascending order
+    """
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=CANDLE_DTYPE[name]) for name in CANDLE_DTYPE.names}
+
+
+class CandleStore:
+    """
+    Local candle store partitioned by FIGI, interval and period.
+
+    Each partition (one year, or one month for intraday intervals) is a
+    structured .npy file, so range reads memory map only the partitions
+    that overlap the request and copy just the requested rows. A coverage
+    map per (FIGI, interval) records which time ranges were already
+    downloaded, including ranges without candles (weekends, holidays),
+    so callers fetch only what is missing. Files are replaced atomically,
+    and writes to one (FIGI, interval) hold a lock file, so several
+    processes can share the store.
+    """
+
+    def __init__(self, root: str = CANDLE_STORE_PATH):
+        """
+        Initialize the candle store
+
+        Args:
+            root: Directory holding one subdirectory per FIGI
+        """
+        self.root = root
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def coverage(self, figi: str, interval: str) -> List[Tuple[int, int]]:
+        """
+        Downloaded [from, to) ranges in epoch seconds, sorted and merged
+        """
+        path = os.path.join(self._directory(figi, interval), COVERAGE_FILE)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, "r") as f:
+                return [tuple(item) for item in json.load(f)["ranges"]]
+        except (OSError, ValueError, KeyError):
+            logger.exception(f"Failed to read candle coverage {path}")
+            return []
+
+    def missing(self, figi: str, interval: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Ranges of [start, end) that are not stored yet
+        """
+        return subtract_ranges(start, end, self.coverage(figi, interval))
+
+    def read(self, figi: str, interval: str, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Stored candles with start <= time <= end
+
+        Args:
+            figi: Instrument FIGI
+            interval: Time interval (1m, 5m, 15m, 1h, 1d, 1w, 1M)
+            start: Range start, epoch seconds
+            end: Range end (inclusive), epoch seconds
+
+        Returns:
+            Column arrays in the format of TinkoffDataClient.candles_to_columns
+        """
+        parts = []
+        for path in self._partition_paths(figi, interval, start, end):
+            if not os.path.exists(path):
+                continue
+            partition = np.load(path, mmap_mode="r")
+            times = partition["time"]
+            lo = np.searchsorted(times, start, side="left")
+            hi = np.searchsorted(times, end, side="right")
+            if hi > lo:
+                parts.append(np.array(partition[lo:hi]))
+
+        if not parts:
+            return _empty_columns()
+
+        candles = np.concatenate(parts)
+        return {name: np.ascontiguousarray(candles[name]) for name in CANDLE_DTYPE.names}
+
+    def write(self, figi: str, interval: str, columns: Dict[str, np.ndarray], covered_from: int, covered_to: int) -> None:
+        """
+        Merge downloaded candles into the store and mark [covered_from, covered_to) as downloaded
+
+        Candles already stored with the same time are replaced. Incomplete
+        candles are stored, but the range from the first of them on is not
+        marked as covered, so it is downloaded again next time.
+
+        Args:
+            figi: Instrument FIGI
+            interval: Time interval
+            columns: Column arrays as returned by TinkoffDataClient.candles_to_columns
+            covered_from: Start of the requested range, epoch seconds
+            covered_to: End of the requested range (exclusive), epoch seconds
+        """
+        candles = np.empty(len(columns["time"]), dtype=CANDLE_DTYPE)
+        for name in CANDLE_DTYPE.names:
+            candles[name] = columns[name]
+
+        incomplete = np.flatnonzero(~candles["is_complete"])
+        if incomplete.size:
+            covered_to = min(covered_to, int(candles["time"][incomplete[0]]))
+
+        with self._locked(figi, interval):
+            directory = self._directory(figi, interval)
+
+            keys = np.array([self._partition_key(interval, int(t)) for t in candles["time"]])
+            for key in dict.fromkeys(keys.tolist()):
+                self._merge_partition(os.path.join(directory, f"{key}.npy"), candles[keys == key])
+
+            if covered_from < covered_to:
+                ranges = _merge_ranges(self.coverage(figi, interval) + [(covered_from, covered_to)])
+                self._atomic_write(
+                    os.path.join(directory, COVERAGE_FILE),
+                    lambda f: f.write(json.dumps({"ranges": ranges}).encode())
+                )
+
+    def _merge_partition(self, path: str, candles: np.ndarray) -> None:
+        if os.path.exists(path):
+            candles = np.concatenate([np.load(path), candles])
+
+        # Stable sort keeps the newer copy of a duplicated candle last
+        candles = candles[np.argsort(candles["time"], kind="stable")]
+        times = candles["time"]
+        keep = np.append(times[1:] != times[:-1], True)
+        self._atomic_write(path, lambda f: np.save(f, candles[keep]))
+
+    @staticmethod
+    def _atomic_write(path: str, write) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def _directory(self, figi: str, interval: str) -> str:
+        return os.path.join(self.root, figi, interval)
+
+    def _lock(self, figi: str, interval: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault((figi, interval), threading.Lock())
+
+    @contextmanager
+    def _locked(self, figi: str, interval: str) -> Iterator[None]:
+        """
+        Exclusive access to the partitions and coverage of (figi, interval)
+
+        The thread lock serializes writers within this process, the flock
+        on ".locks/<figi>-<interval>.lock" writers in other processes, e.g.
+        forked backtest workers each with their own CandleStore.
+        """
+        with self._lock(figi, interval):
+            os.makedirs(self._directory(figi, interval), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            lock_directory = os.path.join(self.root, LOCK_DIRECTORY)
+            os.makedirs(lock_directory, exist_ok=True)
+            with open(os.path.join(lock_directory, f"{figi}-{interval}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _partition_key(interval: str, timestamp: int) -> str:
+        date = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        if interval in MONTHLY_PARTITIONS:
+            return f"{date.year}-{date.month:02d}"
+        return str(date.year)
+
+    def _partition_paths(self, figi: str, interval: str, start: int, end: int) -> Iterator[str]:
+        directory = self._directory(figi, interval)
+        first = datetime.fromtimestamp(max(start, 0), tz=timezone.utc)
+        last = datetime.fromtimestamp(max(end, 0), tz=timezone.utc)
+
+        if interval in MONTHLY_PARTITIONS:
+            year, month = first.year, first.month
+            while (year, month) <= (last.year, last.month):
+                yield os.path.join(directory, f"{year}-{month:02d}.npy")
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        else:
+            for year in range(first.year, last.year + 1):
+                yield os.path.join(directory, f"{year}.npy")
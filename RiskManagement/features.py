@@ -0,0 +1,253 @@
+import math
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Lookbacks of the weekly/monthly/quarterly min-max stop-loss and take-profit methods
+EXTREME_PERIODS = (5, 20, 60)
+
+
+def _sma(values: List[float], period: int) -> np.ndarray:
+    """bt.ind.SMA: exactly rounded mean of the last `period` values"""
+    out = np.full(len(values), np.nan)
+    for i in range(period - 1, len(values)):
+        out[i] = math.fsum(values[i - period + 1:i + 1]) / period
+    return out
+
+
+def _smoothed(values: List[float], period: int, alpha: float, first: int = 0) -> np.ndarray:
+    """bt.ind.ExponentialSmoothing over values starting at index `first`, seeded with their mean"""
+    out = np.full(len(values), np.nan)
+    seed = first + period - 1
+    if seed >= len(values):
+        return out
+
+    alpha1 = 1.0 - alpha
+    prev = out[seed] = math.fsum(values[first:seed + 1]) / period
+    for i in range(seed + 1, len(values)):
+        prev = out[i] = prev * alpha1 + values[i] * alpha
+    return out
+
+
+def _crossover(fast: np.ndarray, slow: np.ndarray, start: int) -> np.ndarray:
+    """bt.ind.CrossOver: 1.0 when `fast` crosses `slow` upwards, -1.0 downwards, ignoring touches"""
+    out = np.full(len(fast), np.nan)
+    if start >= len(fast):
+        return out
+
+    diff = (fast - slow).tolist()
+    prev = diff[start]
+    for i in range(start + 1, len(fast)):
+        up = prev < 0.0 and fast[i] > slow[i]
+        down = prev > 0.0 and fast[i] < slow[i]
+        out[i] = float(up) - float(down)
+        if diff[i]:
+            prev = diff[i]
+    return out
+
+
+def _trailing_extreme(values: np.ndarray, period: int, ufunc) -> np.ndarray:
+    """Min or max of the last min(period, i) values up to bar i, as period_minmax_stop sees them; NaN at bar 0"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n > 1:
+        head = ufunc.accumulate(values[1:min(period, n - 1) + 1])
+        out[1:len(head) + 1] = head
+    if n > period:
+        out[period:] = ufunc.reduce(sliding_window_view(values, period)[1:], axis=1)
+    return out
+
+
+def _previous_extreme(values: np.ndarray, period: int, ufunc) -> np.ndarray:
+    """Min or max of the `period` values before bar i"""
+    out = np.full(len(values), np.nan)
+    if len(values) > period:
+        out[period:] = ufunc.reduce(sliding_window_view(values, period)[:-1], axis=1)
+    return out
+
+
+def min_period(params: Dict[str, Any]) -> int:
+    """Bars MultiStopTakeStrategy waits for before its first next(): the longest indicator warm-up"""
+    fast, medium, slow = params["ma_fast"], params["ma_medium"], params["ma_slow"]
+    return max(
+        params["atr_period"] + 1,               # ATR needs the previous close
+        params["rsi_period"] + 1,
+        fast, medium, slow,                     # SMAs and EMAs
+        max(fast, medium) + 1,                  # CrossOvers look one bar back
+        max(medium, slow) + 1,
+    )
+
+
+class FeatureLine:
+    """
+    A feature column read like a backtrader line: [0] is the strategy's
+    current bar, [-1] the one before
+    """
+
+    def __init__(self, values: np.ndarray, clock):
+        self._values = values.tolist()
+        self._clock = clock
+
+    def __getitem__(self, ago: int) -> float:
+        return self._values[len(self._clock) - 1 + ago]
+
+    # Like a line inside next(), comparisons use the current value
+    def __gt__(self, other) -> bool:
+        return self[0] > other
+
+    def __lt__(self, other) -> bool:
+        return self[0] < other
+
+    def __ge__(self, other) -> bool:
+        return self[0] >= other
+
+    def __le__(self, other) -> bool:
+        return self[0] <= other
+
+
+class FeatureMatrix:
+    """
+    Indicator series of one ticker, computed once and shared by every strategy run on it
+
+    Columns are computed on first use and kept, named after the indicator
+    and its periods: "atr_14", "rsi_7", "sma_20", "ema_20", "crossover_8_20",
+    "low_min_5"/"high_max_5" (the current and up to 4 previous bars, as the
+    min-max SL/TP methods use them) and "prev_high_max_5"/"prev_low_min_5"
+    (the 5 bars before). Values match backtrader's indicators exactly and
+    are NaN until an indicator has enough bars.
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        params: Optional[Dict[str, Any]] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None
+    ):
+        """
+        Args:
+            data: OHLCV DataFrame as passed to backtest()
+            params: Strategy parameters whose indicators to compute right away
+            columns: Feature columns computed earlier for the same data
+        """
+        self.data = data
+        self._prices: Dict[str, np.ndarray] = {}
+        self._columns: Dict[str, np.ndarray] = dict(columns or {})
+        for period in EXTREME_PERIODS:
+            self.low_min(period)
+            self.high_max(period)
+        self.prev_high_max(5)
+        self.prev_low_min(5)
+        if params is not None:
+            self.indicators(params)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def _cached(self, name: str, build: Callable[[], np.ndarray]) -> np.ndarray:
+        if name not in self._columns:
+            self._columns[name] = build()
+        return self._columns[name]
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, frame: pd.DataFrame) -> "FeatureMatrix":
+        """Features saved with to_frame(), for the same data"""
+        return cls(data, columns={name: frame[name].to_numpy(dtype=np.float64) for name in frame.columns})
+
+    def price(self, name: str) -> np.ndarray:
+        if name not in self._prices:
+            self._prices[name] = self.data[name].to_numpy(dtype=np.float64)
+        return self._prices[name]
+
+    def _changes(self, name: str) -> np.ndarray:
+        """True range and up/down close moves, the inputs of ATR and RSI"""
+        close = self.price("close")
+        prev_close = np.r_[np.nan, close[:-1]]
+        if name == "true_range":
+            return np.maximum(self.price("high"), prev_close) - np.minimum(self.price("low"), prev_close)
+        if name == "up_move":
+            return np.maximum(close - prev_close, 0.0)
+        return np.maximum(prev_close - close, 0.0)
+
+    def atr(self, period: int) -> np.ndarray:
+        true_range = self._cached("true_range", lambda: self._changes("true_range"))
+        return self._cached(f"atr_{period}", lambda: _smoothed(true_range.tolist(), period, 1.0 / period, first=1))
+
+    def rsi(self, period: int) -> np.ndarray:
+        def build() -> np.ndarray:
+            up = self._cached("up_move", lambda: self._changes("up_move"))
+            down = self._cached("down_move", lambda: self._changes("down_move"))
+            ma_up = _smoothed(up.tolist(), period, 1.0 / period, first=1)
+            ma_down = _smoothed(down.tolist(), period, 1.0 / period, first=1)
+            # backtrader raises ZeroDivisionError when there were no down closes at
+            # all, an RSI of 100 is what the ratio tends to
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(ma_down == 0.0, 100.0, 100.0 - 100.0 / (1.0 + ma_up / ma_down))
+
+        return self._cached(f"rsi_{period}", build)
+
+    def sma(self, period: int) -> np.ndarray:
+        return self._cached(f"sma_{period}", lambda: _sma(self.price("close").tolist(), period))
+
+    def ema(self, period: int) -> np.ndarray:
+        return self._cached(f"ema_{period}", lambda: _smoothed(self.price("close").tolist(), period, 2.0 / (1.0 + period)))
+
+    def crossover(self, fast: int, slow: int) -> np.ndarray:
+        return self._cached(
+            f"crossover_{fast}_{slow}",
+            lambda: _crossover(self.sma(fast), self.sma(slow), max(fast, slow) - 1)
+        )
+
+    def low_min(self, period: int) -> np.ndarray:
+        return self._cached(f"low_min_{period}", lambda: _trailing_extreme(self.price("low"), period, np.minimum))
+
+    def high_max(self, period: int) -> np.ndarray:
+        return self._cached(f"high_max_{period}", lambda: _trailing_extreme(self.price("high"), period, np.maximum))
+
+    def prev_low_min(self, period: int) -> np.ndarray:
+        return self._cached(f"prev_low_min_{period}", lambda: _previous_extreme(self.price("low"), period, np.minimum))
+
+    def prev_high_max(self, period: int) -> np.ndarray:
+        return self._cached(f"prev_high_max_{period}", lambda: _previous_extreme(self.price("high"), period, np.maximum))
+
+    def indicators(self, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        The indicators of MultiStopTakeStrategy for the given parameters
+
+        Args:
+            params: Strategy parameters, see backtrader_complex.strategy_params
+
+        Returns:
+            Series by the strategy's attribute names: atr, rsi, ema_*, ma_* and crossover_*
+        """
+        fast, medium, slow = params["ma_fast"], params["ma_medium"], params["ma_slow"]
+        return {
+            "atr": self.atr(params["atr_period"]),
+            "rsi": self.rsi(params["rsi_period"]),
+            "ema_fast": self.ema(fast),
+            "ema_medium": self.ema(medium),
+            "ema_slow": self.ema(slow),
+            "ma_fast": self.sma(fast),
+            "ma_medium": self.sma(medium),
+            "ma_slow": self.sma(slow),
+            "crossover_fast": self.crossover(fast, medium),
+            "crossover_medium": self.crossover(medium, slow),
+        }
+
+    def lines(self, params: Dict[str, Any], clock) -> Dict[str, FeatureLine]:
+        """indicators() as FeatureLines following `clock`, usually the strategy's data feed"""
+        return {name: FeatureLine(values, clock) for name, values in self.indicators(params).items()}
+
+    def head(self, bars: int) -> "FeatureMatrix":
+        """
+        The features of the first `bars` bars
+
+        Every feature only looks back, so the computed columns are cut
+        rather than recomputed.
+        """
+        return FeatureMatrix(self.data.iloc[:bars], columns={name: values[:bars] for name, values in self._columns.items()})
+
+    def to_frame(self, names: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Computed feature columns (all by default) as a DataFrame indexed like the data"""
+        names = list(self._columns) if names is None else list(names)
+        return pd.DataFrame({name: self._columns[name] for name in names}, index=self.data.index)
@@ -0,0 +1,347 @@
+import itertools
+import logging
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtrader_complex import COMMISSION, RESULTS_PATH, config_operator, strategy_params
+from tinkoff_data import TinkoffDataClient
+from features import FeatureMatrix, min_period
+from vector_backtest import run_vectorized
+
+logger = logging.getLogger(__name__)
+
+# MultiStopTakeStrategy parameters a search can vary
+SEARCHABLE_PARAMS = (
+    "stop_loss_method",
+    "take_profit_method",
+    "risk_percent",
+    "profit_to_risk",
+    "atr_multiplier",
+    "atr_period",
+    "ma_fast",
+    "ma_medium",
+    "ma_slow",
+    "rsi_period",
+    "partial_exit_threshold",
+    "min_trade_bars",
+)
+
+METRICS = ("final_value", "return_pct", "max_drawdown_pct", "trades", "win_rate", "stopped")
+
+RESULTS_DB = "optimization.sqlite"
+RESULTS_TABLE = "optimization_results"
+
+
+def _sample(space: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    """One candidate from a search space: a list is a set of choices, {"min", "max"} a uniform range"""
+    candidate = {}
+    for name, values in space.items():
+        if isinstance(values, dict):
+            low, high = values["min"], values["max"]
+            if isinstance(low, int) and isinstance(high, int):
+                candidate[name] = int(rng.integers(low, high + 1))
+            else:
+                candidate[name] = float(rng.uniform(low, high))
+        else:
+            candidate[name] = values[int(rng.integers(len(values)))]
+    return candidate
+
+
+def _metrics(values: np.ndarray, trades: List[Dict[str, Any]], capital: float, bars: int) -> Dict[str, Any]:
+    """Performance of one run from its broker values and trades"""
+    final_value = float(values[-1]) if len(values) else float(capital)
+    peaks = np.maximum.accumulate(values) if len(values) else np.array([capital])
+    closed = [trade["pnlcomm"] for trade in trades if trade["buy_or_sell"] == "SELL"]
+    wins = sum(1 for pnl in closed if pnl > 0)
+    return {
+        "final_value": final_value,
+        "return_pct": (final_value / capital - 1.0) * 100,
+        "max_drawdown_pct": float(np.max((peaks - values) / peaks)) * 100 if len(values) else 0.0,
+        "trades": len(closed),
+        "win_rate": wins / len(closed) * 100 if closed else 0.0,
+        "stopped": len(values) < bars,
+    }
+
+
+class StrategyOptimizer:
+    """
+    Searches MultiStopTakeStrategy parameters for one ticker
+
+    Candidates run on the vectorized engine and share one FeatureMatrix, so
+    candidates with e.g. the same ATR or MA period compute it once.
+    Every evaluation becomes a row of `results`: the candidate's
+    SEARCHABLE_PARAMS, the metrics and the search that produced it.
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        config: Dict[str, Any],
+        objective: str = "final_value",
+        maximize: bool = True,
+        max_loss: Optional[float] = None
+    ):
+        """
+        Args:
+            data: OHLCV DataFrame as passed to backtest()
+            config: Strategy configuration, see backtrader_complex.backtest.
+                    Supplies the parameters a search does not vary.
+            objective: Metric candidates are ranked by, one of METRICS
+            maximize: Whether a higher objective is better
+            max_loss: Stop a candidate early once it has lost this fraction of CAPITAL
+        """
+        if objective not in METRICS:
+            raise ValueError(f"Unknown objective: {objective}")
+
+        self.data = data
+        self.config = config
+        self.capital = config["CAPITAL"]
+        self.base_params = strategy_params(config)
+        self.objective = objective
+        self.maximize = maximize
+        self.min_value = self.capital * (1.0 - max_loss) if max_loss is not None else None
+        self.run_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.features = FeatureMatrix(data)
+        self._rows: List[Dict[str, Any]] = []
+
+    @property
+    def results(self) -> pd.DataFrame:
+        return pd.DataFrame(self._rows)
+
+    def evaluate(self, params: Dict[str, Any], bars: Optional[int] = None, method: str = "manual", rung: int = 0) -> Dict[str, Any]:
+        """
+        Backtest one candidate
+
+        Args:
+            params: Values for some of SEARCHABLE_PARAMS
+            bars: Only run over the first `bars` bars
+            method: Search name recorded with the result
+            rung: Successive halving round recorded with the result
+
+        Returns:
+            Result row
+        """
+        unknown = set(params) - set(SEARCHABLE_PARAMS)
+        if unknown:
+            raise ValueError(f"Parameters cannot be searched: {', '.join(sorted(unknown))}")
+
+        full_params = {**self.base_params, **params}
+        self.features.indicators(full_params)
+        features = self.features
+        if bars is not None and bars < len(self.data):
+            features = features.head(bars)
+        data = features.data
+
+        trades, values = run_vectorized(data, full_params, self.capital, COMMISSION, features, self.min_value)
+
+        row = {
+            "run_id": self.run_id,
+            "ticker": self.config.get("TICKER"),
+            "method": method,
+            "rung": rung,
+            "bars": len(data),
+        }
+        row.update({name: full_params[name] for name in SEARCHABLE_PARAMS})
+        row.update(_metrics(values, trades, self.capital, len(data)))
+        self._rows.append(row)
+        return row
+
+    def _rank(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Row positions from best to worst, runs stopped early last"""
+        sign = -1 if self.maximize else 1
+        return sorted(range(len(rows)), key=lambda i: (rows[i]["stopped"], sign * rows[i][self.objective]))
+
+    def _ranked(self, rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        return pd.DataFrame([rows[i] for i in self._rank(rows)]).reset_index(drop=True)
+
+    def grid_search(self, space: Dict[str, List[Any]]) -> pd.DataFrame:
+        """
+        Evaluate every combination of the given values
+
+        Args:
+            space: Values to try per parameter
+
+        Returns:
+            Result rows, best first
+        """
+        names = list(space)
+        rows = [
+            self.evaluate(dict(zip(names, values)), method="grid")
+            for values in itertools.product(*(space[name] for name in names))
+        ]
+        return self._ranked(rows)
+
+    def random_search(self, space: Dict[str, Any], n_iter: int, seed: Optional[int] = None) -> pd.DataFrame:
+        """
+        Evaluate randomly drawn candidates
+
+        Args:
+            space: Per parameter a list of values or a {"min": ..., "max": ...} range,
+                   integer when both bounds are
+            n_iter: Number of candidates
+            seed: Random seed
+
+        Returns:
+            Result rows, best first
+        """
+        rng = np.random.default_rng(seed)
+        rows = [self.evaluate(_sample(space, rng), method="random") for _ in range(n_iter)]
+        return self._ranked(rows)
+
+    def successive_halving(
+        self,
+        space: Dict[str, Any],
+        n_candidates: int,
+        eta: int = 3,
+        min_bars: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Successive halving over randomly drawn candidates
+
+        Each round runs the remaining candidates over a longer prefix of the
+        data and keeps the best 1/eta of them; the last round uses all bars.
+        Most candidates are therefore dropped after a short, cheap run.
+
+        Args:
+            space: As for random_search
+            n_candidates: Candidates in the first round
+            eta: Reduction factor between rounds
+            min_bars: Bars in the first round, at least twice the longest warm-up by default
+            seed: Random seed
+
+        Returns:
+            Result rows of the last round, best first
+        """
+        rng = np.random.default_rng(seed)
+        candidates = [_sample(space, rng) for _ in range(n_candidates)]
+        total_bars = len(self.data)
+        rungs = int(math.log(n_candidates, eta) + 1e-9) + 1 if n_candidates > 1 else 1
+        if min_bars is None:
+            min_bars = 2 * max(min_period({**self.base_params, **candidate}) for candidate in candidates)
+
+        rows = []
+        for rung in range(rungs):
+            bars = total_bars if rung == rungs - 1 else min(total_bars, max(min_bars, total_bars // eta ** (rungs - 1 - rung)))
+            rows = [self.evaluate(candidate, bars, "successive_halving", rung) for candidate in candidates]
+            if rung < rungs - 1:
+                keep = max(1, math.ceil(len(candidates) / eta))
+                candidates = [candidates[i] for i in self._rank(rows)[:keep]]
+
+        return self._ranked(rows)
+
+
+def save_results(results: pd.DataFrame, db_path: str, table: str = RESULTS_TABLE) -> None:
+    """Append result rows to an SQLite table"""
+    with sqlite3.connect(db_path) as connection:
+        results.to_sql(table, connection, if_exists="append", index=False)
+
+
+def query_results(db_path: str, query: str = f"SELECT * FROM {RESULTS_TABLE}", params=()) -> pd.DataFrame:
+    """
+    Read saved results, e.g.
+    query_results(path, "SELECT * FROM optimization_results WHERE ticker = ? ORDER BY final_value DESC", ("SBER",))
+    """
+    with sqlite3.connect(db_path) as connection:
+        return pd.read_sql_query(query, connection, params=params)
+
+
+def optimize_ticker(
+    data: pd.DataFrame,
+    config: Dict[str, Any],
+    options: Dict[str, Any],
+    db_path: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Run the search described by the OPTIMIZATION section of the config for one ticker
+
+    Args:
+        data: Market data
+        config: Strategy configuration
+        options: METHOD ("grid", "random" or "successive_halving"), SPACE and
+                 optionally OBJECTIVE, MAXIMIZE, MAX_LOSS, N_ITER, N_CANDIDATES, ETA, MIN_BARS, SEED
+        db_path: SQLite file to append every evaluation to
+
+    Returns:
+        Result rows, best first
+    """
+    optimizer = StrategyOptimizer(
+        data,
+        config,
+        objective=options.get("OBJECTIVE", "final_value"),
+        maximize=options.get("MAXIMIZE", True),
+        max_loss=options.get("MAX_LOSS")
+    )
+    method = options.get("METHOD", "random")
+    space = options["SPACE"]
+
+    if method == "grid":
+        ranked = optimizer.grid_search(space)
+    elif method == "random":
+        ranked = optimizer.random_search(space, options.get("N_ITER", 50), options.get("SEED"))
+    elif method == "successive_halving":
+        ranked = optimizer.successive_halving(
+            space,
+            options.get("N_CANDIDATES", 81),
+            eta=options.get("ETA", 3),
+            min_bars=options.get("MIN_BARS"),
+            seed=options.get("SEED")
+        )
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    if db_path is not None:
+        save_results(optimizer.results, db_path)
+    return ranked
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    config = config_operator.load_config()
+    if not config_operator.validate_config() or "OPTIMIZATION" not in config:
+        logger.error("Invalid configuration or no OPTIMIZATION section. Exiting.")
+        return
+
+    os.makedirs(RESULTS_PATH, exist_ok=True)
+    db_path = os.path.join(RESULTS_PATH, RESULTS_DB)
+    tinkoff_client = TinkoffDataClient()
+
+    for ticker_cfg in config["TICKERS"]:
+        ticker = ticker_cfg["TICKER"]
+        try:
+            data = tinkoff_client.load_market_data(
+                ticker=ticker,
+                exchange=ticker_cfg["EXCHANGE"],
+                interval=ticker_cfg["INTERVAL"],
+                start_date=ticker_cfg["START_DATE"],
+                end_date=ticker_cfg["END_DATE"],
+                csv_file_name=config_operator.get_csv_file_path(
+                    ticker, ticker_cfg["START_DATE"], ticker_cfg["END_DATE"], ticker_cfg["INTERVAL"]
+                )
+            )
+            local_config = {
+                **ticker_cfg,
+                "STOP_LOSS_METHOD": ticker_cfg.get("STOP_LOSS_METHOD", config.get("STOP_LOSS_METHOD", "weekly_minmax")),
+                "TAKE_PROFIT_METHOD": ticker_cfg.get("TAKE_PROFIT_METHOD", config.get("TAKE_PROFIT_METHOD", "weekly_minmax")),
+                "POSITION": ticker_cfg.get("POSITION", "long"),
+            }
+            results = optimize_ticker(data, local_config, config["OPTIMIZATION"], db_path)
+            logger.info(f"Best parameters for {ticker}:\n{results.head(5).to_string()}")
+        except Exception as e:
+            logger.exception(f"Error optimizing ticker {ticker}: {str(e)}")
+
+    logger.info(f"Optimization results saved to {db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import re
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pytz
+
+MOEX_TIMEZONE = pytz.timezone("Europe/Moscow")
+
+DAY = 24 * 60 * 60
+
+# 1970-01-05, the first Monday after the epoch, in days since the epoch
+EPOCH_MONDAY = 4
+
+# Interval suffixes: m - minutes, h - hours, d - days, w - weeks, M - months
+UNIT_SECONDS = {"m": 60, "h": 60 * 60, "d": DAY, "w": 7 * DAY}
+
+_INTERVAL_PATTERN = re.compile(r"^(\d+)([mhdwM])$")
+
+
+class Interval(NamedTuple):
+    """A candle interval: `multiple` minutes (m), hours (h), days (d), weeks (w) or months (M)"""
+
+    multiple: int
+    unit: str
+
+    def __str__(self) -> str:
+        return f"{self.multiple}{self.unit}"
+
+    @property
+    def intraday(self) -> bool:
+        return self.unit in ("m", "h")
+
+    @property
+    def seconds(self) -> Optional[int]:
+        """Length in seconds, None for months"""
+        unit = UNIT_SECONDS.get(self.unit)
+        return unit * self.multiple if unit is not None else None
+
+
+def parse_interval(interval: str) -> Interval:
+    """
+    Parse intervals such as '1m', '2h', '3d', '1w' or '1M'
+
+    Args:
+        interval: Interval string
+
+    Returns:
+        Parsed interval
+
+    Raises:
+        ValueError: On unknown units and intraday intervals longer than a day
+    """
+    match = _INTERVAL_PATTERN.match(interval.strip())
+    if not match:
+        raise ValueError(f"Invalid interval: {interval}")
+
+    parsed = Interval(int(match.group(1)), match.group(2))
+    if parsed.multiple < 1 or (parsed.intraday and parsed.seconds > DAY):
+        raise ValueError(f"Invalid interval: {interval}")
+    return parsed
+
+
+def _local_times(times: np.ndarray, tz) -> Tuple[np.ndarray, np.ndarray]:
+    """Wall-clock epoch seconds in `tz` and the UTC offsets used, looked up once per UTC day"""
+    days, inverse = np.unique(times // DAY, return_inverse=True)
+    offsets = np.array(
+        [datetime.fromtimestamp(int(day) * DAY + DAY // 2, tz).utcoffset().total_seconds() for day in days.tolist()],
+        dtype=np.int64
+    )[inverse]
+    return times + offsets, offsets
+
+
+def _bucket_labels(local: np.ndarray, interval: Interval) -> np.ndarray:
+    """Local start of the bucket every wall-clock timestamp belongs to"""
+    days = local // DAY
+    multiple = interval.multiple
+
+    if interval.intraday:
+        # Intraday buckets restart every trading day and never mix two sessions
+        step = interval.seconds
+        return days * DAY + (local - days * DAY) // step * step
+
+    if interval.unit == "d":
+        return (days - days % multiple) * DAY
+
+    if interval.unit == "w":
+        weeks = (days - EPOCH_MONDAY) // 7
+        return ((weeks - weeks % multiple) * 7 + EPOCH_MONDAY) * DAY
+
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return (months - months % multiple).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) * DAY
+
+
+def _bucket_end(label: int, interval: Interval) -> int:
+    """Local end of the bucket starting at local time `label`"""
+    if interval.intraday:
+        return min(label + interval.seconds, (label // DAY + 1) * DAY)
+    if interval.unit == "M":
+        month = np.datetime64(label // DAY, "D").astype("datetime64[M]") + interval.multiple
+        return int(month.astype("datetime64[D]").astype(np.int64)) * DAY
+    return label + interval.seconds
+
+
+def bucket_start(timestamp: int, interval: Interval, tz=MOEX_TIMEZONE) -> int:
+    """
+    Start of the bucket containing `timestamp`
+
+    Args:
+        timestamp: Epoch seconds
+        interval: Target interval
+        tz: Exchange timezone
+
+    Returns:
+        Epoch seconds
+    """
+    local, offsets = _local_times(np.array([timestamp], dtype=np.int64), tz)
+    return int(_bucket_labels(local, interval)[0] - offsets[0])
+
+
+def resample_columns(columns: Dict[str, np.ndarray], interval: Interval, until: int, tz=MOEX_TIMEZONE) -> Dict[str, np.ndarray]:
+    """
+    Aggregate candle columns into a coarser interval
+
+    Buckets follow the exchange's wall clock in `tz`: intraday buckets are
+    aligned to local midnight and never span two trading days, days, weeks
+    (from Monday) and months are calendar periods, and multiples of them are
+    counted from the epoch, so boundaries do not depend on the loaded range.
+
+    Args:
+        columns: Column arrays sorted by time, as returned by CandleStore.read
+        interval: Target interval, coarser than the candles in `columns`
+        until: End of the range the candles were loaded for, epoch seconds.
+               Buckets ending later are marked incomplete.
+        tz: Exchange timezone
+
+    Returns:
+        Column arrays with one candle per bucket, labelled with the bucket start
+    """
+    times = columns["time"]
+    if not len(times):
+        return {name: values[:0].copy() for name, values in columns.items()}
+
+    local, offsets = _local_times(times, tz)
+    labels = _bucket_labels(local, interval)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(times)]
+
+    is_complete = np.logical_and.reduceat(columns["is_complete"], starts)
+    if _bucket_end(int(labels[starts[-1]]), interval) - int(offsets[starts[-1]]) > until:
+        is_complete[-1] = False
+
+    return {
+        "time": labels[starts] - offsets[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends - 1],
+        "volume": np.add.reduceat(columns["volume"], starts),
+        "is_complete": is_complete,
+    }
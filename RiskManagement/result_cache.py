@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtrader_complex import COMMISSION, strategy_params
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results_bt_complex", "cache")
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Part of every key: bump when a change to the strategy or the engines changes results
+CACHE_VERSION = 1
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """
+    Hash of what a backtest computes with, given its data
+
+    Ticker, dates and interval are left out, they are covered by the
+    candles. Numbers are compared as floats, so a CAPITAL of 100000 and
+    100000.0 give the same hash.
+    """
+    params = strategy_params(config)
+    params.pop("features", None)
+    normalized = {
+        "version": CACHE_VERSION,
+        "engine": config.get("ENGINE", "backtrader"),
+        "capital": float(config["CAPITAL"]),
+        "commission": COMMISSION,
+        "params": {
+            name: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+            for name, value in params.items()
+        },
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Hash of the bar times and OHLCV values"""
+    digest = hashlib.sha256()
+    digest.update(pd.DatetimeIndex(data.index).values.astype("datetime64[ns]").view(np.int64).tobytes())
+    for column in ("open", "high", "low", "close", "volume"):
+        digest.update(data[column].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(config: Dict[str, Any], data: pd.DataFrame) -> str:
+    return hashlib.sha256(f"{config_hash(config)}:{data_fingerprint(data)}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Backtest results on disk, one JSON file per cache_key()
+
+    Reads refresh a file's modification time; once the files take more
+    than `max_bytes`, the least recently used are deleted. Files are
+    replaced atomically, so several processes can share the directory.
+    """
+
+    def __init__(self, root: str = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            root: Cache directory
+            max_bytes: Total size the cache files are trimmed to
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                result = json.load(f)
+            os.utime(path)
+            return result
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.exception(f"Failed to read cached backtest result {path}")
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception(f"Failed to cache backtest result {path}")
+            return
+        self.evict()
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            yield entry.path, stat.st_size, stat.st_mtime
+
+    def evict(self) -> int:
+        """Delete the least recently used results until the cache fits in max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            return removed
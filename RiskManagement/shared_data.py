@@ -0,0 +1,84 @@
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Shared memory name, number of bars, column names, index timezone and name
+FrameDescriptor = Tuple[str, int, Tuple[str, ...], Optional[str], Optional[str]]
+
+# Frames attached in this process, kept with their memory blocks so the views stay valid
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, pd.DataFrame]] = {}
+
+
+def _views(buffer, length: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Index (int64 nanoseconds) and column (float64, one row per column) arrays over a shared block"""
+    times = np.ndarray((length,), dtype=np.int64, buffer=buffer)
+    values = np.ndarray((width, length), dtype=np.float64, buffer=buffer, offset=length * 8)
+    return times, values
+
+
+class SharedFrame:
+    """
+    A DataFrame of numeric columns, OHLCV by default, copied once into shared memory
+
+    Worker processes rebuild the frame from `descriptor` with attach_frame()
+    without the data being pickled per task. The creating process owns the
+    memory and must call close() once the workers are done.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: Optional[Sequence[str]] = COLUMNS):
+        """
+        Args:
+            data: Frame with a DatetimeIndex
+            columns: Columns to share, None for all of them
+        """
+        index = pd.DatetimeIndex(data.index)
+        columns = tuple(data.columns if columns is None else columns)
+        length = len(data)
+        self._shm = shared_memory.SharedMemory(create=True, size=max((len(columns) + 1) * length * 8, 1))
+
+        times, values = _views(self._shm.buf, length, len(columns))
+        times[:] = index.values.astype("datetime64[ns]").view(np.int64)
+        for row, column in enumerate(columns):
+            values[row] = data[column].to_numpy(dtype=np.float64)
+
+        tz = str(index.tz) if index.tz is not None else None
+        self.descriptor: FrameDescriptor = (self._shm.name, length, columns, tz, index.name)
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedFrame":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach_frame(descriptor: FrameDescriptor) -> pd.DataFrame:
+    """
+    DataFrame over the shared memory of a SharedFrame, without copying
+
+    Args:
+        descriptor: SharedFrame.descriptor
+
+    Returns:
+        Frame with the shared columns as float64, cached for the life of the process
+    """
+    name, length, columns, tz, index_name = descriptor
+    if name in _attached:
+        return _attached[name][1]
+
+    shm = shared_memory.SharedMemory(name=name)
+    times, values = _views(shm.buf, length, len(columns))
+    index = pd.DatetimeIndex(times.view("datetime64[ns]"), name=index_name)
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+
+    data = pd.DataFrame(values.T, index=index, columns=list(columns), copy=False)
+    _attached[name] = (shm, data)
+    return data
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import backtrader_complex
+from backtest_service import run_backtest, summarize
+from test_vector_backtest import make_config, make_data
+
+
+def ticker_config(stop_loss_method, take_profit_method):
+    return {
+        "TICKER": "TEST",
+        "EXCHANGE": "MOEX",
+        "INTERVAL": "1d",
+        "START_DATE": "2020-01-01",
+        "END_DATE": "2021-12-31",
+        **make_config(stop_loss_method, take_profit_method, "long", "backtrader"),
+    }
+
+
+def test_result_matches_backtest():
+    data = make_data(11)
+    config = ticker_config("weekly_minmax", "weekly_minmax")
+    progress = []
+
+    result = run_backtest(config, data=data, progress=progress.append)
+    results_df, trades = backtrader_complex.backtest(data, config)
+
+    assert result["trades"] == trades
+    assert result["summary"]["final_balance"] == results_df["Balance"].iloc[-1]
+    assert result["summary"]["trade_count"] == results_df["Entry"].count()
+    assert [point["Balance"] for point in result["balance_curve"]] == results_df["Balance"].tolist()
+    assert result["balance_curve"][0]["Date"] == "2020-01-01 07:00:00"
+    assert progress == [0.4, 0.9]
+
+
+def test_concurrent_runs_do_not_share_state():
+    data = make_data(12)
+    configs = [ticker_config(sl, tp) for sl, tp in [("weekly_minmax", "ma_distance"), ("volatility_stop", "monthly_minmax")] * 2]
+    globals_before = (backtrader_complex.CONFIG_FILE, backtrader_complex.RESULTS_PATH)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda config: run_backtest(config, data=data), configs))
+
+    assert results[0] == results[2]
+    assert results[1] == results[3]
+    assert results[0]["trades"] != results[1]["trades"]
+    assert (backtrader_complex.CONFIG_FILE, backtrader_complex.RESULTS_PATH) == globals_before
+
+
+def test_summary_without_trades():
+    results_df = pd.DataFrame({"Date": pd.date_range("2024-01-01", periods=3), "Close": [1.0, 2.0, 3.0], "Balance": [1000.0] * 3})
+
+    summary = summarize(results_df, 1000.0)
+
+    assert summary["trade_count"] == 0
+    assert summary["win_rate"] == 0
+    assert summary["profit_loss"] == 0
+    assert summarize(results_df.iloc[:0], 1000.0) == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
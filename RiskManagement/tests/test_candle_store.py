@@ -0,0 +1,201 @@
+import json
+import multiprocessing
+import numpy as np
+import pytest
+import sys
+import os
+from contextlib import nullcontext
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from candle_store import CandleStore, subtract_ranges
+import tinkoff_data
+from tinkoff_data import TinkoffDataClient, plan_fetches
+from tinkoff.invest import RequestError
+
+DAY = 24 * 60 * 60
+FIGI = "BBG004730N88"
+
+
+def make_columns(times, close_offset=0.0, is_complete=True):
+    times = np.asarray(times, dtype=np.int64)
+    close = times / DAY + close_offset
+    return {
+        "time": times,
+        "open": close - 1,
+        "high": close + 1,
+        "low": close - 2,
+        "close": close,
+        "volume": np.full(len(times), 100, dtype=np.int64),
+        "is_complete": np.full(len(times), is_complete, dtype=np.bool_),
+    }
+
+
+def epoch(date):
+    return int(pytz.UTC.localize(datetime.strptime(date, "%Y-%m-%d")).timestamp())
+
+
+def test_subtract_ranges():
+    covered = [(10, 20), (30, 40)]
+    assert subtract_ranges(0, 50, covered) == [(0, 10), (20, 30), (40, 50)]
+    assert subtract_ranges(12, 18, covered) == []
+    assert subtract_ranges(15, 35, covered) == [(20, 30)]
+
+
+def test_store_merges_overlapping_writes_across_partitions(tmp_path):
+    store = CandleStore(str(tmp_path))
+    first = np.arange(epoch("2023-12-20"), epoch("2024-01-05"), DAY)
+    second = np.arange(epoch("2024-01-01"), epoch("2024-01-10"), DAY)
+
+    store.write(FIGI, "1d", make_columns(first), epoch("2023-12-20"), epoch("2024-01-05"))
+    store.write(FIGI, "1d", make_columns(second, close_offset=0.5), epoch("2024-01-01"), epoch("2024-01-10"))
+
+    assert sorted(os.listdir(tmp_path / FIGI / "1d")) == ["2023.npy", "2024.npy", "coverage.json"]
+    assert store.coverage(FIGI, "1d") == [(epoch("2023-12-20"), epoch("2024-01-10"))]
+
+    columns = store.read(FIGI, "1d", epoch("2023-12-30"), epoch("2024-01-03"))
+    assert columns["time"].tolist() == list(range(epoch("2023-12-30"), epoch("2024-01-03") + 1, DAY))
+    # The newer download replaces overlapping candles
+    assert columns["close"][-1] == epoch("2024-01-03") / DAY + 0.5
+    assert columns["close"][0] == epoch("2023-12-30") / DAY
+
+
+def test_incomplete_candles_are_not_marked_covered(tmp_path):
+    store = CandleStore(str(tmp_path))
+    columns = make_columns([epoch("2024-01-01"), epoch("2024-01-02")])
+    columns["is_complete"][-1] = False
+
+    store.write(FIGI, "1d", columns, epoch("2024-01-01"), epoch("2024-01-03"))
+
+    assert store.missing(FIGI, "1d", epoch("2024-01-01"), epoch("2024-01-03")) == [(epoch("2024-01-02"), epoch("2024-01-03"))]
+
+
+HOUR = 60 * 60
+
+
+def write_hour_chunks(root, first_chunk, chunks, step):
+    store = CandleStore(root)
+    for chunk in range(first_chunk, chunks, step):
+        start = epoch("2024-01-01") + chunk * 10 * HOUR
+        store.write(FIGI, "1h", make_columns(np.arange(start, start + 10 * HOUR, HOUR)), start, start + 10 * HOUR)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_processes_writing_one_partition_lose_nothing(tmp_path):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_hour_chunks, args=(str(tmp_path), i, 120, 4)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 4
+
+    store = CandleStore(str(tmp_path))
+    end = epoch("2024-01-01") + 1200 * HOUR
+    assert store.coverage(FIGI, "1h") == [(epoch("2024-01-01"), end)]
+    assert store.read(FIGI, "1h", epoch("2024-01-01"), end)["time"].tolist() == list(range(epoch("2024-01-01"), end, HOUR))
+    assert sorted(os.listdir(tmp_path / FIGI / "1h")) == ["2024.npy", "coverage.json"]
+
+
+def test_stored_data_downloads_only_missing_ranges(tmp_path):
+    client = TinkoffDataClient(token="token", store=CandleStore(str(tmp_path)))
+    requests = []
+
+    def fetch(api, figi, interval, start, end):
+        requests.append((start, end))
+        return make_columns(np.arange(start, end, DAY))
+
+    client._client = lambda: nullcontext()
+    client._fetch_chunk = fetch
+
+    data = client.get_stored_data(FIGI, "1d", "2023-01-01", "2023-03-01")
+    assert len(data) == 59
+    extended = client.get_stored_data(FIGI, "1d", "2023-01-01", "2023-03-02")
+
+    # Extending the range by one day costs one small request
+    assert requests == [(epoch("2023-01-01"), epoch("2023-03-01")), (epoch("2023-03-01"), epoch("2023-03-02"))]
+    assert len(extended) == 60
+    assert extended.index.is_monotonic_increasing
+
+    # Without downloading, only fully stored ranges are returned
+    assert len(client.get_stored_data(FIGI, "1d", "2023-01-01", "2023-03-02", download=False)) == 60
+    assert client.get_stored_data(FIGI, "1d", "2023-01-01", "2023-03-03", download=False) is None
+    assert len(requests) == 2
+
+
+def test_stored_data_resolves_tickers_from_saved_index_only(tmp_path, monkeypatch):
+    index_file = tmp_path / "instruments.json"
+    # A stale index is still good enough for reading stored candles
+    index_file.write_text(json.dumps({"loaded_at": 0, "figi": {"SBER:TQBR": FIGI}}))
+    monkeypatch.setattr(tinkoff_data, "INSTRUMENTS_CACHE_FILE", str(index_file))
+    monkeypatch.setattr(TinkoffDataClient, "_figi_index", {})
+    monkeypatch.setattr(TinkoffDataClient, "_figi_index_loaded_at", None)
+
+    store = CandleStore(str(tmp_path))
+    store.write(FIGI, "1d", make_columns(np.arange(epoch("2023-01-01"), epoch("2023-01-10"), DAY)), epoch("2023-01-01"), epoch("2023-01-10"))
+    client = TinkoffDataClient(token="token", store=store)
+
+    def no_api():
+        raise AssertionError("the API should not be called")
+
+    client._client = no_api
+
+    assert len(client.get_stored_data("SBER", "1d", "2023-01-01", "2023-01-09", download=False)) == 9
+    assert client.get_stored_data("GAZP", "1d", "2023-01-01", "2023-01-09", download=False) is None
+    index_file.unlink()
+    assert client.get_stored_data("SBER", "1d", "2023-01-01", "2023-01-09", download=False) is None
+
+
+def test_plan_fetches_splits_by_request_window():
+    missing = [(0, 3 * DAY + 5), (10 * DAY, 10 * DAY + 60)]
+    assert plan_fetches(missing, "1m") == [(0, DAY), (DAY, 2 * DAY), (2 * DAY, 3 * DAY), (3 * DAY, 3 * DAY + 5), (10 * DAY, 10 * DAY + 60)]
+    assert plan_fetches(missing, "1d") == missing
+
+
+def test_concurrent_fetch_stores_every_chunk(tmp_path):
+    client = TinkoffDataClient(token="token", store=CandleStore(str(tmp_path)))
+    client._client = lambda: nullcontext()
+    client._fetch_chunk = lambda api, figi, interval, start, end: make_columns(np.arange(start, end, 3600))
+
+    data = client.get_stored_data(FIGI, "1h", "2023-01-01", "2023-02-01")
+
+    assert len(data) == 31 * 24
+    assert data.index.is_monotonic_increasing
+    assert client.store.coverage(FIGI, "1h") == [(epoch("2023-01-01"), epoch("2023-02-01"))]
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(tinkoff_data.time, "sleep", lambda seconds: None)
+    client = TinkoffDataClient(token="token")
+    attempts = []
+    candle = SimpleNamespace(
+        time=datetime(2023, 1, 3, tzinfo=pytz.UTC), volume=1, is_complete=True,
+        open=SimpleNamespace(units=1, nano=0), high=SimpleNamespace(units=2, nano=0),
+        low=SimpleNamespace(units=1, nano=0), close=SimpleNamespace(units=2, nano=0)
+    )
+
+    def get_candles(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) < 3:
+            raise RequestError(tinkoff_data.grpc.StatusCode.UNAVAILABLE, "unavailable", None)
+        return SimpleNamespace(candles=[candle])
+
+    api = SimpleNamespace(market_data=SimpleNamespace(get_candles=get_candles))
+    columns = client._fetch_chunk(api, FIGI, "1d", epoch("2023-01-01"), epoch("2023-01-10"))
+
+    assert len(attempts) == 3
+    assert columns["close"].tolist() == [2.0]
+
+    def invalid(**kwargs):
+        raise RequestError(tinkoff_data.grpc.StatusCode.INVALID_ARGUMENT, "bad figi", None)
+
+    with pytest.raises(RequestError):
+        client._fetch_chunk(SimpleNamespace(market_data=SimpleNamespace(get_candles=invalid)), FIGI, "1d", 0, DAY)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,61 @@
+import backtrader as bt
+import pandas as pd
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backtrader_complex import MultiStopTakeStrategy, backtest, strategy_params
+from features import FeatureMatrix
+from test_vector_backtest import STOP_LOSS_METHODS, TAKE_PROFIT_METHODS, make_config, make_data
+
+
+class RecordIndicators(MultiStopTakeStrategy):
+    def start(self):
+        self.recorded = {name: [] for name in ("atr", "rsi", "ema_fast", "ema_slow", "ma_medium", "crossover_medium")}
+
+    def next(self):
+        for name, values in self.recorded.items():
+            values.append(getattr(self, name)[0])
+
+
+def test_indicators_match_backtrader():
+    data = make_data(3)
+    params = strategy_params(make_config("weekly_minmax", "weekly_minmax", "long", "backtrader"))
+    cerebro = bt.Cerebro()
+    cerebro.adddata(bt.feeds.PandasData(dataname=data))
+    cerebro.addstrategy(RecordIndicators, **params)
+    strategy = cerebro.run()[0]
+
+    indicators = FeatureMatrix(data).indicators(params)
+    for name, values in strategy.recorded.items():
+        assert indicators[name][-len(values):].tolist() == values, name
+
+
+def test_features_are_computed_once():
+    data = make_data(1)
+    params = strategy_params(make_config("weekly_minmax", "weekly_minmax", "long", "backtrader"))
+    features = FeatureMatrix(data, params)
+    columns = set(features.to_frame().columns)
+
+    assert {"low_min_5", "high_max_20", "low_min_60", "atr_14", "rsi_7", "sma_60", "ema_8", "crossover_8_20"} <= columns
+    assert features.sma(20) is features.sma(20)
+    pd.testing.assert_frame_equal(features.head(200).to_frame(), FeatureMatrix(data.iloc[:200], params).to_frame())
+
+
+@pytest.mark.parametrize("position", ["long", "short"])
+def test_backtrader_reading_features_matches_own_indicators(position):
+    data = make_data(4, volatility=0.04)
+    features = FeatureMatrix(data)
+    for stop_loss_method, take_profit_method in zip(STOP_LOSS_METHODS, TAKE_PROFIT_METHODS + ["ma_distance"]):
+        config = make_config(stop_loss_method, take_profit_method, position, "backtrader")
+        expected_df, expected_trades = backtest(data, config)
+        result_df, result_trades = backtest(data, config, features)
+
+        assert result_trades == expected_trades
+        pd.testing.assert_frame_equal(result_df, expected_df)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
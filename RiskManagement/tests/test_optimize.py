@@ -0,0 +1,109 @@
+import json
+import pandas as pd
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import optimize
+from backtrader_complex import backtest
+from optimize import SEARCHABLE_PARAMS, StrategyOptimizer, query_results, save_results
+from test_vector_backtest import make_config, make_data
+
+
+@pytest.fixture
+def optimizer():
+    return StrategyOptimizer(make_data(1, bars=400), make_config("volatility_stop", "ma_distance", "long", "vectorized"))
+
+
+def test_grid_search_matches_backtest(optimizer):
+    results = optimizer.grid_search({"ma_fast": [5, 8], "atr_multiplier": [1.0, 1.5]})
+
+    assert len(results) == 4
+    assert results["final_value"].is_monotonic_decreasing
+    best = results.iloc[0]
+    config = make_config("volatility_stop", "ma_distance", "long", "backtrader")
+    config["STRATEGY_PARAMS"] = {"ma_fast": int(best["ma_fast"]), "atr_multiplier": float(best["atr_multiplier"])}
+    _, trades = backtest(optimizer.data, config)
+    assert best["trades"] == sum(1 for trade in trades if trade["buy_or_sell"] == "SELL")
+
+
+def test_indicators_are_shared_between_candidates(optimizer):
+    optimizer.random_search({"ma_fast": [5, 8], "rsi_period": [7, 14], "profit_to_risk": {"min": 1.0, "max": 3.0}}, n_iter=20, seed=1)
+
+    columns = set(optimizer.features.to_frame().columns)
+    assert {name for name in columns if name.startswith("sma_")} == {"sma_5", "sma_8", "sma_20", "sma_60"}
+    assert {name for name in columns if name.startswith("rsi_")} <= {"rsi_7", "rsi_14"}
+    assert optimizer.results["profit_to_risk"].between(1.0, 3.0).all()
+
+
+def test_successive_halving_narrows_candidates(optimizer):
+    results = optimizer.successive_halving({"ma_fast": {"min": 3, "max": 15}, "atr_multiplier": [1.0, 1.5, 2.0]},
+                                           n_candidates=9, eta=3, seed=0)
+
+    rounds = optimizer.results.groupby("rung").agg(candidates=("bars", "size"), bars=("bars", "max"))
+    assert rounds["candidates"].tolist() == [9, 3, 1]
+    assert rounds["bars"].is_monotonic_increasing
+    assert rounds["bars"].iloc[-1] == 400
+    assert len(results) == 1
+
+
+def test_hopeless_candidates_stop_early():
+    optimizer = StrategyOptimizer(make_data(1, bars=400), make_config("volatility_stop", "ma_distance", "long", "vectorized"),
+                                  max_loss=0.0001)
+
+    row = optimizer.evaluate({"risk_percent": 0.2})
+
+    assert row["stopped"]
+    assert row["final_value"] < 100000.0 * (1 - 0.0001)
+
+
+def test_results_are_queryable(optimizer, tmp_path):
+    optimizer.grid_search({"min_trade_bars": [1, 3, 5]})
+    db_path = str(tmp_path / "optimization.sqlite")
+
+    save_results(optimizer.results, db_path)
+    save_results(optimizer.results, db_path)
+
+    best = query_results(db_path, "SELECT min_trade_bars, MAX(final_value) AS best FROM optimization_results GROUP BY min_trade_bars")
+    assert len(best) == 3
+    assert set(SEARCHABLE_PARAMS) <= set(query_results(db_path).columns)
+
+
+def test_main_keeps_per_ticker_methods(monkeypatch, tmp_path):
+    with open(os.path.join(os.path.dirname(__file__), "..", "config_ru.json")) as config_file:
+        config = json.load(config_file)
+    config["TICKERS"] = config["TICKERS"][:2]
+    config["TICKERS"][0]["STOP_LOSS_METHOD"] = "volatility_stop"
+    runs = []
+
+    monkeypatch.setattr(optimize, "config_operator", SimpleNamespace(
+        load_config=lambda: config, validate_config=lambda: True, get_csv_file_path=lambda *args: None
+    ))
+    monkeypatch.setattr(optimize, "TinkoffDataClient", lambda: SimpleNamespace(load_market_data=lambda **kwargs: None))
+    monkeypatch.setattr(optimize, "RESULTS_PATH", str(tmp_path))
+
+    def optimize_ticker(data, local_config, options, db_path):
+        runs.append((local_config, options))
+        return pd.DataFrame()
+
+    monkeypatch.setattr(optimize, "optimize_ticker", optimize_ticker)
+    optimize.main()
+
+    assert [local_config["STOP_LOSS_METHOD"] for local_config, _ in runs] == ["volatility_stop", config["STOP_LOSS_METHOD"]]
+    assert all(options is config["OPTIMIZATION"] for _, options in runs)
+
+
+def test_configured_search_runs():
+    with open(os.path.join(os.path.dirname(__file__), "..", "config_ru.json")) as config_file:
+        options = {**json.load(config_file)["OPTIMIZATION"], "N_CANDIDATES": 3}
+
+    results = optimize.optimize_ticker(make_data(1, bars=400), make_config("volatility_stop", "ma_distance", "long", "vectorized"), options)
+
+    assert len(results) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backtrader_complex import run_sweep
+from shared_data import SharedFrame, attach_frame
+from test_vector_backtest import make_data
+
+
+def make_main_config(tickers):
+    return {
+        "TICKERS": [{
+            "TICKER": ticker,
+            "EXCHANGE": "MOEX",
+            "START_DATE": "2020-01-01",
+            "END_DATE": "2021-12-31",
+            "INTERVAL": "1d",
+            "CAPITAL": 100000.0,
+            "RISK_PERCENT": 0.02,
+            "PROFIT_TO_RISK": 2.0,
+            "ATR_MULTIPLIER": 1.2,
+            "ATR_WINDOW": 14
+        } for ticker in tickers],
+        "STOP_LOSS_METHODS": ["volatility_stop", "weekly_minmax"],
+        "TAKE_PROFIT_METHODS": ["ma_distance", "prev_bar_5_percent"],
+        "ENGINE": "vectorized"
+    }
+
+
+def test_shared_frame_round_trip():
+    data = make_data(1, bars=100)
+    data.index = data.index.tz_convert("Europe/Moscow")
+
+    with SharedFrame(data) as shared:
+        attached = attach_frame(shared.descriptor)
+        pd.testing.assert_frame_equal(attached, data, check_freq=False, check_index_type=False)
+        assert attach_frame(shared.descriptor) is attached
+
+
+def test_parallel_sweep_matches_sequential(tmp_path):
+    datasets = {"AAA": make_data(1, bars=300), "BBB": make_data(2, bars=300)}
+    main_config = make_main_config(["AAA", "BBB"])
+
+    sequential = run_sweep(datasets, main_config, workers=1, strategies_results_path=str(tmp_path / "sequential"))
+    parallel = run_sweep(datasets, main_config, workers=2, strategies_results_path=str(tmp_path / "parallel"))
+
+    assert list(parallel) == ["AAA", "BBB"]
+    for ticker in datasets:
+        pd.testing.assert_frame_equal(parallel[ticker], sequential[ticker])
+        assert list(zip(parallel[ticker]["Stop_Loss_Method"], parallel[ticker]["Take_Profit_Method"])) == [
+            ("volatility_stop", "ma_distance"), ("volatility_stop", "prev_bar_5_percent"),
+            ("weekly_minmax", "ma_distance"), ("weekly_minmax", "prev_bar_5_percent"),
+        ]
+    assert len(os.listdir(tmp_path / "parallel")) == 8
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+import sys
+import os
+from contextlib import nullcontext
+from datetime import datetime
+
+import pytz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from candle_store import CandleStore
+from resample import MOEX_TIMEZONE, bucket_start, parse_interval, resample_columns
+from tinkoff_data import TinkoffDataClient, base_interval
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+FIGI = "BBG004730N88"
+
+
+def make_columns(times):
+    times = np.asarray(times, dtype=np.int64)
+    index = np.arange(len(times), dtype=np.float64)
+    return {
+        "time": times,
+        "open": index,
+        "high": index + 10,
+        "low": index - 10,
+        "close": index + 0.5,
+        "volume": np.ones(len(times), dtype=np.int64),
+        "is_complete": np.ones(len(times), dtype=np.bool_),
+    }
+
+
+def moscow(value):
+    return int(MOEX_TIMEZONE.localize(datetime.strptime(value, "%Y-%m-%d %H:%M")).timestamp())
+
+
+def test_parse_interval():
+    assert str(parse_interval("4h")) == "4h"
+    assert parse_interval("1M").unit == "M"
+    assert parse_interval("90m").seconds == 90 * 60
+    for invalid in ("h", "2y", "25h", "0d"):
+        with pytest.raises(ValueError):
+            parse_interval(invalid)
+
+
+def test_intraday_buckets_follow_moscow_sessions():
+    # Hourly candles from 18:00 to 02:00 Moscow time
+    columns = make_columns(np.arange(moscow("2024-03-04 18:00"), moscow("2024-03-05 03:00"), HOUR))
+
+    result = resample_columns(columns, parse_interval("5h"), until=moscow("2024-03-06 00:00"))
+
+    # 5h buckets restart at Moscow midnight instead of running across it
+    assert result["time"].tolist() == [moscow("2024-03-04 15:00"), moscow("2024-03-04 20:00"), moscow("2024-03-05 00:00")]
+    assert result["open"].tolist() == [0, 2, 6]
+    assert result["close"].tolist() == [1.5, 5.5, 8.5]
+    assert result["high"].tolist() == [11, 15, 18]
+    assert result["low"].tolist() == [-10, -8, -4]
+    assert result["volume"].tolist() == [2, 4, 3]
+
+
+def test_calendar_buckets():
+    days = np.arange(moscow("2024-01-01 07:00"), moscow("2024-04-01 07:00"), DAY)
+    columns = make_columns(days)
+
+    weeks = resample_columns(columns, parse_interval("1w"), until=moscow("2024-04-01 07:00"))
+    # 2024-01-01 is a Monday
+    assert weeks["time"][0] == moscow("2024-01-01 00:00")
+    assert np.all(np.diff(weeks["time"]) == 7 * DAY)
+    assert weeks["volume"][0] == 7
+
+    quarters = resample_columns(columns, parse_interval("3M"), until=moscow("2024-04-01 07:00"))
+    assert quarters["time"].tolist() == [moscow("2024-01-01 00:00")]
+    assert quarters["volume"].tolist() == [91]
+
+
+def test_unfinished_bucket_is_incomplete():
+    columns = make_columns(np.arange(moscow("2024-01-01 10:00"), moscow("2024-01-01 14:00"), HOUR))
+
+    result = resample_columns(columns, parse_interval("2h"), until=moscow("2024-01-01 13:30"))
+
+    assert result["is_complete"].tolist() == [True, False]
+    assert bucket_start(moscow("2024-01-01 13:30"), parse_interval("2h")) == moscow("2024-01-01 12:00")
+
+
+def test_derived_intervals_reuse_stored_base(tmp_path):
+    client = TinkoffDataClient(token="token", store=CandleStore(str(tmp_path)))
+    requests = []
+
+    def fetch(api, figi, interval, start, end):
+        requests.append((interval, start, end))
+        return make_columns(np.arange(start, end, HOUR))
+
+    client._client = lambda: nullcontext()
+    client._fetch_chunk = fetch
+
+    four_hours = client.get_stored_data(FIGI, "4h", "2023-01-02", "2023-01-05")
+    two_hours = client.get_stored_data(FIGI, "2h", "2023-01-02", "2023-01-05")
+
+    assert base_interval(parse_interval("4h")) == "1h"
+    assert base_interval(parse_interval("1w")) == "1d"
+    assert base_interval(parse_interval("30m")) == "15m"
+    assert {interval for interval, _, _ in requests} == {"1h"}
+    assert len(requests) == 1
+    assert os.listdir(tmp_path / FIGI) == ["1h"]
+    assert (four_hours.index[1] - four_hours.index[0]).total_seconds() == 4 * HOUR
+    assert (two_hours.index[1] - two_hours.index[0]).total_seconds() == 2 * HOUR
+    # Both start at a Moscow bucket boundary at or before 2023-01-02 03:00 MSK
+    assert four_hours.index[0] == pytz.UTC.localize(datetime(2023, 1, 1, 21))
+    assert two_hours.index[0] == pytz.UTC.localize(datetime(2023, 1, 1, 23))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import backtest_service
+from result_cache import ResultCache, cache_key, config_hash, data_fingerprint
+from test_backtest_service import ticker_config
+from test_vector_backtest import make_data
+
+
+class StoredDataClient:
+    """Client whose candle store holds `data`, or nothing"""
+
+    def __init__(self, data=None):
+        self.data = data
+
+    def get_stored_data(self, ticker, interval, from_date, to_date, download=True):
+        assert not download
+        return self.data
+
+
+def test_config_hash_normalization():
+    config = ticker_config("weekly_minmax", "weekly_minmax")
+
+    same = {**config, "CAPITAL": 100000, "TICKER": "OTHER", "START_DATE": "2019-01-01"}
+    assert config_hash(same) == config_hash(config)
+    assert config_hash({**config, "STRATEGY_PARAMS": {"ma_fast": 8}}) == config_hash(config)
+    assert config_hash({**config, "STOP_LOSS_METHOD": "daily_minmax"}) != config_hash(config)
+    assert config_hash({**config, "RISK_PERCENT": 0.03}) != config_hash(config)
+    assert config_hash({**config, "ENGINE": "vectorized"}) != config_hash(config)
+
+
+def test_data_fingerprint():
+    data = make_data(21, bars=100)
+    changed = data.copy()
+    changed.iloc[50, changed.columns.get_loc("close")] += 0.01
+
+    assert data_fingerprint(data.copy()) == data_fingerprint(data)
+    assert data_fingerprint(changed) != data_fingerprint(data)
+    assert data_fingerprint(data.iloc[1:]) != data_fingerprint(data)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1_000_000)
+    result = {"trades": [], "balance_curve": [{"Balance": 1.0}] * 200}
+    for key in ("a", "b", "c"):
+        cache.put(key, result)
+        time.sleep(0.01)
+
+    size = os.path.getsize(tmp_path / "a.json")
+    cache.max_bytes = 3 * size
+    assert cache.get("a") == result
+    time.sleep(0.01)
+    cache.put("d", result)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == result
+    assert cache.get("c") == result
+    assert cache.size() <= cache.max_bytes
+
+
+def test_repeated_run_is_served_from_cache(tmp_path, monkeypatch):
+    data = make_data(22)
+    config = ticker_config("volatility_stop", "ma_distance")
+    cache = ResultCache(str(tmp_path))
+
+    first = backtest_service.run_backtest(config, data=data, cache=cache)
+    assert os.path.exists(tmp_path / f"{cache_key(config, data)}.json")
+    assert backtest_service.cached_result(config, StoredDataClient(data), cache) == first
+    assert backtest_service.cached_result(config, StoredDataClient(), cache) is None
+    assert backtest_service.cached_result({**config, "RISK_PERCENT": 0.01}, StoredDataClient(data), cache) is None
+
+    def no_backtest(data, config):
+        raise AssertionError("backtest should not run")
+
+    monkeypatch.setattr(backtest_service, "backtest", no_backtest)
+    assert backtest_service.run_backtest(config, data=data, cache=cache) == first
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backtrader_complex import backtest, results_frame
+from test_vector_backtest import make_config, make_data
+
+
+def reference_results_frame(data, start_value, completed_trades):
+    """The per-trade loop results_frame replaced"""
+    trades_df = pd.DataFrame(completed_trades)
+    current_balance = start_value
+    results_df = pd.DataFrame({
+        "Date": data.index,
+        "Close": data["close"],
+        "Balance": [start_value] * len(data)
+    })
+
+    for _, trade in trades_df.iterrows():
+        trade_date = datetime.strptime(trade["datetime"], '%Y-%m-%d %H:%M:%S')
+        date_series = results_df["Date"]
+        if hasattr(date_series.dtype, 'tz') and date_series.dtype.tz is not None:
+            date_series = date_series.dt.tz_localize(None)
+
+        mask = date_series >= pd.Timestamp(trade_date)
+        if mask.any():
+            trade_date_idx = mask.idxmax()
+            current_balance += trade["pnl"]
+            results_df.loc[trade_date_idx:, "Balance"] = current_balance
+            results_df.loc[trade_date_idx, "Entry"] = trade["entry_price"]
+            results_df.loc[trade_date_idx, "Type"] = trade["type"]
+            results_df.loc[trade_date_idx, "Stop_Loss"] = trade["stop_price"]
+            results_df.loc[trade_date_idx, "Take_Profit"] = trade["take_profit_price"]
+            results_df.loc[trade_date_idx, "Profit/Loss"] = trade["pnl"]
+
+    return results_df
+
+
+def make_trade(dt, pnl, type_="long"):
+    return {
+        "datetime": dt,
+        "buy_or_sell": "SELL",
+        "type": type_,
+        "entry_price": 100.0 + pnl,
+        "stop_price": 95.0,
+        "take_profit_price": 110.0,
+        "pnl": pnl,
+    }
+
+
+@pytest.mark.parametrize("seed, stop_loss_method", [(31, "weekly_minmax"), (32, "volatility_stop")])
+def test_matches_per_trade_loop(seed, stop_loss_method):
+    data = make_data(seed, bars=700, volatility=0.03)
+    data.index = data.index.tz_convert("Europe/Moscow")
+    _, trades = backtest(data, make_config(stop_loss_method, "ma_distance", "long", "vectorized"))
+    assert trades
+
+    pd.testing.assert_frame_equal(
+        results_frame(data, 100000.0, trades),
+        reference_results_frame(data, 100000.0, trades)
+    )
+
+
+def test_trades_between_on_and_after_bars():
+    data = make_data(33, bars=10)
+    trades = [
+        make_trade("2019-12-31 00:00:00", 5.0),     # before the first bar
+        make_trade("2020-01-03 07:00:00", -2.0),    # on a bar
+        make_trade("2020-01-04 12:00:00", 3.0),     # between bars
+        make_trade("2020-01-05 07:00:00", 1.0, "short"),
+        make_trade("2020-01-05 07:00:00", 4.0),     # same bar, shown
+        make_trade("2020-02-01 00:00:00", 100.0),   # after the last bar
+    ]
+
+    result = results_frame(data, 1000.0, trades)
+
+    pd.testing.assert_frame_equal(result, reference_results_frame(data, 1000.0, trades))
+    assert result["Balance"].tolist() == [1005.0, 1005.0, 1003.0, 1003.0, 1011.0] + [1011.0] * 5
+    assert result["Type"].iloc[4] == "long"
+
+
+def test_integer_capital_and_no_trades():
+    data = make_data(34, bars=5)
+
+    with_trade = results_frame(data, 100000, [make_trade("2020-01-02 07:00:00", 12.5)])
+    assert with_trade["Balance"].tolist() == [100000.0] + [100012.5] * 4
+
+    without_trades = results_frame(data, 100000, [])
+    assert without_trades["Balance"].tolist() == [100000.0] * 5
+    assert list(without_trades.columns) == ["Date", "Close", "Balance"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
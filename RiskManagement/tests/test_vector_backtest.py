@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backtrader_complex import COMMISSION, backtest, strategy_params
+from features import FeatureMatrix, min_period
+from vector_backtest import run_vectorized
+
+STOP_LOSS_METHODS = ["daily_minmax", "weekly_minmax", "monthly_minmax", "quarterly_minmax", "MA_50_18", "volatility_stop"]
+TAKE_PROFIT_METHODS = ["weekly_minmax", "monthly_minmax", "quarterly_minmax", "ma_distance", "prev_bar_5_percent"]
+
+
+def make_data(seed, bars=500, volatility=0.02):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, bars)))
+    open_ = close * np.exp(rng.normal(0, volatility / 2, bars))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, volatility / 2, bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, volatility / 2, bars)))
+    index = pd.date_range("2020-01-01 07:00", periods=bars, freq="D", tz="UTC")
+    return pd.DataFrame({
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": rng.integers(1_000, 100_000, bars).astype(float),
+    }, index=index)
+
+
+def make_config(stop_loss_method, take_profit_method, position, engine):
+    return {
+        "CAPITAL": 100000.0,
+        "RISK_PERCENT": 0.02,
+        "PROFIT_TO_RISK": 2.0,
+        "ATR_MULTIPLIER": 1.2,
+        "ATR_WINDOW": 14,
+        "STOP_LOSS_METHOD": stop_loss_method,
+        "TAKE_PROFIT_METHOD": take_profit_method,
+        "POSITION": position,
+        "ENGINE": engine,
+    }
+
+
+def assert_same_backtest(data, stop_loss_method, take_profit_method, position):
+    expected_df, expected_trades = backtest(data, make_config(stop_loss_method, take_profit_method, position, "backtrader"))
+    result_df, result_trades = backtest(data, make_config(stop_loss_method, take_profit_method, position, "vectorized"))
+
+    assert result_trades == expected_trades
+    pd.testing.assert_frame_equal(result_df, expected_df)
+    return expected_trades
+
+
+@pytest.mark.parametrize("position", ["long", "short"])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_backtrader_for_all_stop_loss_methods(seed, position):
+    data = make_data(seed)
+    trades = 0
+    for stop_loss_method in STOP_LOSS_METHODS:
+        trades += len(assert_same_backtest(data, stop_loss_method, "weekly_minmax", position))
+    assert trades > 0
+
+
+@pytest.mark.parametrize("position", ["long", "short"])
+def test_matches_backtrader_for_all_take_profit_methods(position):
+    data = make_data(4, volatility=0.04)
+    for take_profit_method in TAKE_PROFIT_METHODS:
+        assert_same_backtest(data, "volatility_stop", take_profit_method, position)
+
+
+def test_matches_backtrader_on_flat_data():
+    flat = make_data(6, bars=120)
+    flat.iloc[70:] = flat.iloc[70].to_numpy()
+    assert_same_backtest(flat, "daily_minmax", "ma_distance", "long")
+
+
+def test_no_trades_before_indicators_warm_up():
+    # Cerebro itself fails on data shorter than the strategy's minimum period
+    data = make_data(5, bars=55)
+    results_df, trades = backtest(data, make_config("weekly_minmax", "weekly_minmax", "long", "vectorized"))
+
+    assert trades == []
+    assert results_df["Balance"].tolist() == [100000.0] * 55
+
+
+def test_broker_values():
+    data = make_data(7)
+    config = make_config("weekly_minmax", "weekly_minmax", "long", "vectorized")
+    params = strategy_params(config)
+    trades, values = run_vectorized(data, params, config["CAPITAL"], COMMISSION)
+
+    assert min_period(params) == 61
+    assert np.isnan(FeatureMatrix(data).sma(60)[58])
+    assert len(values) == len(data)
+    assert values[:61].tolist() == [config["CAPITAL"]] * 61
+    # Flat at the end: the value is the starting cash plus all closed trades
+    assert trades[-1]["buy_or_sell"] == "SELL"
+    assert values[-1] == pytest.approx(config["CAPITAL"] + sum(trade["pnlcomm"] for trade in trades if trade["buy_or_sell"] == "SELL"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
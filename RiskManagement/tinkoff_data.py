@@ -1,9 +1,16 @@
 import os
+import json
+import time
+import threading
+import numpy as np
 import pandas as pd
 import logging
+import grpc
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
 import pytz
+from contextlib import contextmanager
 
 from tinkoff.invest import (
     CandleInterval, 
@@ -13,6 +20,9 @@ from tinkoff.invest import (
 )
 from tinkoff.invest.utils import now
 
+from candle_store import CandleStore
+from resample import Interval, parse_interval, bucket_start, resample_columns
+
 logger = logging.getLogger(__name__)
 
 INTERVAL_MAPPING = {
@@ -26,31 +36,154 @@ INTERVAL_MAPPING = {
     "1M": CandleInterval.CANDLE_INTERVAL_MONTH
 }
 
+# Intervals kept in the candle store, coarsest first. Any other interval
+# (30m, 4h, 3d, 1w, 1M, ...) is resampled from the coarsest of them that tiles it.
+BASE_INTERVALS = ["1d", "1h", "15m", "5m", "1m"]
+
+# Longest range a single GetCandles request may cover for each interval
+MAX_REQUEST_WINDOW = {
+    "1m": timedelta(days=1),
+    "5m": timedelta(days=1),
+    "15m": timedelta(days=1),
+    "1h": timedelta(weeks=1),
+    "4h": timedelta(days=30),
+    "1d": timedelta(days=365),
+    "1w": timedelta(days=2 * 365),
+    "1M": timedelta(days=10 * 365)
+}
+
+# Concurrent GetCandles requests; the market data service allows a few hundred per minute
+FETCH_WORKERS = 4
+FETCH_RETRIES = 5
+FETCH_BACKOFF_BASE = 0.5
+FETCH_BACKOFF_MAX = 30.0
+
+# Errors worth retrying: the request itself was fine
+TRANSIENT_STATUS_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+)
+
+# Ticker -> FIGI index persisted between runs, so a cold start needs no API calls
+INSTRUMENTS_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "csv_data", "instruments.json")
+INSTRUMENTS_CACHE_TTL = 24 * 60 * 60
+
+
+def plan_fetches(missing: List[Tuple[int, int]], interval: str) -> List[Tuple[int, int]]:
+    """
+    Split missing ranges into requests that each fit a single GetCandles call
+    
+    Args:
+        missing: Missing [from, to) ranges in epoch seconds, e.g. from CandleStore.missing
+        interval: Time interval (1m, 5m, 15m, 1h, 1d, 1w, 1M)
+        
+    Returns:
+        [from, to) ranges no longer than MAX_REQUEST_WINDOW[interval]
+    """
+    window = int(MAX_REQUEST_WINDOW[interval].total_seconds())
+    requests = []
+    for start, end in missing:
+        for chunk_start in range(start, end, window):
+            requests.append((chunk_start, min(chunk_start + window, end)))
+    return requests
+
+def base_interval(interval: Interval) -> str:
+    """
+    Stored interval to build `interval` from
+    
+    Args:
+        interval: Requested interval
+        
+    Returns:
+        The coarsest of BASE_INTERVALS whose candles tile `interval`
+    """
+    for base in BASE_INTERVALS:
+        parsed = parse_interval(base)
+        if not interval.intraday:
+            if not parsed.intraday:
+                return base
+        elif parsed.intraday and interval.seconds % parsed.seconds == 0:
+            return base
+    raise ValueError(f"No base interval for {interval}")
+
+
 class TinkoffDataClient:
     """Client for fetching historical data from Tinkoff Invest API"""
     
-    def __init__(self, token: Optional[str] = None):
+    # "TICKER:CLASS_CODE" -> FIGI, shared by all clients in the process
+    _figi_index: Dict[str, str] = {}
+    _figi_index_loaded_at: Optional[float] = None
+    _figi_index_lock = threading.Lock()
+    
+    def __init__(self, token: Optional[str] = None, store: Optional[CandleStore] = None, scheduler=None):
         """
         Initialize the Tinkoff data client
         
         Args:
             token: Tinkoff API token. If None, will try to get from TINKOFF_TOKEN environment variable
+            store: Local candle store used by load_market_data. If None, the default store under csv_data/ is used
+            scheduler: Optional shared rate limiter with a `wrap(services, priority)` method and a
+                       BACKGROUND priority (the backend's RequestScheduler). Requests made by this
+                       client are then queued behind interactive ones.
         """
         self.token = token or os.environ.get("TINKOFF_TOKEN")
         if not self.token:
             raise ValueError("Tinkoff API token not provided and TINKOFF_TOKEN environment variable not set")
+        self.store = store or CandleStore()
+        self.scheduler = scheduler
     
-    def _convert_candle_to_dict(self, candle: HistoricCandle) -> Dict:
-        """Convert Tinkoff candle to dictionary format compatible with our system"""
+    @staticmethod
+    def candles_to_columns(candles: Iterable[HistoricCandle]) -> Dict[str, np.ndarray]:
+        """
+        Convert Tinkoff candles to parallel column arrays in a single pass
+        
+        Args:
+            candles: Candles as returned by the API, consumed lazily
+            
+        Returns:
+            Dictionary with int64 epoch seconds ('time'), float64 OHLC, int64 volume
+            and bool 'is_complete' arrays
+        """
+        time, open_, high, low, close, volume, is_complete = [], [], [], [], [], [], []
+        
+        for candle in candles:
+            time.append(int(candle.time.timestamp()))
+            open_.append(candle.open.units + candle.open.nano / 1e9)
+            high.append(candle.high.units + candle.high.nano / 1e9)
+            low.append(candle.low.units + candle.low.nano / 1e9)
+            close.append(candle.close.units + candle.close.nano / 1e9)
+            volume.append(candle.volume)
+            is_complete.append(candle.is_complete)
+        
         return {
-            "open": candle.open.units + candle.open.nano / 1e9,
-            "high": candle.high.units + candle.high.nano / 1e9,
-            "low": candle.low.units + candle.low.nano / 1e9,
-            "close": candle.close.units + candle.close.nano / 1e9,
-            "volume": candle.volume,
-            "datetime": candle.time
+            "time": np.array(time, dtype=np.int64),
+            "open": np.array(open_, dtype=np.float64),
+            "high": np.array(high, dtype=np.float64),
+            "low": np.array(low, dtype=np.float64),
+            "close": np.array(close, dtype=np.float64),
+            "volume": np.array(volume, dtype=np.int64),
+            "is_complete": np.array(is_complete, dtype=np.bool_)
         }
     
+    @staticmethod
+    def columns_to_dataframe(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Build an OHLCV DataFrame indexed by UTC datetime from column arrays
+        
+        Args:
+            columns: Column arrays as returned by candles_to_columns
+            
+        Returns:
+            DataFrame with open, high, low, close, volume columns
+        """
+        index = pd.DatetimeIndex(pd.to_datetime(columns["time"], unit="s", utc=True), name="datetime")
+        return pd.DataFrame(
+            {name: columns[name] for name in ("open", "high", "low", "close", "volume")},
+            index=index
+        )
+    
     def get_figi_by_ticker(self, ticker: str, class_code: str) -> str:
         """
         Get FIGI (Financial Instrument Global Identifier) by ticker symbol
@@ -61,14 +194,179 @@ class TinkoffDataClient:
         Returns:
             FIGI identifier
         """
-        with Client(self.token) as client:
+        key = f"{ticker}:{class_code}"
+        index = self._load_figi_index()
+        if key in index:
+            return index[key]
+        
+        with self._client() as client:
             instruments = client.instruments.find_instrument(query=ticker)
             for instrument in instruments.instruments:
                 if instrument.ticker == ticker and instrument.class_code == class_code:
+                    with self._figi_index_lock:
+                        index[key] = instrument.figi
+                        self._save_figi_index(index, self._figi_index_loaded_at)
                     return instrument.figi
             
             raise ValueError(f"Ticker {ticker} not found in Tinkoff API")
     
+    def stored_figi(self, ticker: str, class_code: str) -> Optional[str]:
+        """
+        FIGI from the ticker index already loaded or saved, however old, without calling the API
+        
+        Returns:
+            FIGI identifier, or None if the ticker is not in the index
+        """
+        key = f"{ticker}:{class_code}"
+        cls = type(self)
+        with cls._figi_index_lock:
+            if key in cls._figi_index:
+                return cls._figi_index[key]
+        try:
+            with open(INSTRUMENTS_CACHE_FILE, "r") as f:
+                return json.load(f)["figi"].get(key)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            logger.exception(f"Failed to read instruments cache {INSTRUMENTS_CACHE_FILE}")
+            return None
+    
+    def _load_figi_index(self) -> Dict[str, str]:
+        """
+        Ticker index of all shares and ETFs, loaded once per process.
+        
+        Served from INSTRUMENTS_CACHE_FILE while it is younger than
+        INSTRUMENTS_CACHE_TTL, otherwise downloaded from the API and saved.
+        """
+        cls = type(self)
+        with cls._figi_index_lock:
+            if cls._figi_index_loaded_at is not None and time.time() - cls._figi_index_loaded_at < INSTRUMENTS_CACHE_TTL:
+                return cls._figi_index
+            
+            if os.path.exists(INSTRUMENTS_CACHE_FILE):
+                try:
+                    with open(INSTRUMENTS_CACHE_FILE, "r") as f:
+                        payload = json.load(f)
+                    if time.time() - payload["loaded_at"] < INSTRUMENTS_CACHE_TTL:
+                        cls._figi_index = payload["figi"]
+                        cls._figi_index_loaded_at = payload["loaded_at"]
+                        return cls._figi_index
+                except (OSError, ValueError, KeyError):
+                    logger.exception(f"Failed to read instruments cache {INSTRUMENTS_CACHE_FILE}")
+            
+            index = {}
+            with self._client() as client:
+                for response in (client.instruments.shares(), client.instruments.etfs()):
+                    for instrument in response.instruments:
+                        index.setdefault(f"{instrument.ticker}:{instrument.class_code}", instrument.figi)
+            
+            cls._figi_index = index
+            cls._figi_index_loaded_at = time.time()
+            self._save_figi_index(index, cls._figi_index_loaded_at)
+            logger.info(f"Loaded {len(index)} instruments from Tinkoff API")
+            return index
+    
+    @staticmethod
+    def _save_figi_index(index: Dict[str, str], loaded_at: float) -> None:
+        try:
+            os.makedirs(os.path.dirname(INSTRUMENTS_CACHE_FILE), exist_ok=True)
+            tmp_path = INSTRUMENTS_CACHE_FILE + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"loaded_at": loaded_at, "figi": index}, f)
+            os.replace(tmp_path, INSTRUMENTS_CACHE_FILE)
+        except OSError:
+            logger.exception(f"Failed to save instruments cache {INSTRUMENTS_CACHE_FILE}")
+    
+    @staticmethod
+    def _parse_date(value: Union[str, datetime]) -> datetime:
+        """Parse 'YYYY-MM-DD[ HH:MM:SS]' strings and make datetimes UTC-aware"""
+        if isinstance(value, str):
+            try:
+                value = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                value = datetime.strptime(value, "%Y-%m-%d")
+        
+        if value.tzinfo is None:
+            value = pytz.UTC.localize(value)
+        return value
+    
+    def _resolve_request(
+        self, 
+        ticker: str, 
+        from_date: Union[str, datetime], 
+        to_date: Optional[Union[str, datetime]], 
+        download: bool = True
+    ):
+        from_date = self._parse_date(from_date)
+        to_date = now() if to_date is None else self._parse_date(to_date)
+        
+        if ticker.startswith("BBG"):
+            figi = ticker
+        elif download:
+            figi = self.get_figi_by_ticker(ticker, 'TQBR') # Shares
+        else:
+            figi = self.stored_figi(ticker, 'TQBR')
+        return figi, from_date, to_date
+    
+    @contextmanager
+    def _client(self):
+        with Client(self.token) as client:
+            if self.scheduler is not None:
+                client = self.scheduler.wrap(client, priority=self.scheduler.BACKGROUND)
+            yield client
+    
+    def _fetch_chunk(self, client, figi: str, interval: str, from_ts: int, to_ts: int) -> Dict[str, np.ndarray]:
+        """One GetCandles request, retried with exponential backoff on transient errors"""
+        for attempt in range(FETCH_RETRIES + 1):
+            try:
+                response = client.market_data.get_candles(
+                    figi=figi,
+                    from_=datetime.fromtimestamp(from_ts, tz=pytz.UTC),
+                    to=datetime.fromtimestamp(to_ts, tz=pytz.UTC),
+                    interval=INTERVAL_MAPPING[interval]
+                )
+                return self.candles_to_columns(response.candles)
+            except RequestError as e:
+                if e.code not in TRANSIENT_STATUS_CODES or attempt == FETCH_RETRIES:
+                    raise
+                delay = min(FETCH_BACKOFF_MAX, FETCH_BACKOFF_BASE * 2 ** attempt)
+                reset = getattr(e.metadata, "ratelimit_reset", None)
+                if e.code == grpc.StatusCode.RESOURCE_EXHAUSTED and reset:
+                    delay = max(delay, float(reset))
+                logger.warning(f"Retrying candles for {figi} in {delay:.1f}s after {e.code}")
+                time.sleep(delay)
+    
+    def _fetch_ranges(self, ticker: str, figi: str, interval: str, missing: List[Tuple[int, int]]) -> Iterator[Tuple[Tuple[int, int], Dict[str, np.ndarray]]]:
+        """Download missing ranges concurrently, yielding ((from, to), columns) as requests complete"""
+        requests = plan_fetches(missing, interval)
+        if not requests:
+            return
+        
+        logger.info(f"Fetching data for {ticker} in {len(requests)} request(s)")
+        with self._client() as client:
+            with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(requests))) as executor:
+                futures = {
+                    executor.submit(self._fetch_chunk, client, figi, interval, from_ts, to_ts): (from_ts, to_ts)
+                    for from_ts, to_ts in requests
+                }
+                try:
+                    for future in as_completed(futures):
+                        yield futures[future], future.result()
+                except Exception:
+                    logger.exception(f"Error fetching data for {ticker}")
+                    for future in futures:
+                        future.cancel()
+                    raise
+    
+    def _fetch_columns(self, ticker: str, figi: str, interval: str, from_date: datetime, to_date: datetime) -> Dict[str, np.ndarray]:
+        """Download candles in [from_date, to_date) as column arrays"""
+        missing = [(int(from_date.timestamp()), int(to_date.timestamp()))]
+        results = sorted(self._fetch_ranges(ticker, figi, interval, missing), key=lambda item: item[0])
+        batches = [columns for _, columns in results]
+        if not batches:
+            return self.candles_to_columns([])
+        return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+    
     def get_historical_data(
         self, 
         ticker: str, 
@@ -88,67 +386,74 @@ class TinkoffDataClient:
         Returns:
             DataFrame with historical data
         """
-        if isinstance(from_date, str):
-            try:
-                from_date = datetime.strptime(from_date, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                from_date = datetime.strptime(from_date, "%Y-%m-%d")
+        if interval not in INTERVAL_MAPPING:
+            raise ValueError(f"Invalid interval: {interval}. Must be one of {list(INTERVAL_MAPPING.keys())}")
         
-        if from_date.tzinfo is None:
-            from_date = pytz.UTC.localize(from_date)
+        figi, from_date, to_date = self._resolve_request(ticker, from_date, to_date)
+        columns = self._fetch_columns(ticker, figi, interval, from_date, to_date)
         
-        if to_date is None:
-            to_date = now()
-        elif isinstance(to_date, str):
-            try:
-                to_date = datetime.strptime(to_date, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                to_date = datetime.strptime(to_date, "%Y-%m-%d")
-            if to_date.tzinfo is None:
-                to_date = pytz.UTC.localize(to_date)
-        elif to_date.tzinfo is None:
-            to_date = pytz.UTC.localize(to_date)
+        if not len(columns["time"]):
+            logger.warning(f"No data found for {ticker} from {from_date} to {to_date}")
+            return pd.DataFrame()
         
-        figi = ticker if ticker.startswith("BBG") else self.get_figi_by_ticker(ticker, 'TQBR') # Shares
+        return self.columns_to_dataframe(columns)
+    
+    def get_stored_data(
+        self, 
+        ticker: str, 
+        interval: str, 
+        from_date: Union[str, datetime], 
+        to_date: Optional[Union[str, datetime]] = None,
+        download: bool = True
+    ) -> Optional[pd.DataFrame]:
+        """
+        Get candles for a time range from the local candle store, downloading only the missing parts
         
-        if interval not in INTERVAL_MAPPING:
-            raise ValueError(f"Invalid interval: {interval}. Must be one of {list(INTERVAL_MAPPING.keys())}")
-        candle_interval = INTERVAL_MAPPING[interval]
+        Only BASE_INTERVALS are downloaded and stored, other intervals are
+        resampled from them in the MOEX timezone.
         
-        all_candles = []
-        current_from = from_date
+        Args:
+            ticker: Stock ticker symbol or FIGI
+            interval: Time interval: a multiple of minutes, hours, days, weeks or
+                      months (1m, 5m, 30m, 1h, 4h, 1d, 3d, 1w, 1M, ...)
+            from_date: Start date (string in YYYY-MM-DD format or datetime)
+            to_date: End date (string in YYYY-MM-DD format or datetime), defaults to now
+            download: Download missing parts. If False, nothing is requested from
+                      the API: the ticker is looked up in the saved instrument
+                      index only, and None is returned unless it is found and
+                      the whole range is stored already.
+            
+        Returns:
+            DataFrame with candles from from_date to to_date inclusive. The first
+            resampled candle starts at the beginning of the bucket containing from_date.
+        """
+        target = parse_interval(interval)
+        base = base_interval(target)
+        figi, from_date, to_date = self._resolve_request(ticker, from_date, to_date, download)
+        if figi is None:
+            return None
+        start, end = int(from_date.timestamp()), int(to_date.timestamp())
+        if base != interval:
+            start = bucket_start(start, target)
+        # Candles that have not closed yet are never marked as downloaded
+        fetch_end = min(end, int(now().timestamp()))
         
-        with Client(self.token) as client:
-            while current_from < to_date:
-                current_to = min(current_from + timedelta(days=365), to_date)
-                
-                try:
-                    logger.info(f"Fetching data for {ticker} from {current_from} to {current_to}")
-                    candles = list(client.get_all_candles(
-                        figi=figi,
-                        from_=current_from,
-                        to=current_to,
-                        interval=candle_interval
-                    ))
-                    
-                    batch_candles = [self._convert_candle_to_dict(candle) for candle in candles]
-                    all_candles.extend(batch_candles)
-                    
-                except RequestError:
-                    logger.exception(f"Error fetching data for {ticker}")
-                    raise
-                
-                current_from = current_to
+        # Every completed request is stored right away, so an interrupted
+        # download resumes where it stopped
+        missing = self.store.missing(figi, base, start, fetch_end)
+        if missing and not download:
+            return None
+        for (chunk_from, chunk_to), columns in self._fetch_ranges(ticker, figi, base, missing):
+            self.store.write(figi, base, columns, chunk_from, chunk_to)
         
-        if not all_candles:
+        columns = self.store.read(figi, base, start, end)
+        if base != interval:
+            columns = resample_columns(columns, target, until=fetch_end)
+        if not len(columns["time"]):
             logger.warning(f"No data found for {ticker} from {from_date} to {to_date}")
             return pd.DataFrame()
         
-        df = pd.DataFrame(all_candles)
-        
-        df.set_index('datetime', inplace=True)
-        
-        return df 
+        return self.columns_to_dataframe(columns)
     
     def load_market_data(
         self, 
@@ -160,60 +465,30 @@ class TinkoffDataClient:
         csv_file_name: Optional[str] = None
     ) -> pd.DataFrame:
         """
-        Loads data from CSV file if it exists, otherwise downloads data from Tinkoff API and saves to CSV.
+        Loads data from the local candle store, downloading only ranges that are not stored yet.
         
         Args:
             ticker: Stock ticker symbol (e.g., 'SBER')
             exchange: Exchange (for compatibility, ignored)
-            interval: Time interval (e.g., '1d')
+            interval: Time interval (e.g., '1d', '4h', '1w')
             start_date: Start date (e.g., '2022-01-01')
             end_date: End date (e.g., '2022-12-31')
-            csv_file_name: Path to the CSV file to load data from or save data to. If None, data will be
-                          fetched from the API but not saved.
+            csv_file_name: Deprecated, ignored. Data is cached in the candle store
+                          instead of one CSV file per requested range.
             
         Returns:
             DataFrame with historical data
         """
         try:
-            if csv_file_name is None:
-                logger.info(f"Скачивание данных с Tinkoff API для {ticker}...")
-                data = self.get_historical_data(
-                    ticker=ticker,
-                    interval=interval,
-                    from_date=start_date,
-                    to_date=end_date
-                )
-                if data.empty:
-                    raise ValueError(f"Не удалось получить данные для {ticker}")
-                
-                if start_date:
-                    data = data[data.index >= start_date]
-                if end_date:
-                    data = data[data.index <= end_date]
-                
-                return data
-            
-            if os.path.exists(csv_file_name):
-                logger.info(f"Загрузка данных из CSV-файла: {csv_file_name}")
-                data = pd.read_csv(csv_file_name, parse_dates=['datetime'], index_col='datetime')
-            else:
-                logger.info(f"Скачивание данных с Tinkoff API для {ticker}...")
-                data = self.get_historical_data(
-                    ticker=ticker,
-                    interval=interval,
-                    from_date=start_date,
-                    to_date=end_date
-                )
-                if data.empty:
-                    raise ValueError(f"Не удалось получить данные для {ticker}")
-                
-                if start_date:
-                    data = data[data.index >= start_date]
-                if end_date:
-                    data = data[data.index <= end_date]
-                
-                data.to_csv(csv_file_name)
-                logger.info(f"Данные сохранены в файл: {csv_file_name}")
+            logger.info(f"Загрузка данных для {ticker} из локального хранилища свечей...")
+            data = self.get_stored_data(
+                ticker=ticker,
+                interval=interval,
+                from_date=start_date,
+                to_date=end_date
+            )
+            if data.empty:
+                raise ValueError(f"Не удалось получить данные для {ticker}")
             return data
         except Exception as e:
             logger.exception(f"Ошибка при загрузке данных для {ticker}")
@@ -0,0 +1,451 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from features import FeatureMatrix, min_period
+
+# backtrader Trade.status values
+TRADE_OPEN = 1
+TRADE_CLOSED = 2
+
+# Methods understood by choose_stop_loss / choose_take_profit, with their lookback in bars
+PERIOD_METHODS = {"weekly_minmax": 5, "monthly_minmax": 20, "quarterly_minmax": 60}
+
+
+def _stop_levels(method: str, features: FeatureMatrix, ind: Dict[str, np.ndarray], long: bool) -> np.ndarray:
+    """choose_stop_loss for every bar"""
+    close = features.price("close")
+
+    if method == "volatility_stop":
+        return close - ind["atr"] * 1.5 if long else close + ind["atr"] * 1.5
+
+    if method in PERIOD_METHODS:
+        if long:
+            extreme = features.low_min(PERIOD_METHODS[method]).copy()
+            extreme[:1] = close[:1] * 0.95
+        else:
+            extreme = features.high_max(PERIOD_METHODS[method]).copy()
+            extreme[:1] = close[:1] * 1.05
+        return extreme
+
+    if method == "MA_50_18":
+        # choose_stop_loss passes the slow MA as ma_50_18_stop's fast one
+        short_val, long_val = ind["ma_slow"], ind["ma_medium"]
+        nearest = np.where(np.abs(close - short_val) < np.abs(close - long_val), short_val, long_val)
+        return nearest * (1.0 - 0.005) if long else nearest * (1.0 + 0.005)
+
+    return features.price("low") if long else features.price("high")
+
+
+def _take_profit_levels(method: str, features: FeatureMatrix, ind: Dict[str, np.ndarray], long: bool) -> np.ndarray:
+    """choose_take_profit for every bar"""
+    close = features.price("close")
+
+    if method in PERIOD_METHODS:
+        if long:
+            max_high = features.high_max(PERIOD_METHODS[method])
+            levels = close + (max_high - close) * 1.25
+            fallback = 1.05
+        else:
+            min_low = features.low_min(PERIOD_METHODS[method])
+            levels = close - (close - min_low) * 1.25
+            fallback = 0.95
+        levels[:1] = close[:1] * fallback
+        return levels
+
+    if method == "prev_bar_5_percent":
+        return close * (1.0 + (5.0 / 100.0)) if long else close * (1.0 - (5.0 / 100.0))
+
+    # ma_distance, also the default; choose_take_profit passes the slow MA as the fast one
+    distance = np.maximum(np.abs(close - ind["ma_slow"]), np.abs(close - ind["ma_medium"]))
+    return close + (distance * 1.5) if long else close - (distance * 1.5)
+
+
+def _entry_levels(features: FeatureMatrix, ind: Dict[str, np.ndarray], params: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stop-loss and take-profit prices open_new_trade would set for an entry at every bar"""
+    long = params["position_type"] == "long"
+    close, atr = features.price("close"), ind["atr"]
+    ma_fast, ma_medium, ma_slow = ind["ma_fast"], ind["ma_medium"], ind["ma_slow"]
+
+    stop = _stop_levels(params["stop_loss_method"], features, ind, long)
+    fallback_distance = atr * params["atr_multiplier"]
+    if long:
+        stop = np.where(stop >= close, close - fallback_distance, stop)
+    else:
+        stop = np.where(stop <= close, close + fallback_distance, stop)
+
+    # calculate_adaptive_take_profit
+    base_tp = _take_profit_levels(params["take_profit_method"], features, ind, long)
+    base_distance = base_tp - close if long else close - base_tp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atr_percent = atr / close
+    volatility_factor = np.where(atr_percent > 0.02, 1.1, np.where(atr_percent < 0.01, 0.9, 1.0))
+    if long:
+        trend = (ma_fast > ma_medium) & (ma_medium > ma_slow)
+        rsi_factor = np.where(ind["rsi"] > 70, 0.9, 1.0)
+    else:
+        trend = (ma_fast < ma_medium) & (ma_medium < ma_slow)
+        rsi_factor = np.where(ind["rsi"] < 30, 0.9, 1.0)
+    combined = volatility_factor * np.where(trend, 1.15, 1.0) * rsi_factor
+    max_adjustment = 0.3
+    combined = np.where(combined > (1.0 + max_adjustment), 1.0 + max_adjustment,
+                        np.where(combined < (1.0 - max_adjustment), 1.0 - max_adjustment, combined))
+    adjusted_distance = base_distance * combined
+
+    if long:
+        take_profit = close + adjusted_distance
+        take_profit = np.where(take_profit <= close, close * (1.0 + params["profit_to_risk"] * params["risk_percent_long"]), take_profit)
+    else:
+        take_profit = close - adjusted_distance
+        take_profit = np.where(take_profit >= close, close * (1.0 - params["profit_to_risk"] * params["risk_percent_short"]), take_profit)
+    return stop, take_profit
+
+
+def _entry_signals(features: FeatureMatrix, ind: Dict[str, np.ndarray], params: Dict[str, Any]) -> np.ndarray:
+    """check_reentry_condition for every bar, except the distance to the previous trade"""
+    close, volume = features.price("close"), features.price("volume")
+    ma_fast, ma_medium, ma_slow, rsi = ind["ma_fast"], ind["ma_medium"], ind["ma_slow"], ind["rsi"]
+    prev_close = np.r_[np.nan, close[:-1]]
+    prev_volume = np.r_[np.nan, volume[:-1]]
+    prev_rsi = np.r_[np.nan, rsi[:-1]]
+    volume_up = volume > prev_volume * 1.1
+
+    if params["position_type"] == "long":
+        trend = (ma_fast > ma_medium) & (ma_medium > ma_slow)
+        allowed = trend | ~(close < ma_slow)
+        high_1w = features.prev_high_max(5)
+        signal = (
+            ((close > ma_fast) & (prev_close <= ma_fast) & volume_up)
+            | ((rsi > 50) & (prev_rsi <= 50) & (close > ma_medium))
+            | ((ind["crossover_fast"] > 0) & (close > ma_medium))
+            | ((close > high_1w) & (prev_close <= high_1w))
+        )
+    else:
+        trend = (ma_fast < ma_medium) & (ma_medium < ma_slow)
+        allowed = trend | ~(close > ma_slow)
+        low_1w = features.prev_low_min(5)
+        signal = (
+            ((close < ma_fast) & (prev_close >= ma_fast) & volume_up)
+            | ((rsi < 50) & (prev_rsi >= 50) & (close < ma_medium))
+            | ((ind["crossover_fast"] < 0) & (close < ma_medium))
+            | ((close < low_1w) & (prev_close >= low_1w))
+        )
+
+    entries = allowed & signal
+    entries[:9] = False
+    return entries
+
+
+def _update_position(size: int, price: float, delta: int, exec_price: float) -> Tuple[int, float, int, int]:
+    """bt Position.update: new size and price, opened and closed parts of `delta`"""
+    new_size = size + delta
+    if not new_size:
+        return new_size, 0.0, 0, delta
+    if not size:
+        return new_size, exec_price, delta, 0
+    if (size > 0) == (delta > 0):
+        return new_size, (price * size + delta * exec_price) / new_size, delta, 0
+    if (new_size > 0) == (size > 0):
+        return new_size, price, 0, delta
+    return new_size, exec_price, new_size, -size
+
+
+class _Trade:
+    """bt Trade accounting: average price, cumulative pnl and commission"""
+
+    __slots__ = ("size", "price", "value", "commission", "pnl", "pnlcomm", "status", "isopen", "isclosed", "justopened")
+
+    def __init__(self):
+        self.size = 0
+        self.price = 0.0
+        self.value = 0.0
+        self.commission = 0.0
+        self.pnl = 0.0
+        self.pnlcomm = 0.0
+        self.status = 0
+        self.isopen = False
+        self.isclosed = False
+        self.justopened = False
+
+    def update(self, size: int, price: float, commission: float) -> None:
+        if not size:
+            return
+
+        self.commission += commission
+        oldsize = self.size
+        self.size += size
+        self.justopened = bool(not oldsize and size)
+        self.isopen = bool(self.size)
+        self.isclosed = bool(oldsize and not self.size)
+        if self.isclosed:
+            self.isopen = False
+            self.status = TRADE_CLOSED
+        elif self.isopen:
+            self.status = TRADE_OPEN
+
+        if abs(self.size) > abs(oldsize):
+            self.price = (oldsize * self.price + size * price) / self.size
+            pnl = 0.0
+        else:
+            pnl = -size * (price - self.price)
+
+        self.pnl += pnl
+        self.pnlcomm = self.pnl - self.commission
+        self.value = self.size * self.price
+
+    def snapshot(self) -> Tuple:
+        return self.isopen, self.isclosed, self.status, self.value, self.pnl, self.pnlcomm
+
+
+def _datetimes(index: pd.Index) -> List[str]:
+    """Bar datetimes as backtrader reports them: naive UTC"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.strftime("%Y-%m-%d %H:%M:%S").tolist()
+
+
+def run_vectorized(
+    data: pd.DataFrame,
+    params: Dict[str, Any],
+    capital: float,
+    commission: float,
+    features: Optional[FeatureMatrix] = None,
+    min_value: Optional[float] = None
+) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Backtest MultiStopTakeStrategy without backtrader
+
+    Indicators, entry signals and the stop-loss/take-profit levels an entry
+    would get are computed for all bars at once. Only the position state
+    (sizing from the account value, trailing stop, partial exit, exits)
+    is stepped bar by bar, over plain floats and without logging. Orders
+    are filled like backtrader's default broker fills market orders: at
+    the next bar's open, with percentage commission, and rejected when
+    the cash does not cover them.
+
+    Args:
+        data: OHLCV DataFrame indexed by datetime, as passed to backtest()
+        params: Full strategy parameters, see backtrader_complex.strategy_params
+        capital: Starting cash
+        commission: Commission as a fraction of the traded value
+        features: Features of `data` shared with other runs, computed here when not given
+        min_value: Stop the run once the broker value falls below this
+
+    Returns:
+        Completed trades in the format of MultiStopTakeStrategy.completed_trades
+        and the broker value after every bar, up to the stop when there was one
+    """
+    n = len(data)
+    if features is None:
+        features = FeatureMatrix(data)
+    ind = features.indicators(params)
+
+    long = params["position_type"] == "long"
+    trade_type = "LONG" if long else "SHORT"
+    entries = _entry_signals(features, ind, params).tolist()
+    stops, take_profits = (levels.tolist() for levels in _entry_levels(features, ind, params))
+    if long:
+        risk_boost = (ind["ma_fast"] > ind["ma_medium"]).tolist()
+    else:
+        risk_boost = (ind["ma_fast"] < ind["ma_medium"]).tolist()
+
+    opens = features.price("open").tolist()
+    closes = features.price("close").tolist()
+    volumes = features.price("volume").tolist()
+    atrs = ind["atr"].tolist()
+    datetimes = _datetimes(data.index)
+
+    risk_percent = params["risk_percent"]
+    atr_multiplier = params["atr_multiplier"]
+    min_trade_bars = params["min_trade_bars"]
+    partial_exit = params["partial_exit"]
+    partial_exit_threshold = params["partial_exit_threshold"]
+    profit_to_risk = params["profit_to_risk"]
+    side_risk = params["risk_percent_long"] if long else params["risk_percent_short"]
+    first_bar = min_period(params) - 1
+
+    cash = float(capital)
+    pos_size, pos_price = 0, 0.0
+    trade = None
+    orders: List[List] = []  # [size, created price, is entry] submitted on the previous bar
+    values = np.full(n, float(capital))
+    completed_trades: List[Dict[str, Any]] = []
+
+    entry_price = stop_price = take_profit_price = None
+    partial_exit_done = False
+    last_trade_bar = None
+    entry_pending = False
+    last_trade_size = last_executed_price = None
+
+    for i in range(n):
+        if orders:
+            submitted, orders = orders, []
+            fills = []
+
+            # Broker submission check: pseudo-execute at the creation price
+            check_cash, check_size, check_price = cash, pos_size, pos_price
+            accepted = []
+            for order in submitted:
+                size, price, _ = order
+                check_size, check_price, opened, closed = _update_position(check_size, check_price, size, price)
+                if closed:
+                    check_cash += -closed * price
+                    check_cash -= abs(closed) * commission * price
+                if opened:
+                    check_cash -= opened * price
+                    check_cash -= abs(opened) * commission * price
+                if check_cash >= 0.0:
+                    accepted.append(order)
+                else:
+                    fills.append((order, None))
+
+            # Market orders fill at this bar's open
+            price = opens[i]
+            for order in accepted:
+                size = order[0]
+                _, _, opened, closed = _update_position(pos_size, pos_price, size, price)
+                closed_comm = opened_comm = 0.0
+                if closed:
+                    pnl = -closed * (price - pos_price)
+                    cash += -closed * pos_price + pnl
+                    closed_comm = abs(closed) * commission * price
+                    cash -= closed_comm
+                popened = opened
+                if opened:
+                    remaining = cash - opened * price
+                    opened_comm = abs(opened) * commission * price
+                    remaining -= opened_comm
+                    if remaining < 0.0:
+                        opened, opened_comm = 0, 0.0
+                    else:
+                        cash = remaining
+
+                if closed + opened:
+                    pos_size, pos_price, _, _ = _update_position(pos_size, pos_price, closed + opened, price)
+                    if closed:
+                        trade.update(closed, price, closed_comm)
+                        if trade.isclosed:
+                            fills.append((None, trade.snapshot()))
+                    if opened:
+                        if trade is None or trade.isclosed:
+                            trade = _Trade()
+                        trade.update(opened, price, opened_comm)
+                    if trade.justopened:
+                        fills.append((None, trade.snapshot()))
+                    if not popened or opened:
+                        # Order.executed averages its fills, even a single one
+                        executed = closed + opened
+                        fills.append((order, (executed, (0.0 + executed * price) / executed)))
+                if popened and not opened:
+                    fills.append((order, None))
+
+            # notify_order for every order, then notify_trade for every trade
+            for order, fill in fills:
+                if order is None:
+                    continue
+                if fill is not None:
+                    last_trade_size, last_executed_price = fill
+                if order[2]:
+                    entry_pending = False
+            for order, snapshot in fills:
+                if order is not None:
+                    continue
+                isopen, isclosed, status, value, pnl, pnlcomm = snapshot
+                for flag, side in ((isopen, "BUY"), (isclosed, "SELL")):
+                    if flag:
+                        completed_trades.append({
+                            "datetime": datetimes[i],
+                            "buy_or_sell": side,
+                            "type": trade_type,
+                            "status": status,
+                            "size": last_trade_size,
+                            "price": last_executed_price,
+                            "entry_price": closes[i],
+                            "stop_price": stop_price,
+                            "take_profit_price": take_profit_price,
+                            "value": value,
+                            "pnl": pnl,
+                            "pnlcomm": pnlcomm
+                        })
+
+        close = closes[i]
+        if pos_size:
+            unrealized = pos_size * (close - pos_price)
+            position_value = pos_size * close
+            value = cash + ((position_value - unrealized) + unrealized if position_value > 0 else position_value)
+        else:
+            value = cash + 0.0
+        values[i] = value
+        if min_value is not None and value < min_value:
+            return completed_trades, values[:i + 1]
+
+        if i < first_bar or entry_pending:
+            continue
+
+        if not pos_size:
+            # open_new_trade
+            if not entries[i] or (last_trade_bar is not None and i + 1 - last_trade_bar < min_trade_bars):
+                continue
+            last_trade_bar = i + 1
+
+            usable_capital = value * 0.7
+            risk = risk_percent * 1.2 if risk_boost[i] else risk_percent
+            stop_dist = atrs[i] * atr_multiplier
+            if stop_dist <= 0 or close <= 0:
+                continue
+            size = max(int(usable_capital * risk / stop_dist), 1)
+            size = min(size, int(usable_capital / close))
+            if volumes[i] > 0:
+                size = min(size, int(volumes[i] * 0.05))
+            if size <= 0:
+                continue
+
+            entry_price = close
+            stop_price = stops[i]
+            take_profit_price = take_profits[i]
+            orders.append([size if long else -size, close, True])
+            entry_pending = True
+            continue
+
+        # update_stop_loss
+        if long:
+            profit_pct = (close - entry_price) / entry_price
+            if close >= take_profit_price:
+                orders.append([-pos_size, close, False])
+                continue
+        else:
+            profit_pct = (entry_price - close) / entry_price
+            if close <= take_profit_price:
+                orders.append([-pos_size, close, False])
+                continue
+
+        if partial_exit and not partial_exit_done and profit_pct >= partial_exit_threshold:
+            partial_size = pos_size // 2
+            if partial_size > 0:
+                orders.append([-partial_size if long else partial_size, close, False])
+                partial_exit_done = True
+                if long:
+                    stop_price = max(entry_price * (1 + 0.002), stop_price)
+                else:
+                    stop_price = min(entry_price * (1 - 0.002), stop_price)
+
+        trail_percent = side_risk * (0.7 if partial_exit_done else 1.0)
+        if long:
+            new_stop_candidate = close * (1.0 - trail_percent)
+            if new_stop_candidate > stop_price:
+                stop_price = new_stop_candidate
+            if close <= stop_price:
+                orders.append([-pos_size, close, False])
+            elif partial_exit_done and profit_pct >= profit_to_risk * side_risk:
+                orders.append([-pos_size, close, False])
+        else:
+            new_stop_candidate = close * (1.0 + trail_percent)
+            if new_stop_candidate < stop_price:
+                stop_price = new_stop_candidate
+            if close >= stop_price:
+                orders.append([-pos_size, close, False])
+            elif partial_exit_done and profit_pct >= profit_to_risk * side_risk:
+                orders.append([-pos_size, close, False])
+
+    return completed_trades, values
@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.DEBUG:
+    # Serve static files in development, as runserver does
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler  # noqa: E402
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# Imported after Django is set up
+from trading.api.stream import with_market_data_stream  # noqa: E402
+
+application = with_market_data_stream(django_application)
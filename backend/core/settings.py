@@ -169,6 +169,31 @@ SITE_ID = 1
 # T-Bank Invest API token https://www.tbank.ru/invest/settings/api/
 TINKOFF_INVEST_TOKEN = os.environ.get("TINKOFF_TOKEN", "")
 
+# In-process cache of computed technical indicators (trading.indicators.cache)
+INDICATOR_CACHE_MAX_BYTES = int(os.environ.get("INDICATOR_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+INDICATOR_CACHE_TAIL_TTL = float(os.environ.get("INDICATOR_CACHE_TAIL_TTL", 30))
+
+# analysis/generate-batch/: concurrent candle fetches and request size limit
+ANALYSIS_BATCH_WORKERS = int(os.environ.get("ANALYSIS_BATCH_WORKERS", 8))
+ANALYSIS_BATCH_MAX_TICKERS = int(os.environ.get("ANALYSIS_BATCH_MAX_TICKERS", 100))
+
+# market-data/prices/ and market-data/stream/: request size limit
+MARKET_DATA_MAX_SYMBOLS = int(os.environ.get("MARKET_DATA_MAX_SYMBOLS", 500))
+# Seconds between keep-alive comments on idle market-data/stream/ connections
+MARKET_DATA_STREAM_HEARTBEAT = float(os.environ.get("MARKET_DATA_STREAM_HEARTBEAT", 15))
+
+# Backtest job queue (trading.backtests): worker processes per run_backtest_workers pool,
+# seconds between queue polls, seconds finished jobs are kept and unfinished jobs per user
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", 2))
+BACKTEST_POLL_INTERVAL = float(os.environ.get("BACKTEST_POLL_INTERVAL", 1))
+BACKTEST_RESULT_TTL = int(os.environ.get("BACKTEST_RESULT_TTL", 24 * 60 * 60))
+BACKTEST_MAX_PENDING_PER_USER = int(os.environ.get("BACKTEST_MAX_PENDING_PER_USER", 3))
+# Seconds without progress or heartbeat after which a running job's pool counts as dead and the job is queued again
+BACKTEST_STALE_AFTER = int(os.environ.get("BACKTEST_STALE_AFTER", 5 * 60))
+# Results of earlier backtests, reused for identical configurations on identical candles
+BACKTEST_CACHE_PATH = os.environ.get("BACKTEST_CACHE_PATH", BASE_DIR / "backtest_cache")
+BACKTEST_CACHE_MAX_BYTES = int(os.environ.get("BACKTEST_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     SESSION_COOKIE_SECURE = True
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Position, Target
+from .models import BacktestJob, Position, Target
 
 
 class TargetInline(admin.TabularInline):
@@ -14,4 +14,8 @@ class PositionAdmin(admin.ModelAdmin):
     search_fields = ('base_asset', 'quote_asset', 'author__username')
 
 
-
+@admin.register(BacktestJob)
+class BacktestJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'author', 'status', 'progress', 'worker', 'created_date', 'finished_date')
+    list_filter = ('status', )
+    search_fields = ('id', 'author__username')
@@ -3,7 +3,8 @@ import os
 import logging
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
@@ -17,6 +18,11 @@ from tinkoff.invest.caching.market_data_cache.cache import MarketDataCache
 from tinkoff.invest.caching.market_data_cache.cache_settings import MarketDataCacheSettings
 from tinkoff.invest.utils import now
 
+from ..indicators import IndicatorEngine, IndicatorCache, series_to_pairs
+from ..market_data.candles import CandleSeries
+from ..market_data.resample import Timeframe, parse_timeframe, bucket_start, resample
+from ..market_data.scheduler import SingleFlight, request_scheduler
+
 logger = logging.getLogger(__name__)
 
 MARKET_DATA_CACHE_DIR = os.path.join(settings.BASE_DIR, "market_data_cache")
@@ -63,19 +69,34 @@ DEFAULT_CONFIG = {
     "TAKE_PROFIT_METHODS": ["ma_distance", "weekly_minmax", "monthly_minmax", "prev_bar_5_percent"]
 }
 
-TIMEFRAME_MAPPING = {
-    "1min": CandleInterval.CANDLE_INTERVAL_1_MIN,
-    "5min": CandleInterval.CANDLE_INTERVAL_5_MIN,
-    "15min": CandleInterval.CANDLE_INTERVAL_15_MIN,
-    "30min": CandleInterval.CANDLE_INTERVAL_30_MIN,
-    "1hour": CandleInterval.CANDLE_INTERVAL_HOUR,
-    "1day": CandleInterval.CANDLE_INTERVAL_DAY,
-    "1week": CandleInterval.CANDLE_INTERVAL_WEEK,
-    "1month": CandleInterval.CANDLE_INTERVAL_MONTH
-}
+# Timeframes offered by the frontend; any multiple such as "2h" or "3d" is accepted too
+TIMEFRAMES = ["1min", "5min", "15min", "30min", "1hour", "4hour", "1day", "1week", "1month"]
+
+# Intervals downloaded from the API, coarsest first. Other timeframes are
+# resampled from the coarsest of them that tiles the requested one.
+BASE_TIMEFRAMES = [
+    (Timeframe(1, "day"), CandleInterval.CANDLE_INTERVAL_DAY),
+    (Timeframe(1, "hour"), CandleInterval.CANDLE_INTERVAL_HOUR),
+    (Timeframe(15, "min"), CandleInterval.CANDLE_INTERVAL_15_MIN),
+    (Timeframe(5, "min"), CandleInterval.CANDLE_INTERVAL_5_MIN),
+    (Timeframe(1, "min"), CandleInterval.CANDLE_INTERVAL_1_MIN),
+]
 
 DEFAULT_TIMEFRAME = "1day"
 
+ANALYSIS_BATCH_WORKERS = getattr(settings, "ANALYSIS_BATCH_WORKERS", 8)
+ANALYSIS_BATCH_MAX_TICKERS = getattr(settings, "ANALYSIS_BATCH_MAX_TICKERS", 100)
+
+# Requests ending this close to now are treated as "up to now" when coalescing
+LIVE_RANGE_TOLERANCE = timedelta(seconds=5)
+
+candle_fetches = SingleFlight()
+
+indicator_cache = IndicatorCache(
+    max_bytes=getattr(settings, "INDICATOR_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+    tail_ttl=getattr(settings, "INDICATOR_CACHE_TAIL_TTL", 30)
+)
+
 if not os.path.exists(CONFIG_FILE):
     try:
         with open(CONFIG_FILE, "w") as f:
@@ -123,18 +144,58 @@ def get_ticker_figi(ticker: str) -> Optional[str]:
     return None
 
 
-def get_candle_interval(timeframe: str) -> CandleInterval:
-    """Convert timeframe string to CandleInterval"""
-    return TIMEFRAME_MAPPING.get(timeframe, CandleInterval.CANDLE_INTERVAL_DAY)
+def resolve_timeframe(timeframe: str) -> Timeframe:
+    """Parse a timeframe string, falling back to DEFAULT_TIMEFRAME if it is invalid"""
+    try:
+        return parse_timeframe(timeframe)
+    except ValueError:
+        return parse_timeframe(DEFAULT_TIMEFRAME)
+
+
+def get_base_interval(timeframe: Timeframe) -> Tuple[Timeframe, CandleInterval]:
+    """Coarsest downloaded interval whose candles tile `timeframe`"""
+    for base, interval in BASE_TIMEFRAMES:
+        if not timeframe.intraday:
+            if not base.intraday:
+                return base, interval
+        elif base.intraday and timeframe.seconds % base.seconds == 0:
+            return base, interval
+    raise ValueError(f"No base interval for timeframe {timeframe}")
+
+
+def parse_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[datetime, datetime]:
+    """Parse ISO dates from a request, defaulting to the last two years.
+
+    Raises ValueError on invalid format; naive dates are treated as UTC.
+    """
+    # The default start is truncated to the day so that concurrent requests
+    # for the default range are identical and can share one fetch
+    start_datetime = datetime.fromisoformat(start_date) if start_date else (now() - timedelta(days=730)).replace(hour=0, minute=0, second=0, microsecond=0)
+    end_datetime = datetime.fromisoformat(end_date) if end_date else now()
+
+    if start_datetime.tzinfo is None:
+        start_datetime = start_datetime.replace(tzinfo=timezone.utc)
+
+    if end_datetime.tzinfo is None:
+        end_datetime = end_datetime.replace(tzinfo=timezone.utc)
+
+    return start_datetime, end_datetime
 
 
 def get_tinkoff_market_data(
     figi: str, 
     from_date: datetime, 
     to_date: datetime = None, 
-    interval: CandleInterval = CandleInterval.CANDLE_INTERVAL_DAY
-) -> List[HistoricCandle]:
-    """Get market data from Tinkoff API with caching"""
+    interval: CandleInterval = CandleInterval.CANDLE_INTERVAL_DAY,
+    client: Optional[Any] = None
+) -> CandleSeries:
+    """Get market data from Tinkoff API with caching as a columnar series
+
+    Pass an already opened `client` to reuse its gRPC channel across calls.
+    Concurrent calls for the same (figi, interval, from, to) share one fetch,
+    ranges ending at the current time count as the same range. The returned
+    series is shared between those callers and must not be modified.
+    """
     if to_date is None:
         to_date = now()
     
@@ -144,50 +205,73 @@ def get_tinkoff_market_data(
     if to_date.tzinfo is None:
         to_date = to_date.replace(tzinfo=timezone.utc)
         
-    token = get_tinkoff_token()
-    if not token:
-        logger.error("Cannot fetch market data: Tinkoff token is not set")
-        return []
+    if client is None:
+        token = get_tinkoff_token()
+        if not token:
+            logger.error("Cannot fetch market data: Tinkoff token is not set")
+            return CandleSeries.empty()
         
+    def fetch() -> CandleSeries:
+        if client is not None:
+            return _fetch_candles(client, figi, from_date, to_date, interval)
+        
+        with Client(token) as services:
+            return _fetch_candles(request_scheduler.wrap(services), figi, from_date, to_date, interval)
+    
+    to_key = None if to_date >= now() - LIVE_RANGE_TOLERANCE else to_date
     try:
-        with Client(token) as client:
-            cache_settings = MarketDataCacheSettings(base_cache_dir=Path(MARKET_DATA_CACHE_DIR))
-            market_data_cache = MarketDataCache(settings=cache_settings, services=client)
-            
-            candles = list(market_data_cache.get_all_candles(
-                figi=figi,
-                from_=from_date,
-                to=to_date,
-                interval=interval
-            ))
-            
-            return candles
+        return candle_fetches.do((figi, int(interval), from_date, to_key), fetch)
     except Exception as e:
         logger.exception(f"Error getting market data for {figi}")
-        return []
+        return CandleSeries.empty()
+
+
+def get_candle_series(
+    figi: str,
+    from_date: datetime,
+    to_date: Optional[datetime],
+    timeframe: Timeframe,
+    client: Optional[Any] = None
+) -> CandleSeries:
+    """Candles of any timeframe, resampled locally from the base interval
+
+    Only base intervals are requested from the API and cached, so e.g. 30min,
+    4hour and 1week candles reuse the cached 15min, 1hour and 1day ones. The
+    range start is moved back to the start of its bucket, so the first
+    candle is not partial.
+    """
+    base, interval = get_base_interval(timeframe)
+    if base == timeframe:
+        return get_tinkoff_market_data(figi, from_date, to_date, interval, client)
+    
+    if from_date.tzinfo is None:
+        from_date = from_date.replace(tzinfo=timezone.utc)
+    from_date = datetime.fromtimestamp(bucket_start(int(from_date.timestamp()), timeframe), tz=timezone.utc)
+    
+    if to_date is None:
+        to_date = now()
+    elif to_date.tzinfo is None:
+        to_date = to_date.replace(tzinfo=timezone.utc)
+    
+    series = get_tinkoff_market_data(figi, from_date, to_date, interval, client)
+    return resample(series, timeframe, until=min(to_date, now()).timestamp())
+
+
+def _fetch_candles(client, figi: str, from_date: datetime, to_date: datetime, interval: CandleInterval) -> CandleSeries:
+    cache_settings = MarketDataCacheSettings(base_cache_dir=Path(MARKET_DATA_CACHE_DIR))
+    market_data_cache = MarketDataCache(settings=cache_settings, services=client)
+    
+    return CandleSeries.from_historic_candles(market_data_cache.get_all_candles(
+        figi=figi,
+        from_=from_date,
+        to=to_date,
+        interval=interval
+    ))
 
 
 def candles_to_dataframe_format(candles: List[HistoricCandle]) -> List[Dict[str, Any]]:
     """Convert candles to a format suitable for frontend charting"""
-    result = []
-    
-    for candle in candles:
-        open_price = candle.open.units + candle.open.nano / 1_000_000_000
-        high_price = candle.high.units + candle.high.nano / 1_000_000_000
-        low_price = candle.low.units + candle.low.nano / 1_000_000_000
-        close_price = candle.close.units + candle.close.nano / 1_000_000_000
-        
-        result.append({
-            'datetime': candle.time.isoformat(),
-            'open': open_price,
-            'high': high_price,
-            'low': low_price,
-            'close': close_price,
-            'volume': candle.volume,
-            'is_complete': candle.is_complete
-        })
-    
-    return result
+    return CandleSeries.from_historic_candles(candles).to_rows()
 
 
 @api_view(['GET'])
@@ -207,7 +291,7 @@ def get_available_tickers(request: Request) -> Response:
 @permission_classes([IsAuthenticated])
 def get_available_timeframes(request: Request) -> Response:
     """Get list of available timeframes"""
-    timeframes = list(TIMEFRAME_MAPPING.keys())
+    timeframes = list(TIMEFRAMES)
     return Response({"timeframes": timeframes})
 
 
@@ -228,40 +312,24 @@ def get_ticker_data(request: Request) -> Response:
         return Response({"error": f"FIGI not found for ticker {ticker}"}, status=404)
     
     try:
-        if start_date:
-            start_datetime = datetime.fromisoformat(start_date)
-        else:
-            start_datetime = now() - timedelta(days=730)
-            
-        if end_date:
-            end_datetime = datetime.fromisoformat(end_date)
-        else:
-            end_datetime = now()
-            
-        if start_datetime.tzinfo is None:
-            start_datetime = start_datetime.replace(tzinfo=timezone.utc)
-        
-        if end_datetime.tzinfo is None:
-            end_datetime = end_datetime.replace(tzinfo=timezone.utc)
-            
+        start_datetime, end_datetime = parse_date_range(start_date, end_date)
     except ValueError:
         return Response({"error": "Invalid date format. Use YYYY-MM-DD format."}, status=400)
     
     try:
-        interval = get_candle_interval(timeframe)
+        resolved_timeframe = resolve_timeframe(timeframe)
         
-        candles = get_tinkoff_market_data(
+        series = get_candle_series(
             figi=figi,
             from_date=start_datetime,
             to_date=end_datetime,
-            interval=interval
+            timeframe=resolved_timeframe
         )
         
-        if not candles:
+        if not series:
             return Response({"error": f"No data found for {ticker}"}, status=404)
             
-        data = candles_to_dataframe_format(candles)
-        return Response({"data": data})
+        return Response({"data": series.to_rows()})
     
     except Exception as e:
         logger.exception(f"Error getting data for {ticker}")
@@ -285,157 +353,26 @@ def generate_analysis(request: Request) -> Response:
     if not figi:
         return Response({"error": f"FIGI not found for ticker {ticker}"}, status=404)
     
-    
     try:
-        if start_date:
-            start_datetime = datetime.fromisoformat(start_date)
-        else:
-            start_datetime = now() - timedelta(days=730)
-            
-        if end_date:
-            end_datetime = datetime.fromisoformat(end_date)
-        else:
-            end_datetime = now()
-
-        if start_datetime.tzinfo is None:
-            start_datetime = start_datetime.replace(tzinfo=timezone.utc)
-        
-        if end_datetime.tzinfo is None:
-            end_datetime = end_datetime.replace(tzinfo=timezone.utc)
-            
+        start_datetime, end_datetime = parse_date_range(start_date, end_date)
     except ValueError:
         return Response({"error": "Invalid date format. Use YYYY-MM-DD format."}, status=400)
     
     try:
-        interval = get_candle_interval(timeframe)
+        resolved_timeframe = resolve_timeframe(timeframe)
         
-        candles = get_tinkoff_market_data(
+        series = get_candle_series(
             figi=figi,
             from_date=start_datetime,
             to_date=end_datetime,
-            interval=interval
+            timeframe=resolved_timeframe
         )
         
-        if not candles:
+        if not series:
             return Response({"error": f"No data found for {ticker}"}, status=404)
         
-        data = candles_to_dataframe_format(candles)
-        
-        result = {
-            "ticker": ticker,
-            "timeframe": timeframe,
-            "data": data,
-            "analysis": {}
-        }
-        
-        # Trend Indicators
-        
-        # SMA
-        if indicators.get('sma', {}).get('enabled'):
-            periods = indicators['sma'].get('periods', 20)
-            sma_values = calculate_sma(data, periods)
-            result["analysis"]["sma"] = {
-                "periods": periods,
-                "values": sma_values
-            }
-            
-        # EMA
-        if indicators.get('ema', {}).get('enabled'):
-            periods = indicators['ema'].get('periods', 20)
-            ema_values = calculate_ema(data, periods)
-            result["analysis"]["ema"] = {
-                "periods": periods,
-                "values": ema_values
-            }
-        
-        # Bollinger Bands
-        if indicators.get('bollinger', {}).get('enabled'):
-            periods = indicators['bollinger'].get('periods', 20)
-            std_dev = indicators['bollinger'].get('std_dev', 2)
-            
-            bollinger_values = calculate_bollinger_bands(data, periods, std_dev)
-            result["analysis"]["bollinger"] = {
-                "periods": periods,
-                "std_dev": std_dev,
-                "middle": bollinger_values["middle"],
-                "upper": bollinger_values["upper"],
-                "lower": bollinger_values["lower"]
-            }
-            
-        # Oscillators
-            
-        # MACD
-        if indicators.get('macd', {}).get('enabled'):
-            fast_period = indicators['macd'].get('fast_period', 12)
-            slow_period = indicators['macd'].get('slow_period', 26)
-            signal_period = indicators['macd'].get('signal_period', 9)
-            
-            macd_values = calculate_macd(data, fast_period, slow_period, signal_period)
-            result["analysis"]["macd"] = {
-                "fast_period": fast_period,
-                "slow_period": slow_period,
-                "signal_period": signal_period,
-                "macd": macd_values["macd"],
-                "signal": macd_values["signal"],
-                "histogram": macd_values["histogram"]
-            }
-        
-        # RSI
-        if indicators.get('rsi', {}).get('enabled'):
-            periods = indicators['rsi'].get('periods', 14)
-            
-            rsi_values = calculate_rsi(data, periods)
-            result["analysis"]["rsi"] = {
-                "periods": periods,
-                "values": rsi_values,
-                "upper_bound": indicators['rsi'].get('upper', 70),
-                "lower_bound": indicators['rsi'].get('lower', 30)
-            }
-            
-        # Stochastic Oscillator
-        if indicators.get('stochastic', {}).get('enabled'):
-            k_period = indicators['stochastic'].get('k_period', 14)
-            d_period = indicators['stochastic'].get('d_period', 3)
-            
-            stochastic_values = calculate_stochastic(data, k_period, d_period)
-            result["analysis"]["stochastic"] = {
-                "kPeriod": k_period,
-                "dPeriod": d_period,
-                "kLine": stochastic_values["k_line"],
-                "dLine": stochastic_values["d_line"],
-                "upperBound": indicators['stochastic'].get('upper', 80),
-                "lowerBound": indicators['stochastic'].get('lower', 20)
-            }
-            logger.info(f"Calculated Stochastic with k_period={k_period}, d_period={d_period}")
-            
-        # Williams %R
-        if indicators.get('williams_r', {}).get('enabled'):
-            periods = indicators['williams_r'].get('periods', 14)
-            
-            williams_r_values = calculate_williams_r(data, periods)
-            result["analysis"]["williams_r"] = {
-                "periods": periods,
-                "values": williams_r_values,
-                "upper_bound": indicators['williams_r'].get('upper', -20),
-                "lower_bound": indicators['williams_r'].get('lower', -80)
-            }
-            logger.info(f"Calculated Williams %R with periods={periods}")
-            
-        # Volume Indicators
-            
-        # OBV
-        if indicators.get('obv', {}).get('enabled'):
-            obv_values = calculate_obv(data)
-            result["analysis"]["obv"] = {
-                "values": obv_values
-            }
-            
-        # VWAP
-        if indicators.get('vwap', {}).get('enabled'):
-            vwap_values = calculate_vwap(data)
-            result["analysis"]["vwap"] = {
-                "values": vwap_values
-            }
+        range_end = int(end_datetime.timestamp()) if end_date else None
+        result = build_analysis(ticker, figi, timeframe, resolved_timeframe, series, indicators, range_end)
         
         return Response(result)
     
@@ -444,107 +381,242 @@ def generate_analysis(request: Request) -> Response:
         return Response({"error": str(e)}, status=500)
 
 
-def calculate_sma(data: List[Dict[str, Any]], periods: int) -> List[List[Any]]:
-    """Calculate Simple Moving Average"""
-    if len(data) < periods:
-        return []
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_analysis_batch(request: Request) -> Response:
+    """Generate technical analysis for many tickers with one indicator spec
+
+    Candles are fetched concurrently on a bounded thread pool over a single
+    shared client (one gRPC channel). Results and per-ticker errors are keyed
+    by ticker.
+    """
+    tickers = request.data.get('tickers')
+    start_date = request.data.get('start_date')
+    end_date = request.data.get('end_date')
+    timeframe = request.data.get('timeframe', DEFAULT_TIMEFRAME)
+    indicators = request.data.get('indicators', {})
     
-    sma_values = []
-    for i in range(len(data)):
-        if i < periods - 1:
-            sma_values.append([data[i]["datetime"], None])
-            continue
-        
-        sum_close = sum(data[j]["close"] for j in range(i - periods + 1, i + 1))
-        sma = sum_close / periods
-        sma_values.append([data[i]["datetime"], sma])
+    if not tickers or not isinstance(tickers, list):
+        return Response({"error": "Tickers parameter must be a non-empty list"}, status=400)
     
-    return sma_values
-
-
-def calculate_ema(data: List[Dict[str, Any]], periods: int) -> List[List[Any]]:
-    """Calculate Exponential Moving Average"""
-    if len(data) < periods:
-        return []
+    if len(tickers) > ANALYSIS_BATCH_MAX_TICKERS:
+        return Response({"error": f"At most {ANALYSIS_BATCH_MAX_TICKERS} tickers per request"}, status=400)
     
-    ema_values = []
-    for i in range(periods-1):
-        ema_values.append([data[i]["datetime"], None])
+    if not all(isinstance(ticker, str) for ticker in tickers):
+        return Response({"error": "Tickers must be strings"}, status=400)
     
-    initial_sma = sum(data[i]["close"] for i in range(periods)) / periods
-    ema_values.append([data[periods-1]["datetime"], initial_sma])
+    try:
+        start_datetime, end_datetime = parse_date_range(start_date, end_date)
+    except ValueError:
+        return Response({"error": "Invalid date format. Use YYYY-MM-DD format."}, status=400)
     
-    multiplier = 2 / (periods + 1)
+    config = load_config()
+    figis = {ticker_config["TICKER"]: ticker_config.get("FIGI") for ticker_config in config["TICKERS"]}
     
-    current_ema = initial_sma
-    for i in range(periods, len(data)):
-        current_ema = (data[i]["close"] - current_ema) * multiplier + current_ema
-        ema_values.append([data[i]["datetime"], current_ema])
+    results = {}
+    errors = {}
+    tickers = list(dict.fromkeys(tickers))
+    for ticker in tickers:
+        if not figis.get(ticker):
+            errors[ticker] = f"FIGI not found for ticker {ticker}"
     
-    return ema_values
-
-
-def calculate_macd(data: List[Dict[str, Any]], fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Dict[str, List[List[Any]]]:
-    """Calculate MACD (Moving Average Convergence Divergence)"""
-    if len(data) < slow_period + signal_period:
-        return {"macd": [], "signal": [], "histogram": []}
+    requested = [ticker for ticker in tickers if ticker not in errors]
+    if not requested:
+        return Response({"timeframe": timeframe, "results": results, "errors": errors})
     
-    fast_ema = calculate_ema(data, fast_period)
-    slow_ema = calculate_ema(data, slow_period)
+    token = get_tinkoff_token()
+    if not token:
+        return Response({"error": "Tinkoff token is not set"}, status=500)
+    
+    resolved_timeframe = resolve_timeframe(timeframe)
+    range_end = int(end_datetime.timestamp()) if end_date else None
+    
+    def analyze(ticker: str, client) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            series = get_candle_series(
+                figi=figis[ticker],
+                from_date=start_datetime,
+                to_date=end_datetime,
+                timeframe=resolved_timeframe,
+                client=client
+            )
+            if not series:
+                return None, f"No data found for {ticker}"
+            return build_analysis(ticker, figis[ticker], timeframe, resolved_timeframe, series, indicators, range_end), None
+        except Exception as e:
+            logger.exception(f"Error generating analysis for {ticker}")
+            return None, str(e)
     
-    macd_line = []
+    try:
+        with Client(token) as services:
+            client = request_scheduler.wrap(services)
+            with ThreadPoolExecutor(max_workers=min(ANALYSIS_BATCH_WORKERS, len(requested))) as executor:
+                outcomes = list(executor.map(lambda ticker: analyze(ticker, client), requested))
+    except Exception as e:
+        logger.exception("Error generating batch analysis")
+        return Response({"error": str(e)}, status=500)
     
-    for i in range(len(data)):
-        if i < slow_period - 1:
-            macd_line.append([data[i]["datetime"], None])
-            continue
-        
-        fast_value = fast_ema[i][1]
-        slow_value = slow_ema[i][1]
-        
-        if fast_value is None or slow_value is None:
-            macd_line.append([data[i]["datetime"], None])
+    for ticker, (result, error) in zip(requested, outcomes):
+        if error is None:
+            results[ticker] = result
         else:
-            macd_line.append([data[i]["datetime"], fast_value - slow_value])
+            errors[ticker] = error
     
-    signal_data = []
-    for i in range(len(data)):
-        if macd_line[i][1] is not None:
-            signal_data.append({"datetime": data[i]["datetime"], "close": macd_line[i][1]})
+    return Response({"timeframe": timeframe, "results": results, "errors": errors})
+
+
+def build_analysis(
+    ticker: str,
+    figi: str,
+    timeframe: str,
+    resolved_timeframe: Timeframe,
+    series: CandleSeries,
+    indicators: Dict[str, Any],
+    range_end: Optional[int] = None
+) -> Dict[str, Any]:
+    """Run enabled indicators over a candle series and build the analysis response.
+
+    `range_end` is the requested end timestamp, None for open-ended requests:
+    those share indicator cache entries since their series only grows at the tail.
+    """
+    datetimes = series.datetimes()
+    engine = indicator_cache.bind((figi, str(resolved_timeframe), int(series.time[0]), range_end), series)
+    
+    result = {
+        "ticker": ticker,
+        "timeframe": timeframe,
+        "data": series.to_rows(datetimes),
+        "analysis": {}
+    }
     
-    # signal line (EMA of MACD)
-    signal_line_full = calculate_ema(signal_data, signal_period) if signal_data else []
+    # Trend Indicators
     
-    signal_line = []
-    signal_idx = 0
+    # SMA
+    if indicators.get('sma', {}).get('enabled'):
+        periods = indicators['sma'].get('periods', 20)
+        sma_values = series_to_pairs(datetimes, engine.sma(periods))
+        result["analysis"]["sma"] = {
+            "periods": periods,
+            "values": sma_values
+        }
+        
+    # EMA
+    if indicators.get('ema', {}).get('enabled'):
+        periods = indicators['ema'].get('periods', 20)
+        ema_values = series_to_pairs(datetimes, engine.ema(periods))
+        result["analysis"]["ema"] = {
+            "periods": periods,
+            "values": ema_values
+        }
     
-    for i in range(len(data)):
-        if i < slow_period + signal_period - 2:
-            signal_line.append([data[i]["datetime"], None])
-        else:
-            if signal_idx < len(signal_line_full):
-                signal_line.append([data[i]["datetime"], signal_line_full[signal_idx][1]])
-                signal_idx += 1
-            else:
-                signal_line.append([data[i]["datetime"], None])
-    
-    # histogram (MACD - Signal)
-    histogram = []
-    
-    for i in range(len(data)):
-        macd_value = macd_line[i][1]
-        signal_value = signal_line[i][1]
+    # Bollinger Bands
+    if indicators.get('bollinger', {}).get('enabled'):
+        periods = indicators['bollinger'].get('periods', 20)
+        std_dev = indicators['bollinger'].get('std_dev', 2)
+        
+        bollinger_values = _bollinger_pairs(datetimes, engine, periods, std_dev)
+        result["analysis"]["bollinger"] = {
+            "periods": periods,
+            "std_dev": std_dev,
+            "middle": bollinger_values["middle"],
+            "upper": bollinger_values["upper"],
+            "lower": bollinger_values["lower"]
+        }
         
-        if macd_value is None or signal_value is None:
-            histogram.append([data[i]["datetime"], None])
-        else:
-            histogram.append([data[i]["datetime"], macd_value - signal_value])
+    # Oscillators
+        
+    # MACD
+    if indicators.get('macd', {}).get('enabled'):
+        fast_period = indicators['macd'].get('fast_period', 12)
+        slow_period = indicators['macd'].get('slow_period', 26)
+        signal_period = indicators['macd'].get('signal_period', 9)
+        
+        macd_values = _macd_pairs(datetimes, engine, fast_period, slow_period, signal_period)
+        result["analysis"]["macd"] = {
+            "fast_period": fast_period,
+            "slow_period": slow_period,
+            "signal_period": signal_period,
+            "macd": macd_values["macd"],
+            "signal": macd_values["signal"],
+            "histogram": macd_values["histogram"]
+        }
     
-    return {
-        "macd": macd_line,
-        "signal": signal_line,
-        "histogram": histogram
-    }
+    # RSI
+    if indicators.get('rsi', {}).get('enabled'):
+        periods = indicators['rsi'].get('periods', 14)
+        
+        rsi_values = series_to_pairs(datetimes, engine.rsi(periods))
+        result["analysis"]["rsi"] = {
+            "periods": periods,
+            "values": rsi_values,
+            "upper_bound": indicators['rsi'].get('upper', 70),
+            "lower_bound": indicators['rsi'].get('lower', 30)
+        }
+        
+    # Stochastic Oscillator
+    if indicators.get('stochastic', {}).get('enabled'):
+        k_period = indicators['stochastic'].get('k_period', 14)
+        d_period = indicators['stochastic'].get('d_period', 3)
+        
+        stochastic_values = _stochastic_pairs(datetimes, engine, k_period, d_period)
+        result["analysis"]["stochastic"] = {
+            "kPeriod": k_period,
+            "dPeriod": d_period,
+            "kLine": stochastic_values["k_line"],
+            "dLine": stochastic_values["d_line"],
+            "upperBound": indicators['stochastic'].get('upper', 80),
+            "lowerBound": indicators['stochastic'].get('lower', 20)
+        }
+        logger.info(f"Calculated Stochastic with k_period={k_period}, d_period={d_period}")
+        
+    # Williams %R
+    if indicators.get('williams_r', {}).get('enabled'):
+        periods = indicators['williams_r'].get('periods', 14)
+        
+        williams_r_values = _williams_r_pairs(datetimes, engine, periods)
+        result["analysis"]["williams_r"] = {
+            "periods": periods,
+            "values": williams_r_values,
+            "upper_bound": indicators['williams_r'].get('upper', -20),
+            "lower_bound": indicators['williams_r'].get('lower', -80)
+        }
+        logger.info(f"Calculated Williams %R with periods={periods}")
+        
+    # Volume Indicators
+        
+    # OBV
+    if indicators.get('obv', {}).get('enabled'):
+        obv_values = series_to_pairs(datetimes, engine.obv())
+        result["analysis"]["obv"] = {
+            "values": obv_values
+        }
+        
+    # VWAP
+    if indicators.get('vwap', {}).get('enabled'):
+        vwap_values = series_to_pairs(datetimes, engine.vwap())
+        result["analysis"]["vwap"] = {
+            "values": vwap_values
+        }
+
+    return result
+
+
+def calculate_sma(data: List[Dict[str, Any]], periods: int) -> List[List[Any]]:
+    """Calculate Simple Moving Average"""
+    engine = IndicatorEngine.from_rows(data)
+    return series_to_pairs(_datetimes(data), engine.sma(periods))
+
+
+def calculate_ema(data: List[Dict[str, Any]], periods: int) -> List[List[Any]]:
+    """Calculate Exponential Moving Average"""
+    engine = IndicatorEngine.from_rows(data)
+    return series_to_pairs(_datetimes(data), engine.ema(periods))
+
+
+def calculate_macd(data: List[Dict[str, Any]], fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Dict[str, List[List[Any]]]:
+    """Calculate MACD (Moving Average Convergence Divergence)"""
+    engine = IndicatorEngine.from_rows(data)
+    return _macd_pairs(_datetimes(data), engine, fast_period, slow_period, signal_period)
 
 
 def calculate_stochastic(data: List[Dict[str, Any]], k_period: int = 14, d_period: int = 3) -> Dict[str, List[List[Any]]]:
@@ -564,57 +636,8 @@ def calculate_stochastic(data: List[Dict[str, Any]], k_period: int = 14, d_perio
     Returns:
         Dictionary with 'k_line' and 'd_line' keys, each containing list of [datetime, value] pairs
     """
-    if len(data) < k_period:
-        logger.warning(f"Not enough data points for Stochastic Oscillator calculation. Need at least {k_period}, got {len(data)}")
-        return {"k_line": [], "d_line": []}
-    
-    try:
-        k_line = []
-        
-        # %K
-        for i in range(len(data)):
-            if i < k_period - 1:
-                k_line.append([data[i]["datetime"], None])
-                continue
-            
-            highest_high = max(data[j]["high"] for j in range(i - k_period + 1, i + 1))
-            lowest_low = min(data[j]["low"] for j in range(i - k_period + 1, i + 1))
-            
-            if highest_high == lowest_low:
-                k_value = 50
-                logger.debug(f"Stochastic: highest_high equals lowest_low at index {i}, using k_value=50")
-            else:
-                k_value = 100 * (data[i]["close"] - lowest_low) / (highest_high - lowest_low)
-            
-            k_line.append([data[i]["datetime"], k_value])
-        
-        # %D (SMA of %K)
-        d_line = []
-        
-        for i in range(len(data)):
-            if i < k_period + d_period - 2:
-                d_line.append([data[i]["datetime"], None])
-                continue
-            
-            sum_k = sum(k_line[j][1] for j in range(i - d_period + 1, i + 1) if k_line[j][1] is not None)
-            valid_count = sum(1 for j in range(i - d_period + 1, i + 1) if k_line[j][1] is not None)
-            
-            if valid_count > 0:
-                d_value = sum_k / valid_count
-            else:
-                d_value = None
-                logger.debug(f"Stochastic: No valid %K values found for %D at index {i}")
-                
-            d_line.append([data[i]["datetime"], d_value])
-        
-        logger.info(f"Stochastic Oscillator calculated successfully: {len(k_line)} K points, {len(d_line)} D points")
-        return {
-            "k_line": k_line,
-            "d_line": d_line
-        }
-    except Exception as e:
-        logger.exception(f"Error calculating Stochastic Oscillator")
-        return {"k_line": [], "d_line": []}
+    engine = IndicatorEngine.from_rows(data)
+    return _stochastic_pairs(_datetimes(data), engine, k_period, d_period)
 
 
 def calculate_williams_r(data: List[Dict[str, Any]], periods: int = 14) -> List[List[Any]]:
@@ -631,168 +654,92 @@ def calculate_williams_r(data: List[Dict[str, Any]], periods: int = 14) -> List[
     Returns:
         List of [datetime, value] pairs where value is between 0 and -100
     """
-    if len(data) < periods:
-        logger.warning(f"Not enough data points for Williams %R calculation. Need at least {periods}, got {len(data)}")
-        return []
-    
-    try:
-        williams_r_values = []
-        
-        for i in range(len(data)):
-            if i < periods - 1:
-                williams_r_values.append([data[i]["datetime"], None])
-                continue
-            
-            highest_high = max(data[j]["high"] for j in range(i - periods + 1, i + 1))
-            lowest_low = min(data[j]["low"] for j in range(i - periods + 1, i + 1))
-            
-            if highest_high == lowest_low:
-                williams_r = -50
-                logger.debug(f"Williams %R: highest_high equals lowest_low at index {i}, using williams_r=-50")
-            else:
-                williams_r = -100 * (highest_high - data[i]["close"]) / (highest_high - lowest_low)
-            
-            williams_r_values.append([data[i]["datetime"], williams_r])
-        
-        logger.info(f"Williams %R calculated successfully: {len(williams_r_values)} points")
-        return williams_r_values
-    except Exception as e:
-        logger.exception(f"Error calculating Williams %R")
-        return []
+    engine = IndicatorEngine.from_rows(data)
+    return _williams_r_pairs(_datetimes(data), engine, periods)
 
 
 def calculate_obv(data: List[Dict[str, Any]]) -> List[List[Any]]:
     """Calculate On-Balance Volume"""
-    if not data:
-        return []
-    
-    obv_values = []
-    current_obv = 0
-    
-    obv_values.append([data[0]["datetime"], current_obv])
-    
-    for i in range(1, len(data)):
-        if data[i]["close"] > data[i-1]["close"]:
-            current_obv += data[i]["volume"]
-        elif data[i]["close"] < data[i-1]["close"]:
-            current_obv -= data[i]["volume"]
-
-        obv_values.append([data[i]["datetime"], current_obv])
-    
-    return obv_values
+    engine = IndicatorEngine.from_rows(data)
+    return series_to_pairs(_datetimes(data), engine.obv())
 
 
 def calculate_vwap(data: List[Dict[str, Any]]) -> List[List[Any]]:
     """Calculate Volume Weighted Average Price"""
-    if not data:
-        return []
-    
-    vwap_values = []
-
-    cumulative_pv = 0
-    cumulative_volume = 0
-    
-    for i, candle in enumerate(data):
-        typical_price = (candle["high"] + candle["low"] + candle["close"]) / 3
-        cumulative_pv += typical_price * candle["volume"]
-        cumulative_volume += candle["volume"]
-        
-        if cumulative_volume == 0:
-            vwap_values.append([candle["datetime"], None])
-        else:
-            vwap_values.append([candle["datetime"], cumulative_pv / cumulative_volume])
-    
-    return vwap_values
+    engine = IndicatorEngine.from_rows(data)
+    return series_to_pairs(_datetimes(data), engine.vwap())
 
 
 def calculate_bollinger_bands(data: List[Dict[str, Any]], periods: int, std_dev: float) -> Dict[str, List[List[Any]]]:
     """Calculate Bollinger Bands"""
-    if len(data) < periods:
-        return {"middle": [], "upper": [], "lower": []}
-    
-    middle_band = []
-    upper_band = []
-    lower_band = []
-    
-    for i in range(len(data)):
-        if i < periods - 1:
-            middle_band.append([data[i]["datetime"], None])
-            upper_band.append([data[i]["datetime"], None])
-            lower_band.append([data[i]["datetime"], None])
-            continue
-        
-        # SMA
-        prices = [data[j]["close"] for j in range(i - periods + 1, i + 1)]
-        sma = sum(prices) / periods
-        
-        # standard deviation
-        variance = sum((price - sma) ** 2 for price in prices) / periods
-        std = variance ** 0.5
-        
-        middle_band.append([data[i]["datetime"], sma])
-        upper_band.append([data[i]["datetime"], sma + (std * std_dev)])
-        lower_band.append([data[i]["datetime"], sma - (std * std_dev)])
-    
-    return {
-        "middle": middle_band,
-        "upper": upper_band,
-        "lower": lower_band
-    }
+    engine = IndicatorEngine.from_rows(data)
+    return _bollinger_pairs(_datetimes(data), engine, periods, std_dev)
 
 
 def calculate_rsi(data: List[Dict[str, Any]], periods: int) -> List[List[Any]]:
     """Calculate Relative Strength Index"""
-    if len(data) < periods + 1:
-        return []
-    
-    rsi_values = []
-    
-    gains = []
-    losses = []
-    
-    for i in range(periods):
-        rsi_values.append([data[i]["datetime"], None])
-    
-    # initial average gain and loss
-    for i in range(1, periods + 1):
-        change = data[i]["close"] - data[i-1]["close"]
-        if change > 0:
-            gains.append(change)
-            losses.append(0)
-        else:
-            gains.append(0)
-            losses.append(abs(change))
-    
-    avg_gain = sum(gains) / periods
-    avg_loss = sum(losses) / periods
+    engine = IndicatorEngine.from_rows(data)
+    return series_to_pairs(_datetimes(data), engine.rsi(periods))
+
+
+def _datetimes(data: List[Dict[str, Any]]) -> List[str]:
+    return [row["datetime"] for row in data]
+
+
+def _macd_pairs(datetimes: List[str], engine: IndicatorEngine, fast_period: int, slow_period: int, signal_period: int) -> Dict[str, List[List[Any]]]:
+    values = engine.macd(fast_period, slow_period, signal_period)
+    if values is None:
+        return {"macd": [], "signal": [], "histogram": []}
     
-    if avg_loss == 0:
-        rs = 100
-    else:
-        rs = avg_gain / avg_loss
+    return {
+        "macd": series_to_pairs(datetimes, values["macd"]),
+        "signal": series_to_pairs(datetimes, values["signal"]),
+        "histogram": series_to_pairs(datetimes, values["histogram"])
+    }
+
+
+def _bollinger_pairs(datetimes: List[str], engine: IndicatorEngine, periods: int, std_dev: float) -> Dict[str, List[List[Any]]]:
+    values = engine.bollinger_bands(periods, std_dev)
+    if values is None:
+        return {"middle": [], "upper": [], "lower": []}
     
-    rsi = 100 - (100 / (1 + rs))
-    rsi_values.append([data[periods]["datetime"], rsi])
+    return {
+        "middle": series_to_pairs(datetimes, values["middle"]),
+        "upper": series_to_pairs(datetimes, values["upper"]),
+        "lower": series_to_pairs(datetimes, values["lower"])
+    }
 
-    for i in range(periods + 1, len(data)):
-        change = data[i]["close"] - data[i-1]["close"]
-        
-        if change > 0:
-            current_gain = change
-            current_loss = 0
-        else:
-            current_gain = 0
-            current_loss = abs(change)
-        
-        avg_gain = ((avg_gain * (periods - 1)) + current_gain) / periods
-        avg_loss = ((avg_loss * (periods - 1)) + current_loss) / periods
-        
-        if avg_loss == 0:
-            rs = 100
-        else:
-            rs = avg_gain / avg_loss
+
+def _stochastic_pairs(datetimes: List[str], engine: IndicatorEngine, k_period: int, d_period: int) -> Dict[str, List[List[Any]]]:
+    if len(engine) < k_period:
+        logger.warning(f"Not enough data points for Stochastic Oscillator calculation. Need at least {k_period}, got {len(engine)}")
+        return {"k_line": [], "d_line": []}
+    
+    try:
+        values = engine.stochastic(k_period, d_period)
+        k_line = series_to_pairs(datetimes, values["k_line"])
+        d_line = series_to_pairs(datetimes, values["d_line"])
         
-        rsi = 100 - (100 / (1 + rs))
-        rsi_values.append([data[i]["datetime"], rsi])
+        logger.info(f"Stochastic Oscillator calculated successfully: {len(k_line)} K points, {len(d_line)} D points")
+        return {
+            "k_line": k_line,
+            "d_line": d_line
+        }
+    except Exception as e:
+        logger.exception(f"Error calculating Stochastic Oscillator")
+        return {"k_line": [], "d_line": []}
+
+
+def _williams_r_pairs(datetimes: List[str], engine: IndicatorEngine, periods: int) -> List[List[Any]]:
+    if len(engine) < periods:
+        logger.warning(f"Not enough data points for Williams %R calculation. Need at least {periods}, got {len(engine)}")
+        return []
     
-    return rsi_values
\ No newline at end of file
+    try:
+        williams_r_values = series_to_pairs(datetimes, engine.williams_r(periods))
+        
+        logger.info(f"Williams %R calculated successfully: {len(williams_r_values)} points")
+        return williams_r_values
+    except Exception as e:
+        logger.exception(f"Error calculating Williams %R")
+        return []
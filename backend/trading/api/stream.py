@@ -0,0 +1,148 @@
+import asyncio
+import json
+from typing import Dict, Any, Awaitable, Callable, Optional
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..market_data import market_data_manager
+
+MARKET_DATA_STREAM_PATH = "/api/market-data/stream/"
+MARKET_DATA_MAX_SYMBOLS = getattr(settings, "MARKET_DATA_MAX_SYMBOLS", 500)
+MARKET_DATA_STREAM_HEARTBEAT = getattr(settings, "MARKET_DATA_STREAM_HEARTBEAT", 15.0)
+
+
+def _token_is_valid(key: str) -> bool:
+    from rest_framework.authtoken.models import Token
+    return Token.objects.filter(key=key, user__is_active=True).exists()
+
+
+def _format_event(event: Dict[str, Any]) -> bytes:
+    data = json.dumps({key: value for key, value in event.items() if key != "type"}, default=str)
+    return f"event: {event['type']}\ndata: {data}\n\n".encode()
+
+
+class MarketDataEventStream:
+    """ASGI app streaming live prices and candles as Server-Sent Events.
+
+    GET <path>?symbols=FIGI1,FIGI2[&provider=tinkoff][&token=...]
+
+    The DRF token is taken from the Authorization header or, since browsers'
+    EventSource cannot set headers, from the `token` query parameter. The
+    client first receives a `snapshot` event per symbol with known data, then
+    `price` and `candle` events as they arrive, and a comment line every
+    `heartbeat` seconds to keep proxies from closing the connection.
+    """
+
+    def __init__(
+        self,
+        authenticate: Optional[Callable[[str], Awaitable[bool]]] = None,
+        provider_source: Optional[Callable[[Optional[str]], Any]] = None,
+        heartbeat: float = MARKET_DATA_STREAM_HEARTBEAT
+    ):
+        self._authenticate = authenticate or sync_to_async(_token_is_valid)
+        self._provider_source = provider_source or self._get_provider
+        self.heartbeat = heartbeat
+
+    @staticmethod
+    def _get_provider(provider_name: Optional[str]):
+        if provider_name:
+            return market_data_manager.get_provider(provider_name)
+        return market_data_manager.get_active_provider()
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        headers = dict(scope.get("headers", []))
+
+        token = query.get("token", [None])[0]
+        authorization = headers.get(b"authorization", b"").decode()
+        if authorization.startswith("Token "):
+            token = authorization[len("Token "):]
+        if not token or not await self._authenticate(token):
+            return await self._error(send, "Authentication credentials were not provided or are invalid", 401)
+
+        symbols = [symbol.strip() for value in query.get("symbols", []) for symbol in value.split(",")]
+        symbols = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+        if not symbols:
+            return await self._error(send, "Symbols parameter is required", 400)
+        if len(symbols) > MARKET_DATA_MAX_SYMBOLS:
+            return await self._error(send, f"At most {MARKET_DATA_MAX_SYMBOLS} symbols per request", 400)
+
+        provider = self._provider_source(query.get("provider", [None])[0])
+        if not provider:
+            return await self._error(send, "No active provider", 400)
+        if not provider.is_connected():
+            return await self._error(send, "Provider not connected", 400)
+        if getattr(provider, "stream", None) is None:
+            return await self._error(send, "Provider does not support streaming", 400)
+
+        subscription = provider.stream.subscribe(symbols, loop=asyncio.get_event_loop())
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ]
+            })
+            for symbol in symbols:
+                state = provider.stream.get_state(symbol)
+                if state is not None and state.updated_at is not None:
+                    await self._send(send, dict(state.snapshot(), type="snapshot"))
+
+            await self._pump(subscription, disconnected, send)
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _pump(self, subscription, disconnected: asyncio.Future, send) -> None:
+        while True:
+            event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({event, disconnected}, timeout=self.heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if event in done:
+                await self._send(send, event.result())
+            else:
+                event.cancel()
+            if disconnected in done:
+                return
+            if not done:
+                await send({"type": "http.response.body", "body": b": ping\n\n", "more_body": True})
+
+    @staticmethod
+    async def _send(send, event: Dict[str, Any]) -> None:
+        await send({"type": "http.response.body", "body": _format_event(event), "more_body": True})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    @staticmethod
+    async def _error(send, message: str, status: int) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")]
+        })
+        await send({"type": "http.response.body", "body": json.dumps({"error": message}).encode()})
+
+
+def with_market_data_stream(application, path: str = MARKET_DATA_STREAM_PATH, stream_app: Optional[MarketDataEventStream] = None):
+    """Wrap the Django ASGI application so that `path` is served by the
+    market data event stream"""
+    stream_app = stream_app or MarketDataEventStream()
+
+    async def router(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == path and scope["method"] == "GET":
+            return await stream_app(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
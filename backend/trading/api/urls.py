@@ -3,13 +3,15 @@ from django.urls import path
 from .views import (
     PositionListCreateView, PositionDetailView,
     MarketDataProviderListView, MarketDataProviderConnectView, MarketDataProviderDisconnectView,
-    MarketDataPriceView, MarketDataStatsView, MarketDataServerTimeView, MarketDataSymbolsView,
+    MarketDataPriceView, MarketDataPricesView, MarketDataSchedulerView, MarketDataStatsView, MarketDataServerTimeView, MarketDataSymbolsView,
     PortfolioBalanceView, SandboxBalanceView, PortfolioPositionsView, MarketDataFigiView,
     MarketDataProviderAccountsView, TransactionHistoryView,
-    run_backtest_view, get_backtest_result_view,
+    run_backtest_view, get_backtest_result_view, cancel_backtest_view,
     sandbox_order_view
 )
-from .analysis import get_available_tickers, get_ticker_data, generate_analysis, get_available_timeframes
+from .analysis import (
+    get_available_tickers, get_ticker_data, generate_analysis, generate_analysis_batch, get_available_timeframes
+)
 
 urlpatterns = [
     path('positions/', PositionListCreateView.as_view()),
@@ -20,10 +22,12 @@ urlpatterns = [
     path('market-data/providers/<str:provider_name>/disconnect/', MarketDataProviderDisconnectView.as_view()),
     path('market-data/providers/<str:provider_name>/accounts/', MarketDataProviderAccountsView.as_view()),
     path('market-data/price/', MarketDataPriceView.as_view()),
+    path('market-data/prices/', MarketDataPricesView.as_view()),
     path('market-data/stats/', MarketDataStatsView.as_view()),
     path('market-data/time/', MarketDataServerTimeView.as_view()),
     path('market-data/symbols/', MarketDataSymbolsView.as_view()),
     path('market-data/figi/', MarketDataFigiView.as_view()),
+    path('market-data/scheduler/', MarketDataSchedulerView.as_view()),
     
     path('portfolio/balance/', PortfolioBalanceView.as_view()),
     path('portfolio/positions/', PortfolioPositionsView.as_view()),
@@ -34,9 +38,11 @@ urlpatterns = [
     path('analysis/timeframes/', get_available_timeframes),
     path('analysis/ticker-data/', get_ticker_data),
     path('analysis/generate/', generate_analysis),
+    path('analysis/generate-batch/', generate_analysis_batch),
 
     path('backtest/', run_backtest_view),
     path('backtest/<str:task_id>/', get_backtest_result_view),
+    path('backtest/<str:task_id>/cancel/', cancel_backtest_view),
 
     path('sandbox/order/', sandbox_order_view),
 ]
@@ -4,143 +4,80 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 import requests
 import logging
-import threading
-import uuid
-import json
-import sys
-import importlib
-import importlib.util
-import os
-from pathlib import Path
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.http import JsonResponse
+from django.utils import timezone
 
 from .serializers import PositionSerializer
-from ..models import Position
+from .. import backtests
+from ..models import BacktestJob, Position
 from ..market_data import market_data_manager
+from ..market_data.scheduler import request_scheduler
 
 
 logger = logging.getLogger(__name__)
 
-RISKMANAGEMENT_PATH = Path('/usr/src/RiskManagement')
-BACKTEST_RESULTS = {}
-
-def run_backtest_async(task_id, params):
-    logger.info(f"RiskManagement path: {RISKMANAGEMENT_PATH}")
-    
-    if not os.path.exists(RISKMANAGEMENT_PATH):
-        logger.error(f"Directory does not exist: {RISKMANAGEMENT_PATH}")
-        BACKTEST_RESULTS[task_id] = {"error": f"Import error: Directory not found: {RISKMANAGEMENT_PATH}"}
-        return
-        
-    bt_file_path = RISKMANAGEMENT_PATH / "backtrader_complex.py"
-    if not os.path.exists(bt_file_path):
-        logger.error(f"File does not exist: {bt_file_path}")
-        BACKTEST_RESULTS[task_id] = {"error": f"Import error: File not found: {bt_file_path}"}
-        return
-
-    sys.path.insert(0, str(RISKMANAGEMENT_PATH))
-    try:
-        try:
-            import backtrader_complex
-        except ModuleNotFoundError:
-            spec = importlib.util.spec_from_file_location(
-                "backtrader_complex",
-                str(RISKMANAGEMENT_PATH / "backtrader_complex.py")
-            )
-            backtrader_complex = importlib.util.module_from_spec(spec)
-            sys.modules["backtrader_complex"] = backtrader_complex
-            spec.loader.exec_module(backtrader_complex)
-        importlib.reload(backtrader_complex)
-    except Exception as import_exc:
-        logger.exception("Failed to import backtrader_complex in run_backtest_async")
-        BACKTEST_RESULTS[task_id] = {"error": f"Import error: {import_exc}"}
-        return
-
-    config_path = RISKMANAGEMENT_PATH / 'config_web_ru.json'
-    config = {
-        "TICKERS": [
-            {
-                "TICKER": params["ticker"],
-                "EXCHANGE": "MOEX",
-                "START_DATE": params["start_date"],
-                "END_DATE": params["end_date"],
-                "INTERVAL": "1d",
-                "CAPITAL": params["capital"],
-                "RISK_PERCENT": params["risk_percent"],
-                "PROFIT_TO_RISK": 3,
-                "ATR_MULTIPLIER": 1.5,
-                "ATR_WINDOW": 14,
-                "STOP_LOSS_METHOD": params["stop_loss_method"],
-                "TAKE_PROFIT_METHOD": params["take_profit_method"],
-                "POSITION": "long"
-            }
-        ],
-        "STOP_LOSS_METHODS": [params["stop_loss_method"]],
-        "TAKE_PROFIT_METHODS": [params["take_profit_method"]]
-    }
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=2)
-    # Run backtest
-    try:
-        backtrader_complex.CONFIG_FILE = str(config_path)
-        backtrader_complex.RESULTS_PATH = str(RISKMANAGEMENT_PATH / 'results_bt_complex')
-
-        result_df, trades = backtrader_complex.backtest(
-            backtrader_complex.TinkoffDataClient().load_market_data(
-                ticker=params["ticker"],
-                exchange="MOEX",
-                interval="1d",
-                start_date=params["start_date"],
-                end_date=params["end_date"],
-                csv_file_name=None
-            ),
-            config["TICKERS"][0]
-        )
-
-        summary = {}
-        if not result_df.empty:
-            summary = {
-                "initial_balance": config["TICKERS"][0]["CAPITAL"],
-                "final_balance": float(result_df["Balance"].iloc[-1]),
-                "profit_loss": float(result_df["Balance"].iloc[-1]) - config["TICKERS"][0]["CAPITAL"],
-                "profit_percent": (float(result_df["Balance"].iloc[-1]) - config["TICKERS"][0]["CAPITAL"]) / config["TICKERS"][0]["CAPITAL"] * 100,
-                "trade_count": int(result_df["Entry"].count()),
-                "win_rate": float(result_df[result_df["Profit/Loss"] > 0].shape[0]) / result_df["Entry"].count() * 100 if result_df["Entry"].count() > 0 else 0
-            }
-        
-        balance_curve_df = result_df[["Date", "Balance"]].copy()
-        if hasattr(balance_curve_df["Date"].dtype, 'tz') and balance_curve_df["Date"].dtype.tz is not None:
-            balance_curve_df["Date"] = balance_curve_df["Date"].dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        BACKTEST_RESULTS[task_id] = {
-            "summary": summary,
-            "trades": trades,
-            "balance_curve": balance_curve_df.to_dict(orient="records")
-        }
-    except Exception as e:
-        import traceback
-        logger.exception("Error running backtest in run_backtest_async")
-        BACKTEST_RESULTS[task_id] = {"error": str(e), "trace": traceback.format_exc()}
+MARKET_DATA_MAX_SYMBOLS = getattr(settings, "MARKET_DATA_MAX_SYMBOLS", 500)
+BACKTEST_MAX_PENDING_PER_USER = getattr(settings, "BACKTEST_MAX_PENDING_PER_USER", 3)
+BACKTEST_PARAMS = ("ticker", "start_date", "end_date", "capital", "risk_percent", "stop_loss_method", "take_profit_method")
 
 from rest_framework.decorators import api_view, permission_classes
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def run_backtest_view(request):
-    params = request.data
-    task_id = str(uuid.uuid4())
-    thread = threading.Thread(target=run_backtest_async, args=(task_id, params))
-    thread.start()
-    return Response({"task_id": task_id})
+    """Queue a backtest for the run_backtest_workers pool"""
+    missing = [name for name in BACKTEST_PARAMS if request.data.get(name) in (None, "")]
+    if missing:
+        return Response({"error": f"Missing required parameters: {', '.join(missing)}"}, status=400)
+
+    if backtests.pending_count(request.user) >= BACKTEST_MAX_PENDING_PER_USER:
+        return Response(
+            {"error": f"At most {BACKTEST_MAX_PENDING_PER_USER} unfinished backtests per user"},
+            status=429
+        )
+
+    job = backtests.enqueue(request.user, {name: request.data[name] for name in BACKTEST_PARAMS})
+    return Response({"task_id": str(job.id)})
+
+def _get_backtest_job(request, task_id):
+    try:
+        return BacktestJob.objects.filter(
+            Q(expires_date__isnull=True) | Q(expires_date__gt=timezone.now()),
+            author=request.user
+        ).get(id=task_id)
+    except (BacktestJob.DoesNotExist, ValidationError):
+        return None
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_backtest_result_view(request, task_id):
-    result = BACKTEST_RESULTS.get(task_id)
-    if result is None:
-        return Response({"status": "pending"})
-    return Response(result)
+    """Status and progress of a backtest, its result once done"""
+    job = _get_backtest_job(request, task_id)
+    if job is None:
+        return Response({"error": "Backtest not found"}, status=404)
+
+    if job.status in BacktestJob.PENDING_STATUSES:
+        return Response({"status": "pending", "state": job.status, "progress": job.progress})
+    if job.status == BacktestJob.DONE:
+        return Response({"status": job.status, **job.result})
+    if job.status == BacktestJob.CANCELLED:
+        return Response({"status": job.status, "error": "Backtest was cancelled"})
+    return Response({"status": job.status, "error": job.error, "trace": job.trace})
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cancel_backtest_view(request, task_id):
+    """Cancel a queued or running backtest"""
+    job = _get_backtest_job(request, task_id)
+    if job is None:
+        return Response({"error": "Backtest not found"}, status=404)
+
+    if not backtests.cancel(job):
+        return Response({"error": f"Backtest is already {job.status}"}, status=400)
+    return Response({"status": BacktestJob.CANCELLED})
 
 class PositionListCreateView(ListCreateAPIView):
     permission_classes = [IsAuthenticated, ]
@@ -282,6 +219,51 @@ class MarketDataPriceView(APIView):
             return Response({"error": str(e)}, status=400)
 
 
+class MarketDataPricesView(APIView):
+    """Get prices for a comma-separated list of symbols in one request"""
+    permission_classes = [IsAuthenticated, ]
+    
+    def get(self, request):
+        symbols = request.query_params.get('symbols', '')
+        provider_name = request.query_params.get('provider')
+        
+        symbols = list(dict.fromkeys(symbol.strip() for symbol in symbols.split(',') if symbol.strip()))
+        if not symbols:
+            return Response({"error": "Symbols parameter is required"}, status=400)
+        
+        if len(symbols) > MARKET_DATA_MAX_SYMBOLS:
+            return Response({"error": f"At most {MARKET_DATA_MAX_SYMBOLS} symbols per request"}, status=400)
+        
+        provider = None
+        if provider_name:
+            provider = market_data_manager.get_provider(provider_name)
+        else:
+            provider = market_data_manager.get_active_provider()
+        
+        if not provider:
+            return Response({"error": "No active provider"}, status=400)
+        
+        if not provider.is_connected():
+            return Response({"error": "Provider not connected"}, status=400)
+        
+        try:
+            prices = provider.get_prices(symbols)
+            return Response({
+                "prices": [prices[symbol] for symbol in symbols if symbol in prices],
+                "missing": [symbol for symbol in symbols if symbol not in prices]
+            })
+        except Exception as e:
+            return Response({"error": str(e)}, status=400)
+
+
+class MarketDataSchedulerView(APIView):
+    """Get Tinkoff API request scheduler metrics per method group"""
+    permission_classes = [IsAuthenticated, ]
+    
+    def get(self, request):
+        return Response(request_scheduler.metrics())
+
+
 class MarketDataStatsView(APIView):
     """Get daily stats for a symbol"""
     permission_classes = [IsAuthenticated, ]
@@ -0,0 +1,10 @@
+from .jobs import (
+    JobCancelled, enqueue, pending_count, claim_next, report_progress, complete, fail, cancel, heartbeat, requeue_stale,
+    evict_expired
+)
+from .worker import BacktestWorkerPool, run_job
+
+__all__ = [
+    'JobCancelled', 'enqueue', 'pending_count', 'claim_next', 'report_progress', 'complete', 'fail', 'cancel',
+    'heartbeat', 'requeue_stale', 'evict_expired', 'BacktestWorkerPool', 'run_job'
+]
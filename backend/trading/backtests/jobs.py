@@ -0,0 +1,154 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import BacktestJob
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_RESULT_TTL = getattr(settings, "BACKTEST_RESULT_TTL", 24 * 60 * 60)
+
+
+class JobCancelled(Exception):
+    """The job was cancelled or evicted while a worker was running it"""
+
+
+def enqueue(author, params: Dict[str, Any]) -> BacktestJob:
+    return BacktestJob.objects.create(author=author, params=params)
+
+
+def pending_count(author) -> int:
+    return BacktestJob.objects.filter(author=author, status__in=BacktestJob.PENDING_STATUSES).count()
+
+
+def claim_next(worker: str) -> Optional[BacktestJob]:
+    """
+    Mark the oldest queued job as running by `worker` and return it
+
+    The status change is a conditional UPDATE, so of several workers
+    polling the same database exactly one gets each job.
+    """
+    while True:
+        job_id = (
+            BacktestJob.objects.filter(status=BacktestJob.QUEUED)
+            .order_by('created_date')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        now = timezone.now()
+        claimed = BacktestJob.objects.filter(id=job_id, status=BacktestJob.QUEUED).update(
+            status=BacktestJob.RUNNING, worker=worker, started_date=now, modified_date=now
+        )
+        if claimed:
+            return BacktestJob.objects.get(id=job_id)
+
+
+def report_progress(job_id, progress: float) -> None:
+    """Store the progress (0 to 1) of a running job, raise JobCancelled if it is no longer running"""
+    updated = BacktestJob.objects.filter(id=job_id, status=BacktestJob.RUNNING).update(
+        progress=progress, modified_date=timezone.now()
+    )
+    if not updated:
+        raise JobCancelled(f"Backtest {job_id} is no longer running")
+
+
+def _finish(job_id, status: str, **fields) -> bool:
+    now = timezone.now()
+    return bool(BacktestJob.objects.filter(id=job_id, status=BacktestJob.RUNNING).update(
+        status=status,
+        finished_date=now,
+        expires_date=now + timedelta(seconds=BACKTEST_RESULT_TTL),
+        modified_date=now,
+        **fields
+    ))
+
+
+def complete(job_id, result: Dict[str, Any]) -> bool:
+    return _finish(job_id, BacktestJob.DONE, progress=1.0, result=result)
+
+
+def fail(job_id, error: str, trace: str = '') -> bool:
+    return _finish(job_id, BacktestJob.FAILED, error=error, trace=trace)
+
+
+def cancel(job: BacktestJob) -> bool:
+    """
+    Cancel a queued or running job
+
+    A running job stops at its next progress report.
+    """
+    now = timezone.now()
+    return bool(BacktestJob.objects.filter(id=job.id, status__in=BacktestJob.PENDING_STATUSES).update(
+        status=BacktestJob.CANCELLED,
+        finished_date=now,
+        expires_date=now + timedelta(seconds=BACKTEST_RESULT_TTL),
+        modified_date=now
+    ))
+
+
+def release_worker_jobs(requeue: bool, worker: Optional[str] = None, prefix: Optional[str] = None) -> int:
+    """
+    Jobs left running by a worker, or by all workers whose name starts with `prefix`
+
+    Args:
+        requeue: Queue the jobs again, for workers stopped by a shutdown.
+                 Otherwise they fail, for a worker that died running them.
+        worker: Worker name
+        prefix: Prefix shared by the names of a pool's workers
+
+    Returns:
+        Number of jobs released
+    """
+    running = BacktestJob.objects.filter(status=BacktestJob.RUNNING)
+    if worker is not None:
+        running = running.filter(worker=worker)
+    if prefix is not None:
+        running = running.filter(worker__startswith=prefix)
+    if requeue:
+        return _requeue(running)
+
+    count = 0
+    for job_id in running.values_list('id', flat=True):
+        count += fail(job_id, "Backtest worker exited unexpectedly")
+    return count
+
+
+def _requeue(running) -> int:
+    return running.update(
+        status=BacktestJob.QUEUED, worker='', progress=0, started_date=None, modified_date=timezone.now()
+    )
+
+
+def heartbeat(workers: List[str]) -> int:
+    """Mark the running jobs of live `workers` as still being worked on"""
+    return BacktestJob.objects.filter(status=BacktestJob.RUNNING, worker__in=workers).update(
+        modified_date=timezone.now()
+    )
+
+
+def requeue_stale(stale_after: float, now=None) -> int:
+    """
+    Queue again running jobs without progress or heartbeat for `stale_after` seconds
+
+    Their pool was killed without stopping its workers, e.g. by a
+    SIGKILL, and is not coming back under the same host name.
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=stale_after)
+    requeued = _requeue(BacktestJob.objects.filter(status=BacktestJob.RUNNING, modified_date__lt=cutoff))
+    if requeued:
+        logger.warning(f"Queued {requeued} stale backtest jobs again")
+    return requeued
+
+
+def evict_expired(now=None) -> int:
+    """Delete finished jobs past their result TTL"""
+    deleted, _ = BacktestJob.objects.filter(expires_date__lte=now or timezone.now()).delete()
+    if deleted:
+        logger.info(f"Evicted {deleted} expired backtest jobs")
+    return deleted
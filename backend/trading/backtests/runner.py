@@ -0,0 +1,86 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+from ..market_data.scheduler import request_scheduler
+
+logger = logging.getLogger(__name__)
+
+RISKMANAGEMENT_PATH = Path('/usr/src/RiskManagement')
+BACKTEST_CACHE_PATH = getattr(settings, "BACKTEST_CACHE_PATH", "backtest_cache")
+BACKTEST_CACHE_MAX_BYTES = getattr(settings, "BACKTEST_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+_service = None
+_data_client = None
+_result_cache = None
+_lock = threading.Lock()
+
+
+def load_service():
+    """
+    RiskManagement's backtest_service module, imported on first use and kept
+
+    Workers call this once at startup so jobs do not pay for the import.
+    """
+    global _service, _data_client, _result_cache
+    with _lock:
+        if _service is None:
+            if not os.path.exists(RISKMANAGEMENT_PATH / "backtest_service.py"):
+                raise RuntimeError(f"Import error: backtest_service.py not found in {RISKMANAGEMENT_PATH}")
+            if str(RISKMANAGEMENT_PATH) not in sys.path:
+                sys.path.insert(0, str(RISKMANAGEMENT_PATH))
+            service = importlib.import_module("backtest_service")
+            _data_client = service.TinkoffDataClient(scheduler=request_scheduler)
+            _result_cache = service.ResultCache(str(BACKTEST_CACHE_PATH), BACKTEST_CACHE_MAX_BYTES)
+            _service = service
+            logger.info(f"Loaded backtest service from {RISKMANAGEMENT_PATH}")
+    return _service
+
+
+def backtest_config(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Strategy configuration of a backtest requested from the frontend"""
+    return {
+        "TICKER": params["ticker"],
+        "EXCHANGE": "MOEX",
+        "START_DATE": params["start_date"],
+        "END_DATE": params["end_date"],
+        "INTERVAL": "1d",
+        "CAPITAL": params["capital"],
+        "RISK_PERCENT": params["risk_percent"],
+        "PROFIT_TO_RISK": 3,
+        "ATR_MULTIPLIER": 1.5,
+        "ATR_WINDOW": 14,
+        "STOP_LOSS_METHOD": params["stop_loss_method"],
+        "TAKE_PROFIT_METHOD": params["take_profit_method"],
+        "POSITION": "long"
+    }
+
+
+def run_backtest(params: Dict[str, Any], progress: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+    """
+    Backtest MultiStopTakeStrategy on one MOEX ticker
+
+    Args:
+        params: ticker, start_date, end_date, capital, risk_percent,
+                stop_loss_method and take_profit_method as sent by the frontend
+        progress: Called with the finished fraction of the work
+
+    Returns:
+        summary, trades and balance_curve
+    """
+    service = load_service()
+    config = backtest_config(params)
+    # An identical earlier backtest on candles that are all stored already
+    # is answered without calling the API
+    cached = service.cached_result(config, _data_client, _result_cache)
+    if cached is not None:
+        return cached
+    if progress is not None:
+        progress(0.1)
+    return service.run_backtest(config, client=_data_client, progress=progress, cache=_result_cache)
@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import signal
+import socket
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from ..models import BacktestJob
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_WORKERS = getattr(settings, "BACKTEST_WORKERS", 2)
+BACKTEST_POLL_INTERVAL = getattr(settings, "BACKTEST_POLL_INTERVAL", 1)
+BACKTEST_STALE_AFTER = getattr(settings, "BACKTEST_STALE_AFTER", 5 * 60)
+
+# Seconds between evictions of expired results and stale jobs
+EVICT_INTERVAL = 60
+# Seconds between heartbeats of the jobs of live workers
+HEARTBEAT_INTERVAL = 30
+# Seconds a worker gets to finish its job on shutdown; keep below the container's stop grace period
+SHUTDOWN_TIMEOUT = 30
+
+
+def run_job(job: BacktestJob, runner: Optional[Callable] = None) -> str:
+    """
+    Run a claimed job and store its outcome
+
+    Returns:
+        Status the job ended with
+    """
+    if runner is None:
+        from .runner import run_backtest as runner
+
+    logger.info(f"Running backtest {job.id} on {job.worker}")
+    try:
+        result = runner(job.params, progress=lambda fraction: jobs.report_progress(job.id, fraction))
+    except jobs.JobCancelled:
+        logger.info(f"Backtest {job.id} was cancelled")
+        return BacktestJob.CANCELLED
+    except Exception as e:
+        logger.exception(f"Error running backtest {job.id}")
+        jobs.fail(job.id, str(e), traceback.format_exc())
+        return BacktestJob.FAILED
+
+    if not jobs.complete(job.id, result):
+        # Cancelled after its last progress report
+        return BacktestJob.CANCELLED
+    return BacktestJob.DONE
+
+
+def work(name: str, stop_event, poll_interval: float = BACKTEST_POLL_INTERVAL) -> None:
+    """Worker process loop: run queued jobs one at a time until `stop_event` is set"""
+    # Ctrl+C reaches the whole process group, the pool stops its workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    from .runner import load_service, run_backtest
+    try:
+        load_service()
+    except Exception:
+        # Every job fails with the import error until the code is fixed
+        logger.exception(f"Backtest worker {name} could not load the backtest service")
+
+    logger.info(f"Backtest worker {name} started")
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = jobs.claim_next(name)
+        except Exception:
+            logger.exception(f"Backtest worker {name} failed to poll the queue")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job, run_backtest)
+
+    connections.close_all()
+    logger.info(f"Backtest worker {name} stopped")
+
+
+class BacktestWorkerPool:
+    """
+    A fixed number of worker processes running jobs from the BacktestJob queue
+
+    Workers are named "<host>/<slot>", so the host name must stay the same
+    across restarts. On start the pool queues again the jobs its slots
+    were running when the previous pool on this host stopped; a job whose
+    worker process dies fails instead, so a job that crashes its worker is
+    not retried forever. The pool refreshes the running jobs of its live
+    workers every HEARTBEAT_INTERVAL, and queues again running jobs of any
+    pool that went stale_after seconds without a heartbeat, e.g. a pool
+    killed on a host that is gone. Several pools, each with its own host
+    name, can share a database.
+    """
+
+    def __init__(
+        self,
+        size: int = BACKTEST_WORKERS,
+        poll_interval: float = BACKTEST_POLL_INTERVAL,
+        host: Optional[str] = None,
+        stale_after: float = BACKTEST_STALE_AFTER
+    ):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.prefix = f"{host or socket.gethostname()}/"
+        # Forked workers inherit the configured Django apps
+        self._context = multiprocessing.get_context("fork")
+        self._stop_event = self._context.Event()
+        self._processes: Dict[str, multiprocessing.Process] = {}
+
+    @property
+    def names(self) -> List[str]:
+        return [f"{self.prefix}{slot}" for slot in range(self.size)]
+
+    def _start_worker(self, name: str) -> None:
+        process = self._context.Process(
+            target=work, args=(name, self._stop_event, self.poll_interval), name=f"backtest-worker-{name}", daemon=True
+        )
+        process.start()
+        self._processes[name] = process
+
+    def start(self) -> None:
+        requeued = jobs.release_worker_jobs(requeue=True, prefix=self.prefix)
+        if requeued:
+            logger.info(f"Queued {requeued} interrupted backtest jobs again")
+        # Worker processes open their own connections
+        connections.close_all()
+        for name in self.names:
+            self._start_worker(name)
+
+    def check_workers(self) -> None:
+        """Fail the job of every worker that died and start a new one in its place"""
+        for name, process in list(self._processes.items()):
+            if process.is_alive() or self._stop_event.is_set():
+                continue
+            logger.error(f"Backtest worker {name} exited with code {process.exitcode}, restarting")
+            jobs.release_worker_jobs(requeue=False, worker=name)
+            # The worker must not inherit the connection opened just now
+            connections.close_all()
+            self._start_worker(name)
+
+    def heartbeat(self) -> None:
+        jobs.heartbeat([name for name, process in self._processes.items() if process.is_alive()])
+
+    def run(self) -> None:
+        """Start the workers and supervise them until interrupted or terminated"""
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.start()
+        last_eviction = last_heartbeat = 0.0
+        try:
+            while not self._stop_event.is_set():
+                # A failed query must not stop the pool and every worker with it
+                try:
+                    close_old_connections()
+                    self.check_workers()
+                    if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                        self.heartbeat()
+                        last_heartbeat = time.monotonic()
+                    if time.monotonic() - last_eviction >= EVICT_INTERVAL:
+                        jobs.evict_expired()
+                        jobs.requeue_stale(self.stale_after)
+                        last_eviction = time.monotonic()
+                except Exception:
+                    logger.exception("Backtest worker pool supervision failed")
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Let the workers finish their jobs, then stop them; unfinished jobs are queued again"""
+        self._stop_event.set()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes.clear()
+        jobs.release_worker_jobs(requeue=True, prefix=self.prefix)
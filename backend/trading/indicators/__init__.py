@@ -0,0 +1,12 @@
+from .engine import IndicatorEngine, series_to_pairs
+from .cache import IndicatorCache, CachedIndicators
+from .incremental import (
+    IncrementalIndicator, SMA, EMA, MACD, RSI, OBV, VWAP, BollingerBands, Stochastic, WilliamsR,
+    INCREMENTAL_INDICATORS, indicator_from_state
+)
+
+__all__ = [
+    'IndicatorEngine', 'series_to_pairs', 'IndicatorCache', 'CachedIndicators',
+    'IncrementalIndicator', 'SMA', 'EMA', 'MACD', 'RSI', 'OBV', 'VWAP', 'BollingerBands',
+    'Stochastic', 'WilliamsR', 'INCREMENTAL_INDICATORS', 'indicator_from_state'
+]
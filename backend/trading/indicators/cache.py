@@ -0,0 +1,309 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+from .engine import IndicatorEngine
+from .incremental import INCREMENTAL_INDICATORS, IncrementalIndicator
+
+IndicatorResult = Union[np.ndarray, Dict[str, np.ndarray]]
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TAIL_TTL = 30.0
+
+# Number of preceding candles a windowed indicator needs to reproduce its
+# value at a given index. Indicators not listed here are recursive (EMA, RSI,
+# MACD, OBV, VWAP) and are resumed from their incremental state instead.
+WINDOW_WARMUP: Dict[str, Callable[..., int]] = {
+    "sma": lambda periods: int(periods) - 1,
+    "bollinger_bands": lambda periods, std_dev: int(periods) - 1,
+    "stochastic": lambda k_period=14, d_period=3: int(k_period) + int(d_period) - 2,
+    "williams_r": lambda periods=14: int(periods) - 1,
+}
+
+_SINGLE = "values"
+
+
+def _as_columns(value: IndicatorResult) -> Dict[str, np.ndarray]:
+    if isinstance(value, dict):
+        return value
+    return {_SINGLE: value}
+
+
+def _from_columns(columns: Dict[str, np.ndarray]) -> IndicatorResult:
+    if list(columns) == [_SINGLE]:
+        return columns[_SINGLE]
+    return columns
+
+
+def _frozen(values: np.ndarray) -> np.ndarray:
+    values = np.array(values)
+    values.flags.writeable = False
+    return values
+
+
+class _Entry:
+    """Indicator values over the closed candles of a series, the incremental
+    state after the last closed candle (recursive indicators only) and the
+    most recently computed tail over incomplete candles"""
+
+    __slots__ = ("closed_count", "last_closed_time", "closed", "state", "tail", "tail_inputs", "tail_expires_at", "nbytes")
+
+    def __init__(self, closed_count: int, last_closed_time: int, closed: Dict[str, np.ndarray], state: Optional[IncrementalIndicator]):
+        self.closed_count = closed_count
+        self.last_closed_time = last_closed_time
+        self.closed = closed
+        self.state = state
+        self.tail = None
+        self.tail_inputs = None
+        self.tail_expires_at = 0.0
+        self.nbytes = sum(values.nbytes for values in closed.values())
+
+    def set_tail(self, tail: Dict[str, np.ndarray], inputs: Tuple[np.ndarray, ...], expires_at: float):
+        self.tail = tail
+        self.tail_inputs = inputs
+        self.tail_expires_at = expires_at
+        self.nbytes += sum(values.nbytes for values in tail.values())
+        self.nbytes += sum(values.nbytes for values in inputs)
+
+
+def _closed_count(series) -> int:
+    incomplete = np.flatnonzero(~series.is_complete)
+    return int(incomplete[0]) if incomplete.size else len(series)
+
+
+def _tail_inputs(series, start: int) -> Tuple[np.ndarray, ...]:
+    return tuple(
+        np.array(getattr(series, name)[start:])
+        for name in ("time", "high", "low", "close", "volume")
+    )
+
+
+class IndicatorCache:
+    """In-process LRU cache of indicator results.
+
+    Entries are keyed by a caller-provided scope (figi, interval, range) plus
+    the indicator name and its parameters. Values computed over closed candles
+    are immutable and are only dropped by LRU eviction once the byte budget is
+    exceeded. Values over the incomplete tail are kept for `tail_ttl` seconds
+    and only while the tail candles are unchanged.
+
+    When the series grows, only candles after the cached prefix are processed:
+    windowed indicators are recomputed over a trailing window, recursive ones
+    continue from the stored incremental state.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, tail_ttl: float = DEFAULT_TAIL_TTL):
+        self.max_bytes = max_bytes
+        self.tail_ttl = tail_ttl
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def bind(self, scope: Tuple[Any, ...], series) -> 'CachedIndicators':
+        """Engine-like view of `series` whose indicators go through the cache"""
+        return CachedIndicators(self, scope, series)
+
+    def get(self, scope: Tuple[Any, ...], series, engine: IndicatorEngine, name: str, params: Tuple[Any, ...]) -> Optional[IndicatorResult]:
+        """Return indicator `name` over `series`, computing only what is not cached"""
+        key = scope + (name, params)
+        n = len(series)
+        closed_count = _closed_count(series)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and not self._matches(entry, series, closed_count):
+            entry = None
+
+        if entry is not None:
+            if entry.closed_count == n:
+                self.hits += 1
+                return _from_columns(entry.closed)
+            if self._tail_valid(entry, series, n):
+                self.hits += 1
+                return _from_columns(self._join(entry.closed, entry.tail))
+
+        if entry is None:
+            self.misses += 1
+            columns, state = self._compute(series, engine, name, params, closed_count)
+        else:
+            self.partial_hits += 1
+            columns, state = self._extend(entry, series, engine, name, params, closed_count)
+
+        if columns is None:
+            return None
+
+        self._store(key, series, columns, closed_count, state)
+        return _from_columns(columns)
+
+    @staticmethod
+    def _matches(entry: _Entry, series, closed_count: int) -> bool:
+        # Closed candles never change, so the prefix is valid as long as the
+        # series still covers it with the same candles
+        if entry.closed_count > closed_count:
+            return False
+        return int(series.time[entry.closed_count - 1]) == entry.last_closed_time
+
+    def _tail_valid(self, entry: _Entry, series, n: int) -> bool:
+        if entry.tail is None or time.monotonic() > entry.tail_expires_at:
+            return False
+        if entry.closed_count + entry.tail_inputs[0].shape[0] != n:
+            return False
+        return all(
+            np.array_equal(cached, current)
+            for cached, current in zip(entry.tail_inputs, _tail_inputs(series, entry.closed_count))
+        )
+
+    @staticmethod
+    def _incremental(name: str, params: Tuple[Any, ...]) -> Optional[IncrementalIndicator]:
+        # Windowed indicators are cheaper to recompute over a trailing window
+        # with the vectorized engine than to replay through their state
+        if name in WINDOW_WARMUP or name not in INCREMENTAL_INDICATORS:
+            return None
+        try:
+            return INCREMENTAL_INDICATORS[name](*params)
+        except ValueError:
+            return None
+
+    def _compute(self, series, engine: IndicatorEngine, name: str, params: Tuple[Any, ...], closed_count: int):
+        indicator = self._incremental(name, params)
+        if indicator is None:
+            value = getattr(engine, name)(*params)
+            return (None, None) if value is None else (_as_columns(value), None)
+
+        if len(series) < indicator.min_bars:
+            return None, None
+        return self._advance(indicator, series, 0, closed_count)
+
+    def _extend(self, entry: _Entry, series, engine: IndicatorEngine, name: str, params: Tuple[Any, ...], closed_count: int):
+        if entry.state is not None:
+            columns, state = self._advance(entry.state.copy(), series, entry.closed_count, closed_count)
+            return self._join(entry.closed, columns), state
+
+        tail = self._compute_tail(series, engine, name, params, entry.closed_count)
+        if tail is None:
+            return self._compute(series, engine, name, params, closed_count)
+        return self._join(entry.closed, tail), None
+
+    def _advance(self, indicator: IncrementalIndicator, series, start: int, closed_count: int):
+        """Feed candles from `start`, returns their values and the indicator
+        state right after the last closed candle"""
+        columns = _as_columns(indicator.extend(series[start:closed_count]))
+        if closed_count < len(series):
+            tail = _as_columns(indicator.copy().extend(series[closed_count:]))
+            columns = self._join(columns, tail)
+        return columns, indicator
+
+    @staticmethod
+    def _compute_tail(series, engine: IndicatorEngine, name: str, params: Tuple[Any, ...], start: int) -> Optional[Dict[str, np.ndarray]]:
+        warmup = WINDOW_WARMUP.get(name)
+        if warmup is None:
+            value = getattr(engine, name)(*params)
+        else:
+            offset = max(0, start - warmup(*params))
+            value = getattr(IndicatorEngine.from_series(series[offset:]), name)(*params)
+            start -= offset
+
+        if value is None:
+            return None
+        return {column: values[start:] for column, values in _as_columns(value).items()}
+
+    @staticmethod
+    def _join(closed: Dict[str, np.ndarray], tail: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return {column: np.concatenate((values, tail[column])) for column, values in closed.items()}
+
+    def _store(self, key: Hashable, series, columns: Dict[str, np.ndarray], closed_count: int, state: Optional[IncrementalIndicator]):
+        if not closed_count:
+            return
+
+        entry = _Entry(
+            closed_count,
+            int(series.time[closed_count - 1]),
+            {column: _frozen(values[:closed_count]) for column, values in columns.items()},
+            state
+        )
+        if closed_count < len(series):
+            entry.set_tail(
+                {column: _frozen(values[closed_count:]) for column, values in columns.items()},
+                _tail_inputs(series, closed_count),
+                time.monotonic() + self.tail_ttl
+            )
+
+        if entry.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+
+            self._entries[key] = entry
+            self._nbytes += entry.nbytes
+
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+
+class CachedIndicators:
+    """Drop-in replacement for IndicatorEngine that serves results from an
+    IndicatorCache bound to one candle series"""
+
+    def __init__(self, cache: IndicatorCache, scope: Tuple[Any, ...], series):
+        self._cache = cache
+        self._scope = scope
+        self._series = series
+        self._engine = IndicatorEngine.from_series(series)
+
+    def __len__(self) -> int:
+        return len(self._engine)
+
+    def _get(self, name: str, *params) -> Optional[IndicatorResult]:
+        return self._cache.get(self._scope, self._series, self._engine, name, params)
+
+    def sma(self, periods: int) -> Optional[np.ndarray]:
+        return self._get("sma", periods)
+
+    def ema(self, periods: int) -> Optional[np.ndarray]:
+        return self._get("ema", periods)
+
+    def macd(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Optional[Dict[str, np.ndarray]]:
+        return self._get("macd", fast_period, slow_period, signal_period)
+
+    def rsi(self, periods: int) -> Optional[np.ndarray]:
+        return self._get("rsi", periods)
+
+    def bollinger_bands(self, periods: int, std_dev: float) -> Optional[Dict[str, np.ndarray]]:
+        return self._get("bollinger_bands", periods, std_dev)
+
+    def stochastic(self, k_period: int = 14, d_period: int = 3) -> Optional[Dict[str, np.ndarray]]:
+        return self._get("stochastic", k_period, d_period)
+
+    def williams_r(self, periods: int = 14) -> Optional[np.ndarray]:
+        return self._get("williams_r", periods)
+
+    def obv(self) -> Optional[np.ndarray]:
+        return self._get("obv")
+
+    def vwap(self) -> Optional[np.ndarray]:
+        return self._get("vwap")
@@ -0,0 +1,334 @@
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+
+def _check_period(name: str, value: int) -> int:
+    value = int(value)
+    if value < 1:
+        raise ValueError(f"{name} must be a positive integer, got {value}")
+    return value
+
+
+def _blocks(values: np.ndarray, window: int) -> np.ndarray:
+    """`values` padded with NaN to whole blocks of `window`, one block per row.
+
+    Every full window is a suffix of one block, plus a prefix of the next
+    block unless the window starts a block, so rolling reductions can be
+    combined from running reductions within blocks in O(n) (van
+    Herk/Gil-Werman). The padding never falls inside a full window.
+    """
+    blocks = -(-values.shape[0] // window)
+    padded = np.full(blocks * window, np.nan)
+    padded[:values.shape[0]] = values
+    return padded.reshape(blocks, window)
+
+
+def _suffix_prefix(values: np.ndarray, window: int, accumulate):
+    """Running reductions of each window's suffix part (from its start to the
+    end of the block) and prefix part (from the next block's start to its end)"""
+    n = values.shape[0]
+    blocks = _blocks(values, window)
+    suffix = accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()[:n - window + 1]
+    prefix = accumulate(blocks, axis=1).ravel()[window - 1:n]
+    return suffix, prefix
+
+
+def _rolling_extreme(values: np.ndarray, window: int, ufunc: np.ufunc) -> np.ndarray:
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] < window:
+        return out
+    # A window starting a block is its own prefix as well, extremes do not mind
+    suffix, prefix = _suffix_prefix(values, window, ufunc.accumulate)
+    out[window - 1:] = ufunc(suffix, prefix)
+    return out
+
+
+def _rolling_moments(values: np.ndarray, window: int):
+    """Mean and sum of squared deviations over each full window, in O(n).
+
+    Cumulative sums and sums of squares of each window's suffix and prefix
+    part, taken around a per-block reference value so they stay small, give
+    each part's mean and E[x^2] - E[x]^2; the two parts are then combined.
+    Windows containing NaN are NaN.
+    """
+    n = values.shape[0]
+    blocks = _blocks(values, window)
+    reference = np.nan_to_num(np.fmax.reduce(blocks, axis=1))
+    shift = np.repeat(reference, window)[:n]
+    deviations = values - shift
+
+    sums = _suffix_prefix(deviations, window, np.cumsum)
+    squares = _suffix_prefix(deviations * deviations, window, np.cumsum)
+    shifts = (shift[:n - window + 1], shift[window - 1:])
+    # Sizes of the suffix and prefix parts; windows starting a block have no prefix part
+    prefix_size = np.arange(n - window + 1) % window
+    sizes = (window - prefix_size, np.maximum(prefix_size, 1))
+
+    means, m2s = [], []
+    for part_sums, part_squares, part_shift, size in zip(sums, squares, shifts, sizes):
+        means.append(part_shift + part_sums / size)
+        m2s.append(part_squares - part_sums * part_sums / size)
+
+    has_prefix = prefix_size > 0
+    prefix_mean = np.where(has_prefix, means[1], 0.0)
+    prefix_m2 = np.where(has_prefix, m2s[1], 0.0)
+    mean = (sizes[0] * means[0] + prefix_size * prefix_mean) / window
+    delta = np.where(has_prefix, prefix_mean - means[0], 0.0)
+    m2 = m2s[0] + prefix_m2 + delta * delta * sizes[0] * prefix_size / window
+    return mean, m2
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean over each full window, aligned to the window's last element"""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= window:
+        out[window - 1:], _ = _rolling_moments(values, window)
+    return out
+
+
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_extreme(values, window, np.maximum)
+
+
+def _rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_extreme(values, window, np.minimum)
+
+
+def _rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Population standard deviation over each full window"""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= window:
+        _, m2 = _rolling_moments(values, window)
+        # Rounding can leave a flat window's squared deviations slightly below zero
+        out[window - 1:] = np.sqrt(np.maximum(m2, 0.0) / window)
+    return out
+
+
+def _ema(values: np.ndarray, periods: int) -> Optional[np.ndarray]:
+    """EMA seeded with the SMA of the first `periods` values.
+
+    The recurrence is inherently sequential, so it runs as a single pass over
+    a plain list of floats instead of indexing numpy scalars.
+    """
+    if values.shape[0] < periods:
+        return None
+
+    out = np.full(values.shape[0], np.nan)
+    multiplier = 2 / (periods + 1)
+    current = sum(values[:periods].tolist()) / periods
+
+    result = [current]
+    for price in values[periods:].tolist():
+        current = (price - current) * multiplier + current
+        result.append(current)
+
+    out[periods - 1:] = result
+    return out
+
+
+class IndicatorEngine:
+    """Technical indicators over contiguous candle columns.
+
+    Candles are converted once into float64 arrays and every indicator is
+    computed with rolling-window numpy kernels (or a single linear pass for
+    recursive ones like EMA and RSI). Undefined points are NaN; methods return
+    None when there is not enough data for the indicator at all.
+    """
+
+    def __init__(
+        self,
+        close: Sequence[float],
+        high: Optional[Sequence[float]] = None,
+        low: Optional[Sequence[float]] = None,
+        volume: Optional[Sequence[float]] = None
+    ):
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.high = np.ascontiguousarray(high if high is not None else close, dtype=np.float64)
+        self.low = np.ascontiguousarray(low if low is not None else close, dtype=np.float64)
+
+        if volume is None:
+            self.volume = np.zeros(self.close.shape[0], dtype=np.int64)
+        else:
+            volume = np.asarray(volume)
+            dtype = np.int64 if volume.dtype.kind in "iub" else np.float64
+            self.volume = np.ascontiguousarray(volume, dtype=dtype)
+
+    @classmethod
+    def from_rows(cls, data: List[Dict[str, Any]]) -> 'IndicatorEngine':
+        """Build engine from rows produced by candles_to_dataframe_format"""
+        return cls(
+            close=[row["close"] for row in data],
+            high=[row["high"] for row in data],
+            low=[row["low"] for row in data],
+            volume=[row["volume"] for row in data]
+        )
+
+    @classmethod
+    def from_series(cls, series: Any) -> 'IndicatorEngine':
+        """Build engine from a columnar CandleSeries without copying"""
+        return cls(close=series.close, high=series.high, low=series.low, volume=series.volume)
+
+    def __len__(self) -> int:
+        return self.close.shape[0]
+
+    def sma(self, periods: int) -> Optional[np.ndarray]:
+        """Simple Moving Average of close prices"""
+        periods = _check_period("periods", periods)
+        if len(self) < periods:
+            return None
+        return _rolling_mean(self.close, periods)
+
+    def ema(self, periods: int) -> Optional[np.ndarray]:
+        """Exponential Moving Average of close prices"""
+        periods = _check_period("periods", periods)
+        return _ema(self.close, periods)
+
+    def macd(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Optional[Dict[str, np.ndarray]]:
+        """MACD line, signal line and histogram.
+
+        The signal line is the EMA of the defined part of the MACD line and is
+        placed starting at index slow_period + signal_period - 2, exactly as the
+        original list-based implementation did.
+        """
+        fast_period = _check_period("fast_period", fast_period)
+        slow_period = _check_period("slow_period", slow_period)
+        signal_period = _check_period("signal_period", signal_period)
+
+        n = len(self)
+        if n < slow_period + signal_period:
+            return None
+
+        nan_line = np.full(n, np.nan)
+        fast_ema = _ema(self.close, fast_period)
+        slow_ema = _ema(self.close, slow_period)
+
+        macd_line = nan_line.copy()
+        if fast_ema is not None and slow_ema is not None:
+            macd_line = fast_ema - slow_ema
+        macd_line[:slow_period - 1] = np.nan
+
+        defined = macd_line[~np.isnan(macd_line)]
+        signal_full = _ema(defined, signal_period) if defined.shape[0] else None
+
+        signal_line = nan_line.copy()
+        offset = slow_period + signal_period - 2
+        if signal_full is not None:
+            count = min(signal_full.shape[0], n - offset)
+            signal_line[offset:offset + count] = signal_full[:count]
+
+        return {
+            "macd": macd_line,
+            "signal": signal_line,
+            "histogram": macd_line - signal_line
+        }
+
+    def rsi(self, periods: int) -> Optional[np.ndarray]:
+        """Relative Strength Index with Wilder smoothing"""
+        periods = _check_period("periods", periods)
+        n = len(self)
+        if n < periods + 1:
+            return None
+
+        changes = np.diff(self.close)
+        gains = np.where(changes > 0, changes, 0.0).tolist()
+        losses = np.where(changes > 0, 0.0, -changes).tolist()
+
+        avg_gain = sum(gains[:periods]) / periods
+        avg_loss = sum(losses[:periods]) / periods
+
+        rs = 100 if avg_loss == 0 else avg_gain / avg_loss
+        result = [100 - (100 / (1 + rs))]
+
+        for current_gain, current_loss in zip(gains[periods:], losses[periods:]):
+            avg_gain = ((avg_gain * (periods - 1)) + current_gain) / periods
+            avg_loss = ((avg_loss * (periods - 1)) + current_loss) / periods
+
+            rs = 100 if avg_loss == 0 else avg_gain / avg_loss
+            result.append(100 - (100 / (1 + rs)))
+
+        out = np.full(n, np.nan)
+        out[periods:] = result
+        return out
+
+    def bollinger_bands(self, periods: int, std_dev: float) -> Optional[Dict[str, np.ndarray]]:
+        """Bollinger Bands around the SMA using population standard deviation"""
+        periods = _check_period("periods", periods)
+        if len(self) < periods:
+            return None
+
+        middle = _rolling_mean(self.close, periods)
+        width = _rolling_std(self.close, periods) * std_dev
+        return {
+            "middle": middle,
+            "upper": middle + width,
+            "lower": middle - width
+        }
+
+    def _price_range(self, periods: int):
+        highest_high = _rolling_max(self.high, periods)
+        lowest_low = _rolling_min(self.low, periods)
+        return highest_high, lowest_low, highest_high - lowest_low
+
+    def stochastic(self, k_period: int = 14, d_period: int = 3) -> Optional[Dict[str, np.ndarray]]:
+        """Stochastic Oscillator %K and %D (SMA of %K)"""
+        k_period = _check_period("k_period", k_period)
+        d_period = _check_period("d_period", d_period)
+        if len(self) < k_period:
+            return None
+
+        highest_high, lowest_low, price_range = self._price_range(k_period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k_line = np.where(price_range == 0, 50.0, 100 * (self.close - lowest_low) / price_range)
+
+        d_line = np.full(len(self), np.nan)
+        defined_k = k_line[k_period - 1:]
+        if defined_k.shape[0] >= d_period:
+            d_line[k_period - 1:] = _rolling_mean(defined_k, d_period)
+
+        return {"k_line": k_line, "d_line": d_line}
+
+    def williams_r(self, periods: int = 14) -> Optional[np.ndarray]:
+        """Williams %R scaled from 0 to -100"""
+        periods = _check_period("periods", periods)
+        if len(self) < periods:
+            return None
+
+        highest_high, lowest_low, price_range = self._price_range(periods)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(price_range == 0, -50.0, -100 * (highest_high - self.close) / price_range)
+
+    def obv(self) -> Optional[np.ndarray]:
+        """On-Balance Volume"""
+        if not len(self):
+            return None
+
+        direction = np.sign(np.diff(self.close)).astype(self.volume.dtype)
+        values = np.zeros(len(self), dtype=self.volume.dtype)
+        np.cumsum(direction * self.volume[1:], out=values[1:])
+        return values
+
+    def vwap(self) -> Optional[np.ndarray]:
+        """Cumulative Volume Weighted Average Price"""
+        if not len(self):
+            return None
+
+        typical_price = (self.high + self.low + self.close) / 3
+        cumulative_pv = np.cumsum(typical_price * self.volume)
+        cumulative_volume = np.cumsum(self.volume)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = cumulative_pv / cumulative_volume
+        values[cumulative_volume == 0] = np.nan
+        return values
+
+
+def series_to_pairs(datetimes: Sequence[Any], values: Optional[np.ndarray]) -> List[List[Any]]:
+    """Convert an indicator array to [datetime, value] pairs, NaN becomes None"""
+    if values is None:
+        return []
+
+    items = values.tolist()
+    if values.dtype.kind == "f":
+        items = [None if value != value else value for value in items]
+
+    return [[dt, value] for dt, value in zip(datetimes, items)]
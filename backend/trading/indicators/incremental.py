@@ -0,0 +1,473 @@
+import math
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from .engine import _check_period
+
+NAN = float("nan")
+
+IndicatorValue = Union[float, Dict[str, float]]
+
+
+def _dump(value: Any) -> Any:
+    if hasattr(value, "state_dict"):
+        return value.state_dict()
+    if isinstance(value, deque):
+        return [list(item) if isinstance(item, tuple) else item for item in value]
+    return value
+
+
+def _load(current: Any, value: Any) -> Any:
+    if hasattr(current, "load_state"):
+        return current.load_state(value["state"])
+    if isinstance(current, deque):
+        return deque((tuple(item) if isinstance(item, list) else item for item in value), maxlen=current.maxlen)
+    return value
+
+
+def _volume_dtype(volume: np.ndarray):
+    return np.int64 if volume.dtype.kind in "iub" else np.float64
+
+
+class _Stateful:
+    """Serializes the attributes listed in `_fields`"""
+
+    _fields: Tuple[str, ...] = ()
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {"state": {field: _dump(getattr(self, field)) for field in self._fields}}
+
+    def load_state(self, state: Dict[str, Any]):
+        for field in self._fields:
+            setattr(self, field, _load(getattr(self, field), state[field]))
+        return self
+
+
+class IncrementalIndicator(_Stateful):
+    """Resumable indicator over a stream of candles.
+
+    Subclasses keep just enough state to produce the next value in O(1)
+    amortized time. Values match IndicatorEngine over the same candles: NaN
+    where the indicator is not defined yet. `state_dict()` returns plain
+    JSON-serializable data, `from_state()` restores an equivalent object.
+    """
+
+    name = ""
+    outputs: Optional[Tuple[str, ...]] = None
+
+    def __init__(self, *params):
+        self.params = params
+
+    @property
+    def min_bars(self) -> int:
+        """Candles needed before IndicatorEngine returns anything but None"""
+        return 1
+
+    def update(self, close: float, high: Optional[float] = None, low: Optional[float] = None, volume: float = 0) -> IndicatorValue:
+        """Consume one candle and return the indicator value for it"""
+        raise NotImplementedError
+
+    def extend(self, series) -> Union[np.ndarray, Dict[str, np.ndarray]]:
+        """Consume consecutive candles (any object with close/high/low/volume
+        columns, e.g. CandleSeries) and return values for each of them"""
+        values = [
+            self.update(close, high, low, volume)
+            for close, high, low, volume in zip(
+                series.close.tolist(), series.high.tolist(), series.low.tolist(), series.volume.tolist()
+            )
+        ]
+
+        if self.outputs is None:
+            return np.array(values, dtype=np.float64)
+        return {
+            output: np.array([value[output] for value in values], dtype=np.float64)
+            for output in self.outputs
+        }
+
+    def copy(self) -> 'IncrementalIndicator':
+        return type(self).from_state(self.state_dict())
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            "indicator": self.name,
+            "params": list(self.params),
+            **super().state_dict()
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'IncrementalIndicator':
+        return cls(*state["params"]).load_state(state["state"])
+
+
+class _RunningMean(_Stateful):
+    """Mean of the last `periods` values with a running sum, re-summed once
+    per window to keep floating point drift bounded"""
+
+    _fields = ("window", "total", "since_resync")
+
+    def __init__(self, periods: int):
+        self.window = deque(maxlen=periods)
+        self.total = 0.0
+        self.since_resync = 0
+
+    def update(self, value: float) -> float:
+        if len(self.window) == self.window.maxlen:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+
+        self.since_resync += 1
+        if self.since_resync >= self.window.maxlen:
+            self.total = math.fsum(self.window)
+            self.since_resync = 0
+
+        if len(self.window) < self.window.maxlen:
+            return NAN
+        return self.total / self.window.maxlen
+
+
+class _RollingExtreme(_Stateful):
+    """Rolling max (or min) over the last `periods` values using a monotonic deque"""
+
+    _fields = ("window", "count")
+
+    def __init__(self, periods: int, maximum: bool):
+        self.periods = periods
+        self.maximum = maximum
+        self.window = deque()
+        self.count = 0
+
+    def update(self, value: float) -> float:
+        index = self.count
+        self.count += 1
+
+        if self.maximum:
+            while self.window and self.window[-1][1] <= value:
+                self.window.pop()
+        else:
+            while self.window and self.window[-1][1] >= value:
+                self.window.pop()
+        self.window.append((index, value))
+
+        if self.window[0][0] <= index - self.periods:
+            self.window.popleft()
+
+        if self.count < self.periods:
+            return NAN
+        return self.window[0][1]
+
+
+class SMA(IncrementalIndicator):
+    name = "sma"
+    _fields = ("_mean",)
+
+    def __init__(self, periods: int):
+        super().__init__(_check_period("periods", periods))
+        self.periods = self.params[0]
+        self._mean = _RunningMean(self.periods)
+
+    @property
+    def min_bars(self) -> int:
+        return self.periods
+
+    def update(self, close, high=None, low=None, volume=0):
+        return self._mean.update(close)
+
+
+class EMA(IncrementalIndicator):
+    """EMA seeded with the SMA of the first `periods` closes"""
+
+    name = "ema"
+    _fields = ("_count", "_seed_total", "value")
+
+    def __init__(self, periods: int):
+        super().__init__(_check_period("periods", periods))
+        self.periods = self.params[0]
+        self.multiplier = 2 / (self.periods + 1)
+        self._count = 0
+        self._seed_total = 0.0
+        self.value = None
+
+    @property
+    def min_bars(self) -> int:
+        return self.periods
+
+    def update(self, close, high=None, low=None, volume=0):
+        if self.value is None:
+            self._count += 1
+            self._seed_total += close
+            if self._count < self.periods:
+                return NAN
+            self.value = self._seed_total / self.periods
+        else:
+            self.value = (close - self.value) * self.multiplier + self.value
+        return self.value
+
+
+class MACD(IncrementalIndicator):
+    """MACD line, signal line and histogram.
+
+    Reproduces IndicatorEngine.macd: the signal line value for the MACD point
+    at index i is reported at index i + signal_period - 1.
+    """
+
+    name = "macd"
+    outputs = ("macd", "signal", "histogram")
+    _fields = ("_count", "_fast", "_slow", "_signal", "_pending")
+
+    def __init__(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+        super().__init__(
+            _check_period("fast_period", fast_period),
+            _check_period("slow_period", slow_period),
+            _check_period("signal_period", signal_period)
+        )
+        self.fast_period, self.slow_period, self.signal_period = self.params
+
+        delay = self.slow_period + self.signal_period - 1 - max(self.fast_period, self.slow_period)
+        if delay < 0:
+            raise ValueError("MACD signal line cannot be computed incrementally when fast_period exceeds slow_period + signal_period - 1")
+
+        self._count = 0
+        self._fast = EMA(self.fast_period)
+        self._slow = EMA(self.slow_period)
+        self._signal = EMA(self.signal_period)
+        self._pending = deque(maxlen=delay + 1)
+
+    @property
+    def min_bars(self) -> int:
+        return self.slow_period + self.signal_period
+
+    def update(self, close, high=None, low=None, volume=0):
+        self._count += 1
+        fast = self._fast.update(close)
+        slow = self._slow.update(close)
+
+        macd = NAN
+        if self._count >= self.slow_period:
+            macd = fast - slow
+        if macd == macd:
+            signal = self._signal.update(macd)
+            # None instead of NaN keeps the state valid JSON
+            self._pending.append(signal if signal == signal else None)
+
+        signal = NAN
+        if len(self._pending) == self._pending.maxlen and self._pending[0] is not None:
+            signal = self._pending[0]
+        return {"macd": macd, "signal": signal, "histogram": macd - signal}
+
+
+class RSI(IncrementalIndicator):
+    """Relative Strength Index with Wilder smoothing"""
+
+    name = "rsi"
+    _fields = ("_previous", "_count", "_gain_total", "_loss_total", "avg_gain", "avg_loss")
+
+    def __init__(self, periods: int):
+        super().__init__(_check_period("periods", periods))
+        self.periods = self.params[0]
+        self._previous = None
+        self._count = 0
+        self._gain_total = 0.0
+        self._loss_total = 0.0
+        self.avg_gain = None
+        self.avg_loss = None
+
+    @property
+    def min_bars(self) -> int:
+        return self.periods + 1
+
+    def update(self, close, high=None, low=None, volume=0):
+        previous, self._previous = self._previous, close
+        if previous is None:
+            return NAN
+
+        change = close - previous
+        gain = change if change > 0 else 0.0
+        loss = 0.0 if change > 0 else -change
+
+        if self.avg_gain is None:
+            self._count += 1
+            self._gain_total += gain
+            self._loss_total += loss
+            if self._count < self.periods:
+                return NAN
+            self.avg_gain = self._gain_total / self.periods
+            self.avg_loss = self._loss_total / self.periods
+        else:
+            self.avg_gain = ((self.avg_gain * (self.periods - 1)) + gain) / self.periods
+            self.avg_loss = ((self.avg_loss * (self.periods - 1)) + loss) / self.periods
+
+        rs = 100 if self.avg_loss == 0 else self.avg_gain / self.avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+class OBV(IncrementalIndicator):
+    name = "obv"
+    _fields = ("_previous", "value")
+
+    def __init__(self):
+        super().__init__()
+        self._previous = None
+        self.value = 0
+
+    def update(self, close, high=None, low=None, volume=0):
+        if self._previous is not None:
+            if close > self._previous:
+                self.value += volume
+            elif close < self._previous:
+                self.value -= volume
+        self._previous = close
+        return self.value
+
+    def extend(self, series):
+        volume = np.asarray(series.volume)
+        dtype = _volume_dtype(volume)
+        close = np.asarray(series.close, dtype=np.float64)
+        if not close.shape[0]:
+            return np.zeros(0, dtype=dtype)
+
+        if self._previous is None:
+            steps = np.zeros(close.shape[0], dtype=dtype)
+            steps[1:] = np.sign(np.diff(close)).astype(dtype) * volume[1:]
+        else:
+            steps = np.sign(np.diff(close, prepend=self._previous)).astype(dtype) * volume
+
+        values = np.cumsum(np.concatenate((np.array([self.value], dtype=dtype), steps)))[1:]
+        self._previous = close[-1].item()
+        self.value = values[-1].item()
+        return values
+
+
+class VWAP(IncrementalIndicator):
+    """Cumulative Volume Weighted Average Price"""
+
+    name = "vwap"
+    _fields = ("cumulative_pv", "cumulative_volume")
+
+    def __init__(self):
+        super().__init__()
+        self.cumulative_pv = 0.0
+        self.cumulative_volume = 0
+
+    def update(self, close, high=None, low=None, volume=0):
+        high = close if high is None else high
+        low = close if low is None else low
+        self.cumulative_pv += (high + low + close) / 3 * volume
+        self.cumulative_volume += volume
+        if self.cumulative_volume == 0:
+            return NAN
+        return self.cumulative_pv / self.cumulative_volume
+
+    def extend(self, series):
+        volume = np.asarray(series.volume)
+        volume = volume.astype(_volume_dtype(volume), copy=False)
+        if not volume.shape[0]:
+            return np.zeros(0)
+
+        typical_price = (np.asarray(series.high) + np.asarray(series.low) + np.asarray(series.close)) / 3
+        cumulative_pv = np.cumsum(np.concatenate(([self.cumulative_pv], typical_price * volume)))[1:]
+        cumulative_volume = np.cumsum(np.concatenate((np.array([self.cumulative_volume], dtype=volume.dtype), volume)))[1:]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = cumulative_pv / cumulative_volume
+        values[cumulative_volume == 0] = np.nan
+
+        self.cumulative_pv = cumulative_pv[-1].item()
+        self.cumulative_volume = cumulative_volume[-1].item()
+        return values
+
+
+class BollingerBands(IncrementalIndicator):
+    """Bollinger Bands around the SMA using population standard deviation"""
+
+    name = "bollinger_bands"
+    outputs = ("middle", "upper", "lower")
+    _fields = ("_mean", "_squares")
+
+    def __init__(self, periods: int, std_dev: float):
+        super().__init__(_check_period("periods", periods), std_dev)
+        self.periods = self.params[0]
+        self.std_dev = std_dev
+        self._mean = _RunningMean(self.periods)
+        self._squares = _RunningMean(self.periods)
+
+    @property
+    def min_bars(self) -> int:
+        return self.periods
+
+    def update(self, close, high=None, low=None, volume=0):
+        middle = self._mean.update(close)
+        mean_square = self._squares.update(close * close)
+        if middle != middle:
+            return {"middle": NAN, "upper": NAN, "lower": NAN}
+
+        width = math.sqrt(max(mean_square - middle * middle, 0.0)) * self.std_dev
+        return {"middle": middle, "upper": middle + width, "lower": middle - width}
+
+
+class Stochastic(IncrementalIndicator):
+    """Stochastic Oscillator %K and %D (SMA of %K)"""
+
+    name = "stochastic"
+    outputs = ("k_line", "d_line")
+    _fields = ("_highest", "_lowest", "_d_mean")
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        super().__init__(_check_period("k_period", k_period), _check_period("d_period", d_period))
+        self.k_period, self.d_period = self.params
+        self._highest = _RollingExtreme(self.k_period, maximum=True)
+        self._lowest = _RollingExtreme(self.k_period, maximum=False)
+        self._d_mean = _RunningMean(self.d_period)
+
+    @property
+    def min_bars(self) -> int:
+        return self.k_period
+
+    def update(self, close, high=None, low=None, volume=0):
+        highest_high = self._highest.update(close if high is None else high)
+        lowest_low = self._lowest.update(close if low is None else low)
+        if highest_high != highest_high:
+            return {"k_line": NAN, "d_line": NAN}
+
+        price_range = highest_high - lowest_low
+        k_value = 50.0 if price_range == 0 else 100 * (close - lowest_low) / price_range
+        return {"k_line": k_value, "d_line": self._d_mean.update(k_value)}
+
+
+class WilliamsR(IncrementalIndicator):
+    """Williams %R scaled from 0 to -100"""
+
+    name = "williams_r"
+    _fields = ("_highest", "_lowest")
+
+    def __init__(self, periods: int = 14):
+        super().__init__(_check_period("periods", periods))
+        self.periods = self.params[0]
+        self._highest = _RollingExtreme(self.periods, maximum=True)
+        self._lowest = _RollingExtreme(self.periods, maximum=False)
+
+    @property
+    def min_bars(self) -> int:
+        return self.periods
+
+    def update(self, close, high=None, low=None, volume=0):
+        highest_high = self._highest.update(close if high is None else high)
+        lowest_low = self._lowest.update(close if low is None else low)
+        if highest_high != highest_high:
+            return NAN
+
+        price_range = highest_high - lowest_low
+        return -50.0 if price_range == 0 else -100 * (highest_high - close) / price_range
+
+
+INCREMENTAL_INDICATORS = {
+    indicator.name: indicator
+    for indicator in (SMA, EMA, MACD, RSI, OBV, VWAP, BollingerBands, Stochastic, WilliamsR)
+}
+
+
+def indicator_from_state(state: Dict[str, Any]) -> IncrementalIndicator:
+    """Restore any incremental indicator from its state_dict()"""
+    return INCREMENTAL_INDICATORS[state["indicator"]].from_state(state)
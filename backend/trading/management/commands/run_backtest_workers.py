@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from trading.backtests.worker import BACKTEST_POLL_INTERVAL, BACKTEST_WORKERS, BacktestWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a pool of worker processes executing queued backtest jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS, help="Number of worker processes")
+        parser.add_argument("--poll-interval", type=float, default=BACKTEST_POLL_INTERVAL, help="Seconds between queue polls")
+
+    def handle(self, *args, **options):
+        pool = BacktestWorkerPool(size=options["workers"], poll_interval=options["poll_interval"])
+        self.stdout.write(f"Starting {pool.size} backtest workers as {pool.prefix}*")
+        try:
+            pool.run()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Backtest workers stopped")
@@ -1,7 +1,8 @@
 from .base_provider import BaseMarketDataProvider
 from .tinkoff_provider import TinkoffMarketDataProvider
 from .manager import MarketDataManager
+from .candles import CandleSeries
 
-__all__ = ['BaseMarketDataProvider', 'TinkoffMarketDataProvider', 'MarketDataManager']
+__all__ = ['BaseMarketDataProvider', 'TinkoffMarketDataProvider', 'MarketDataManager', 'CandleSeries']
 
 market_data_manager = MarketDataManager.create_default() 
\ No newline at end of file
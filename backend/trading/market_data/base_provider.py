@@ -10,6 +10,10 @@ class BaseMarketDataProvider(ABC):
         """Get current price for a symbol"""
         pass
     
+    def get_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get current prices for several symbols, keyed by symbol"""
+        return {symbol: self.get_price(symbol) for symbol in symbols}
+    
     @abstractmethod
     def get_daily_stats(self, symbol: str) -> Dict[str, Any]:
         """Get 24h statistics for a symbol"""
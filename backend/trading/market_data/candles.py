@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+class CandleSeries:
+    """Columnar candle container.
+
+    Candles are stored as parallel arrays: epoch seconds (int64), OHLC
+    (float64), volume (int64) and completeness flag (bool), about 49 bytes
+    per candle. JSON rows are only built at the response boundary.
+    """
+
+    __slots__ = ("time", "open", "high", "low", "close", "volume", "is_complete")
+
+    def __init__(
+        self,
+        time: Sequence[int],
+        open: Sequence[float],
+        high: Sequence[float],
+        low: Sequence[float],
+        close: Sequence[float],
+        volume: Sequence[int],
+        is_complete: Sequence[bool]
+    ):
+        self.time = np.ascontiguousarray(time, dtype=np.int64)
+        self.open = np.ascontiguousarray(open, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.volume = np.ascontiguousarray(volume, dtype=np.int64)
+        self.is_complete = np.ascontiguousarray(is_complete, dtype=np.bool_)
+
+    @classmethod
+    def empty(cls) -> 'CandleSeries':
+        return cls([], [], [], [], [], [], [])
+
+    @classmethod
+    def from_historic_candles(cls, candles: Iterable[Any]) -> 'CandleSeries':
+        """Build series from Tinkoff HistoricCandle objects in a single pass.
+
+        Accepts any iterable, so candles streamed from the API or the market data
+        cache never have to be materialized as a list of objects.
+        """
+        time, open_, high, low, close, volume, is_complete = [], [], [], [], [], [], []
+
+        for candle in candles:
+            time.append(int(candle.time.timestamp()))
+            open_.append(candle.open.units + candle.open.nano / 1_000_000_000)
+            high.append(candle.high.units + candle.high.nano / 1_000_000_000)
+            low.append(candle.low.units + candle.low.nano / 1_000_000_000)
+            close.append(candle.close.units + candle.close.nano / 1_000_000_000)
+            volume.append(candle.volume)
+            is_complete.append(candle.is_complete)
+
+        return cls(time, open_, high, low, close, volume, is_complete)
+
+    def __len__(self) -> int:
+        return self.time.shape[0]
+
+    def __getitem__(self, index: slice) -> 'CandleSeries':
+        """Slice all columns at once, returns views into the same buffers"""
+        if not isinstance(index, slice):
+            raise TypeError("CandleSeries supports only slice indexing")
+        return CandleSeries(
+            self.time[index], self.open[index], self.high[index], self.low[index],
+            self.close[index], self.volume[index], self.is_complete[index]
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def datetimes(self) -> List[str]:
+        """ISO 8601 UTC timestamps, as returned to the frontend"""
+        return [datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() for ts in self.time.tolist()]
+
+    def to_rows(self, datetimes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Convert to per-candle dicts for JSON responses"""
+        if datetimes is None:
+            datetimes = self.datetimes()
+
+        return [
+            {
+                'datetime': dt,
+                'open': open_price,
+                'high': high_price,
+                'low': low_price,
+                'close': close_price,
+                'volume': volume,
+                'is_complete': is_complete
+            }
+            for dt, open_price, high_price, low_price, close_price, volume, is_complete in zip(
+                datetimes,
+                self.open.tolist(),
+                self.high.tolist(),
+                self.low.tolist(),
+                self.close.tolist(),
+                self.volume.tolist(),
+                self.is_complete.tolist()
+            )
+        ]
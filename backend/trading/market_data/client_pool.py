@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import grpc
+
+logger = logging.getLogger("TinkoffProvider")
+
+# Errors after which a channel is considered broken and is reopened
+RECONNECT_STATUS_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    if code in RECONNECT_STATUS_CODES:
+        return True
+    return isinstance(error, ValueError) and "closed channel" in str(error)
+
+
+def _default_health_check(services: Any) -> None:
+    services.users.get_accounts()
+
+
+class _Channel:
+    """One opened client (and its gRPC channel) with reconnect bookkeeping"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client = None
+        self.services = None
+        self.checked_at = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+
+
+class TinkoffClientPool:
+    """Long-lived, thread-safe pool of Tinkoff API clients.
+
+    `client_factory` returns an unopened Client or SandboxClient; it is entered
+    once per channel and the resulting services object is shared by all
+    threads, since gRPC channels are safe for concurrent use. Channels are
+    health checked at most every `health_check_interval` seconds when handed
+    out, reopened after UNAVAILABLE errors, and failed reconnects are retried
+    with exponential backoff. `close()` releases all channels; the pool reopens
+    them lazily on next use.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        size: int = 1,
+        health_check_interval: float = 60.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        health_check: Optional[Callable[[Any], None]] = None
+    ):
+        if size < 1:
+            raise ValueError(f"size must be a positive integer, got {size}")
+
+        self._factory = client_factory
+        self._channels = [_Channel() for _ in range(size)]
+        self._next = 0
+        self._lock = threading.Lock()
+        self.health_check_interval = health_check_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._health_check = health_check or _default_health_check
+
+    @contextmanager
+    def client(self) -> Iterator[Any]:
+        """Borrow the services object of the next channel (round robin)"""
+        channel = self._pick()
+        services = self._ensure_open(channel)
+        try:
+            yield services
+        except Exception as e:
+            if _is_connection_error(e):
+                logger.warning(f"Tinkoff API channel failed, reopening on next use: {e}")
+                self._invalidate(channel, services)
+            raise
+
+    def close(self) -> None:
+        """Close every open channel"""
+        for channel in self._channels:
+            with channel.lock:
+                self._close_channel(channel)
+                channel.failures = 0
+                channel.retry_at = 0.0
+
+    def _pick(self) -> _Channel:
+        with self._lock:
+            channel = self._channels[self._next]
+            self._next = (self._next + 1) % len(self._channels)
+        return channel
+
+    def _ensure_open(self, channel: _Channel) -> Any:
+        with channel.lock:
+            now = time.monotonic()
+
+            if channel.services is not None and now - channel.checked_at >= self.health_check_interval:
+                try:
+                    self._health_check(channel.services)
+                    channel.checked_at = now
+                except Exception as e:
+                    logger.warning(f"Tinkoff API channel failed health check, reconnecting: {e}")
+                    self._close_channel(channel)
+
+            if channel.services is None:
+                if now < channel.retry_at:
+                    raise ConnectionError(
+                        f"Tinkoff API is unavailable, next reconnect attempt in {channel.retry_at - now:.1f}s"
+                    )
+                self._open_channel(channel, now)
+
+            return channel.services
+
+    def _open_channel(self, channel: _Channel, now: float) -> None:
+        client = self._factory()
+        try:
+            services = client.__enter__()
+        except Exception:
+            channel.failures += 1
+            channel.retry_at = now + min(self.backoff_max, self.backoff_base * 2 ** (channel.failures - 1))
+            logger.exception(f"Failed to open Tinkoff API channel (attempt {channel.failures})")
+            raise
+
+        channel.client = client
+        channel.services = services
+        channel.checked_at = now
+        channel.failures = 0
+        channel.retry_at = 0.0
+        logger.debug("Opened Tinkoff API channel")
+
+    def _invalidate(self, channel: _Channel, services: Any) -> None:
+        with channel.lock:
+            # Another thread may already have replaced the broken channel
+            if channel.services is services:
+                self._close_channel(channel)
+
+    @staticmethod
+    def _close_channel(channel: _Channel) -> None:
+        client, channel.client, channel.services = channel.client, None, None
+        if client is None:
+            return
+        try:
+            client.__exit__(None, None, None)
+            logger.debug("Closed Tinkoff API channel")
+        except Exception:
+            logger.exception("Failed to close Tinkoff API channel")
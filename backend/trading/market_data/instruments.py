@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterable, Optional, Tuple
+
+import grpc
+from tinkoff.invest import InstrumentIdType, Quotation, RequestError, SecurityTradingStatus
+
+logger = logging.getLogger("TinkoffProvider")
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "market_data_cache"
+
+# InstrumentsService methods loaded into the registry, in lookup priority order
+INSTRUMENT_KINDS = ("shares", "etfs", "bonds", "futures")
+
+INSTRUMENT_TYPES = {
+    "shares": "share",
+    "etfs": "etf",
+    "bonds": "bond",
+    "futures": "futures",
+}
+
+DECIMAL_FIELDS = ("min_price_increment", "klong", "kshort")
+
+# Concurrent get_instrument_by calls when resolving FIGIs missing from the lists
+RESOLVE_WORKERS = 8
+
+# Seconds an identifier the API does not know is answered with None without asking again
+MISS_TTL = 5 * 60
+
+
+def _quotation_to_decimal(quotation: Optional[Quotation]) -> Optional[Decimal]:
+    if quotation is None:
+        return None
+    return Decimal(quotation.units) + Decimal(quotation.nano) / Decimal(1_000_000_000)
+
+
+def instrument_to_dict(item: Any, kind: str) -> Dict[str, Any]:
+    """Convert a Share/Bond/Etf/Future (or Instrument) message to a registry record"""
+    min_price_increment = getattr(item, "min_price_increment", None)
+    return {
+        "name": item.name,
+        "ticker": item.ticker,
+        "class_code": item.class_code,
+        "figi": item.figi,
+        "uid": item.uid,
+        "type": kind,
+        "instrument_type": getattr(item, "instrument_type", None) or INSTRUMENT_TYPES.get(kind, kind),
+        "min_price_increment": _quotation_to_decimal(min_price_increment),
+        "scale": 9 - len(str(min_price_increment.nano)) + 1 if min_price_increment is not None else None,
+        "lot": item.lot,
+        "trading_status": str(SecurityTradingStatus(item.trading_status).name),
+        "api_trade_available_flag": item.api_trade_available_flag,
+        "currency": item.currency,
+        "exchange": item.exchange,
+        "buy_available_flag": item.buy_available_flag,
+        "sell_available_flag": item.sell_available_flag,
+        "short_enabled_flag": item.short_enabled_flag,
+        "klong": _quotation_to_decimal(getattr(item, "klong", None)),
+        "kshort": _quotation_to_decimal(getattr(item, "kshort", None)),
+    }
+
+
+class InstrumentRegistry:
+    """In-memory instrument metadata indexed by FIGI, (ticker, class_code) and UID.
+
+    The full instrument lists are downloaded once, persisted to `cache_path`
+    and refreshed by a daemon thread every `refresh_interval` seconds. On a
+    cold start the registry is served from the persisted file when it exists,
+    so lookups do not wait for the API. FIGIs missing from the lists
+    (currencies, options, ...) are resolved with a single get_instrument_by
+    call and remembered; identifiers the API does not know are remembered
+    for MISS_TTL seconds.
+    """
+
+    def __init__(
+        self,
+        client_source: Callable[[], Any],
+        cache_path: Optional[Path] = None,
+        refresh_interval: float = 6 * 60 * 60,
+        kinds: Iterable[str] = INSTRUMENT_KINDS
+    ):
+        self._client_source = client_source
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.refresh_interval = refresh_interval
+        self.kinds = tuple(kinds)
+
+        self._by_figi: Dict[str, Dict[str, Any]] = {}
+        self._by_ticker: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_ticker_only: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_uid: Dict[str, Dict[str, Any]] = {}
+        self._misses: Dict[Tuple[int, str], float] = {}
+        self.loaded_at: Optional[float] = None
+
+        self._load_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._by_figi)
+
+    def get_by_figi(self, figi: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        instrument = self._by_figi.get(figi)
+        if instrument is None:
+            instrument = self._fetch_one(InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI, figi)
+        return instrument
+
+    def resolve_figis(self, figis: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up each distinct FIGI once; misses are fetched concurrently.
+
+        Unknown or unresolvable FIGIs map to None instead of raising.
+        """
+        self.ensure_loaded()
+        result = {figi: self._by_figi.get(figi) for figi in set(figis) if figi}
+        missing = [figi for figi, instrument in result.items() if instrument is None]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(RESOLVE_WORKERS, len(missing))) as executor:
+                for figi, instrument in zip(missing, executor.map(self._fetch_figi_quietly, missing)):
+                    result[figi] = instrument
+
+        return result
+
+    def get_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        instrument = self._by_uid.get(uid)
+        if instrument is None:
+            instrument = self._fetch_one(InstrumentIdType.INSTRUMENT_ID_TYPE_UID, uid)
+        return instrument
+
+    def get_by_ticker(self, ticker: str, class_code: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Exact (ticker, class_code) match, otherwise the first instrument with
+        this ticker in INSTRUMENT_KINDS order"""
+        self.ensure_loaded()
+        if class_code:
+            instrument = self._by_ticker.get((ticker, class_code))
+            if instrument is not None:
+                return instrument
+
+        candidates = self._by_ticker_only.get(ticker)
+        return candidates[0] if candidates else None
+
+    def ensure_loaded(self) -> None:
+        """Load the registry from disk or the API on first use and start the
+        background refresh"""
+        if self.loaded_at is None:
+            with self._load_lock:
+                if self.loaded_at is None and not self._load_from_disk():
+                    self.refresh()
+        self._start_refresher()
+
+    def refresh(self) -> None:
+        """Download all instrument lists and atomically replace the indexes"""
+        instruments = []
+        with self._client_source() as client:
+            for kind in self.kinds:
+                response = getattr(client.instruments, kind)()
+                instruments.extend(instrument_to_dict(item, kind) for item in response.instruments)
+
+        self._replace(instruments, time.time())
+        logger.info(f"Instrument registry refreshed: {len(instruments)} instruments")
+        self._save_to_disk(instruments)
+
+    def stop(self) -> None:
+        """Stop the background refresh thread"""
+        self._stop.set()
+        refresher, self._refresher = self._refresher, None
+        if refresher is not None and refresher is not threading.current_thread():
+            refresher.join(timeout=5)
+
+    def _start_refresher(self) -> None:
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._load_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name="instrument-registry", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            age = time.time() - (self.loaded_at or 0)
+            if self._stop.wait(max(self.refresh_interval - age, 0)):
+                break
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh instrument registry")
+                # Retry sooner than a full interval after a failure
+                self._stop.wait(min(self.refresh_interval, 5 * 60))
+
+    def _replace(self, instruments: List[Dict[str, Any]], loaded_at: float) -> None:
+        by_figi, by_ticker, by_ticker_only, by_uid = {}, {}, {}, {}
+        for instrument in instruments:
+            by_figi.setdefault(instrument["figi"], instrument)
+            by_ticker.setdefault((instrument["ticker"], instrument["class_code"]), instrument)
+            by_ticker_only.setdefault(instrument["ticker"], []).append(instrument)
+            if instrument.get("uid"):
+                by_uid.setdefault(instrument["uid"], instrument)
+
+        with self._index_lock:
+            self._by_figi, self._by_ticker, self._by_ticker_only, self._by_uid = by_figi, by_ticker, by_ticker_only, by_uid
+            self.loaded_at = loaded_at
+
+    def _add(self, instrument: Dict[str, Any]) -> None:
+        with self._index_lock:
+            if instrument["figi"] in self._by_figi:
+                return
+            self._by_figi[instrument["figi"]] = instrument
+            self._by_ticker.setdefault((instrument["ticker"], instrument["class_code"]), instrument)
+            self._by_ticker_only.setdefault(instrument["ticker"], []).append(instrument)
+            if instrument.get("uid"):
+                self._by_uid.setdefault(instrument["uid"], instrument)
+
+    def _fetch_one(self, id_type: InstrumentIdType, value: str) -> Optional[Dict[str, Any]]:
+        key = (int(id_type), value)
+        if self._misses.get(key, 0) > time.monotonic():
+            return None
+
+        try:
+            with self._client_source() as client:
+                instrument = client.instruments.get_instrument_by(id_type=id_type, id=value).instrument
+        except RequestError as e:
+            if e.code != grpc.StatusCode.NOT_FOUND:
+                raise
+            instrument = None
+
+        if not instrument:
+            self._misses[key] = time.monotonic() + MISS_TTL
+            return None
+
+        record = instrument_to_dict(instrument, instrument.instrument_type)
+        self._add(record)
+        return record
+
+    def _fetch_figi_quietly(self, figi: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self._fetch_one(InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI, figi)
+        except Exception:
+            logger.exception(f"Failed to resolve instrument for figi: {figi}")
+            return None
+
+    def _load_from_disk(self) -> bool:
+        if self.cache_path is None or not self.cache_path.exists():
+            return False
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+
+            instruments = payload["instruments"]
+            for instrument in instruments:
+                for field in DECIMAL_FIELDS:
+                    if instrument.get(field) is not None:
+                        instrument[field] = Decimal(instrument[field])
+        except Exception:
+            logger.exception(f"Failed to read instrument registry from {self.cache_path}")
+            return False
+
+        self._replace(instruments, payload["loaded_at"])
+        logger.info(f"Instrument registry loaded from {self.cache_path}: {len(instruments)} instruments")
+        return True
+
+    def _save_to_disk(self, instruments: List[Dict[str, Any]]) -> None:
+        if self.cache_path is None:
+            return
+
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"loaded_at": self.loaded_at, "instruments": instruments}, f, default=str, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception:
+            logger.exception(f"Failed to persist instrument registry to {self.cache_path}")
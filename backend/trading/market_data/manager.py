@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 
 from .base_provider import BaseMarketDataProvider
 from .tinkoff_provider import TinkoffMarketDataProvider
+from .instruments import DEFAULT_CACHE_DIR
 
 load_dotenv()
 
@@ -62,13 +63,31 @@ class MarketDataManager:
         
         tinkoff_token = os.environ.get('TINKOFF_TOKEN', '')
         tinkoff_sandbox = os.environ.get('TINKOFF_SANDBOX', 'false').strip().lower() == 'true'
+        tinkoff_pool_size = int(os.environ.get('TINKOFF_CLIENT_POOL_SIZE', 1))
+        instruments_cache = os.path.join(
+            os.environ.get('TINKOFF_INSTRUMENTS_CACHE_DIR', str(DEFAULT_CACHE_DIR)),
+            f"instruments_{'sandbox' if tinkoff_sandbox else 'prod'}.json"
+        )
+        instruments_refresh_interval = float(os.environ.get('TINKOFF_INSTRUMENTS_REFRESH_INTERVAL', 6 * 60 * 60))
+        portfolio_ttl = float(os.environ.get('TINKOFF_PORTFOLIO_TTL', 5))
+        price_ttl = float(os.environ.get('TINKOFF_PRICE_TTL', 1))
+        stats_ttl = float(os.environ.get('TINKOFF_STATS_TTL', 60))
         
         print("DEBUG: TINKOFF_SANDBOX raw value:", os.environ.get('TINKOFF_SANDBOX'))
         print("DEBUG: TINKOFF_SANDBOX as bool:", tinkoff_sandbox)
         
         if tinkoff_token:
             print(f"Registering Tinkoff provider (sandbox: {tinkoff_sandbox})")
-            tinkoff_provider = TinkoffMarketDataProvider(tinkoff_token, sandbox=tinkoff_sandbox)
+            tinkoff_provider = TinkoffMarketDataProvider(
+                tinkoff_token,
+                sandbox=tinkoff_sandbox,
+                pool_size=tinkoff_pool_size,
+                instruments_cache=instruments_cache,
+                instruments_refresh_interval=instruments_refresh_interval,
+                portfolio_ttl=portfolio_ttl,
+                price_ttl=price_ttl,
+                stats_ttl=stats_ttl
+            )
             manager.register_provider('tinkoff', tinkoff_provider)
             manager.set_active_provider('tinkoff')
         else:
@@ -0,0 +1,166 @@
+import re
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pytz
+
+from .candles import CandleSeries
+
+MOEX_TIMEZONE = pytz.timezone("Europe/Moscow")
+
+DAY = 24 * 60 * 60
+
+# 1970-01-05, the first Monday after the epoch, in days since the epoch
+EPOCH_MONDAY = 4
+
+UNIT_ALIASES = {
+    "min": "min", "minute": "min",
+    "h": "hour", "hour": "hour",
+    "d": "day", "day": "day",
+    "w": "week", "week": "week",
+    "mo": "month", "month": "month",
+}
+
+UNIT_SECONDS = {"min": 60, "hour": 60 * 60, "day": DAY, "week": 7 * DAY}
+
+_TIMEFRAME_PATTERN = re.compile(r"^(\d*)([a-z]+)$")
+
+
+class Timeframe(NamedTuple):
+    """A candle timeframe: `multiple` units of min, hour, day, week or month"""
+
+    multiple: int
+    unit: str
+
+    def __str__(self) -> str:
+        return f"{self.multiple}{self.unit}"
+
+    @property
+    def intraday(self) -> bool:
+        return self.unit in ("min", "hour")
+
+    @property
+    def seconds(self) -> Optional[int]:
+        """Length in seconds, None for months"""
+        unit = UNIT_SECONDS.get(self.unit)
+        return unit * self.multiple if unit is not None else None
+
+
+def parse_timeframe(value: Union[str, Timeframe]) -> Timeframe:
+    """Parse timeframes such as "1min", "2h", "4hour", "3d", "1week" or "1month".
+
+    Raises ValueError on unknown units and on intraday timeframes longer than a day.
+    """
+    if isinstance(value, Timeframe):
+        return value
+
+    match = _TIMEFRAME_PATTERN.match(value.strip().lower())
+    unit = UNIT_ALIASES.get(match.group(2)) if match else None
+    if unit is None:
+        raise ValueError(f"Invalid timeframe: {value}")
+
+    multiple = int(match.group(1) or 1)
+    timeframe = Timeframe(multiple, unit)
+    if multiple < 1 or (timeframe.intraday and timeframe.seconds > DAY):
+        raise ValueError(f"Invalid timeframe: {value}")
+    return timeframe
+
+
+def _local_times(times: np.ndarray, tz) -> Tuple[np.ndarray, np.ndarray]:
+    """Wall-clock epoch seconds in `tz` and the UTC offsets used.
+
+    Offsets are looked up once per UTC day (at noon), so a DST switch
+    (Moscow had them until 2011) takes effect from the next day on; the
+    exchange was closed at those hours anyway.
+    """
+    days, inverse = np.unique(times // DAY, return_inverse=True)
+    offsets = np.array(
+        [datetime.fromtimestamp(int(day) * DAY + DAY // 2, tz).utcoffset().total_seconds() for day in days.tolist()],
+        dtype=np.int64
+    )[inverse]
+    return times + offsets, offsets
+
+
+def _bucket_labels(local: np.ndarray, timeframe: Timeframe) -> np.ndarray:
+    """Local start of the bucket every wall-clock timestamp belongs to"""
+    days = local // DAY
+    multiple = timeframe.multiple
+
+    if timeframe.intraday:
+        # Intraday buckets restart every trading day, so a 90min or 5h
+        # bucket never mixes two sessions
+        step = timeframe.seconds
+        return days * DAY + (local - days * DAY) // step * step
+
+    if timeframe.unit == "day":
+        return (days - days % multiple) * DAY
+
+    if timeframe.unit == "week":
+        weeks = (days - EPOCH_MONDAY) // 7
+        return ((weeks - weeks % multiple) * 7 + EPOCH_MONDAY) * DAY
+
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return (months - months % multiple).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) * DAY
+
+
+def _bucket_end(label: int, timeframe: Timeframe) -> int:
+    """Local end of the bucket starting at local time `label`"""
+    if timeframe.intraday:
+        return min(label + timeframe.seconds, (label // DAY + 1) * DAY)
+    if timeframe.unit == "month":
+        month = np.datetime64(label // DAY, "D").astype("datetime64[M]") + timeframe.multiple
+        return int(month.astype("datetime64[D]").astype(np.int64)) * DAY
+    return label + timeframe.seconds
+
+
+def bucket_start(timestamp: int, timeframe: Union[str, Timeframe], tz=MOEX_TIMEZONE) -> int:
+    """Epoch seconds at which the bucket containing `timestamp` starts"""
+    local, offsets = _local_times(np.array([timestamp], dtype=np.int64), tz)
+    return int(_bucket_labels(local, parse_timeframe(timeframe))[0] - offsets[0])
+
+
+def resample(
+    series: CandleSeries,
+    timeframe: Union[str, Timeframe],
+    until: Optional[float] = None,
+    tz=MOEX_TIMEZONE
+) -> CandleSeries:
+    """Aggregate candles into a coarser timeframe.
+
+    Buckets follow the exchange's wall clock in `tz`: intraday buckets are
+    aligned to local midnight and never span two trading days, days, weeks
+    (starting on Monday) and months are calendar periods, and multiples of
+    them are counted from the epoch, so bucket boundaries do not depend on
+    the requested range. Each bucket is labelled with its start time.
+
+    A bucket is complete when all its candles are, and it ends no later than
+    `until` (the end of the range `series` was loaded for, defaults to now).
+
+    `series` must be sorted by time and finer than `timeframe`, with candle
+    boundaries that fall on bucket boundaries.
+    """
+    timeframe = parse_timeframe(timeframe)
+    if not len(series):
+        return CandleSeries.empty()
+
+    local, offsets = _local_times(series.time, tz)
+    labels = _bucket_labels(local, timeframe)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(series)]
+
+    is_complete = np.logical_and.reduceat(series.is_complete, starts)
+    last_end = _bucket_end(int(labels[starts[-1]]), timeframe) - int(offsets[starts[-1]])
+    if last_end > (time.time() if until is None else until):
+        is_complete[-1] = False
+
+    return CandleSeries(
+        labels[starts] - offsets[starts],
+        series.open[starts],
+        np.maximum.reduceat(series.high, starts),
+        np.minimum.reduceat(series.low, starts),
+        series.close[ends - 1],
+        np.add.reduceat(series.volume, starts),
+        is_complete
+    )
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+DAY = 24 * 60 * 60
+
+# Trades and last prices are aggregated into buckets of this many seconds
+BUCKET_SECONDS = 60
+
+
+class _Bucket:
+    __slots__ = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, time_: float, open_: Decimal, high: Decimal, low: Decimal, close: Decimal, volume: int):
+        self.time = time_
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+
+class RollingWindowStats:
+    """Open, high, low, close and volume of one instrument over a sliding
+    time window, maintained incrementally.
+
+    Data arrives as candles (updates of the most recent candle replace it)
+    or as single trades/prices, which are merged into BUCKET_SECONDS buckets.
+    High and low are tracked with monotonic deques and the volume with a
+    running sum, so both updates and reads are amortized O(1).
+    """
+
+    def __init__(self, symbol: str, window: float = DAY):
+        self.symbol = symbol
+        self.window = window
+        self.updated_at: Optional[float] = None
+        self._buckets: deque = deque()
+        self._highs: deque = deque()
+        self._lows: deque = deque()
+        self._volume = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def apply_candle(self, time_: float, open_: Decimal, high: Decimal, low: Decimal, close: Decimal, volume: int) -> None:
+        with self._lock:
+            self._apply(_Bucket(time_, open_, high, low, close, volume))
+
+    def apply_trade(self, time_: float, price: Decimal, quantity: int = 0) -> None:
+        bucket_time = time_ - time_ % BUCKET_SECONDS
+        with self._lock:
+            last = self._buckets[-1] if self._buckets else None
+            if last is not None and last.time == bucket_time:
+                bucket = _Bucket(bucket_time, last.open, max(last.high, price), min(last.low, price), price, last.volume + quantity)
+            else:
+                bucket = _Bucket(bucket_time, price, price, price, price, quantity)
+            self._apply(bucket)
+
+    def stats(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Statistics over the window ending at `now`, None if it is empty"""
+        with self._lock:
+            self._expire((now if now is not None else time.time()) - self.window)
+            if not self._buckets:
+                return None
+
+            open_price = self._buckets[0].open
+            close_price = self._buckets[-1].close
+            price_change = close_price - open_price
+            return {
+                "symbol": self.symbol,
+                "openPrice": open_price,
+                "closePrice": close_price,
+                "highPrice": self._highs[0].high,
+                "lowPrice": self._lows[0].low,
+                "volume": self._volume,
+                "priceChange": price_change,
+                "priceChangePercent": (price_change / open_price) * 100 if open_price else 0
+            }
+
+    def _apply(self, bucket: _Bucket) -> None:
+        last = self._buckets[-1] if self._buckets else None
+        if last is not None and bucket.time < last.time:
+            # Older than what we already have, the window only moves forward
+            return
+
+        if last is not None and bucket.time == last.time:
+            self._buckets.pop()
+            self._volume -= last.volume
+            if bucket.high < last.high or bucket.low > last.low:
+                # A revised candle may have narrowed its range; the deques
+                # dropped the values it dominated, so rebuild them
+                self._buckets.append(bucket)
+                self._volume += bucket.volume
+                self._rebuild_extremes()
+                self.updated_at = time.monotonic()
+                return
+            if self._highs and self._highs[-1] is last:
+                self._highs.pop()
+            if self._lows and self._lows[-1] is last:
+                self._lows.pop()
+
+        self._buckets.append(bucket)
+        self._volume += bucket.volume
+        self._push_extremes(bucket)
+        self._expire(bucket.time - self.window)
+        self.updated_at = time.monotonic()
+
+    def _push_extremes(self, bucket: _Bucket) -> None:
+        while self._highs and self._highs[-1].high <= bucket.high:
+            self._highs.pop()
+        self._highs.append(bucket)
+        while self._lows and self._lows[-1].low >= bucket.low:
+            self._lows.pop()
+        self._lows.append(bucket)
+
+    def _rebuild_extremes(self) -> None:
+        self._highs.clear()
+        self._lows.clear()
+        for bucket in self._buckets:
+            self._push_extremes(bucket)
+
+    def _expire(self, start: float) -> None:
+        while self._buckets and self._buckets[0].time < start:
+            bucket = self._buckets.popleft()
+            self._volume -= bucket.volume
+            if self._highs and self._highs[0] is bucket:
+                self._highs.popleft()
+            if self._lows and self._lows[0] is bucket:
+                self._lows.popleft()
@@ -0,0 +1,305 @@
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Hashable, Optional
+
+logger = logging.getLogger("TinkoffProvider")
+
+# Unary requests per minute allowed by the T-Bank Invest API for each service
+GROUP_LIMITS = {
+    "market_data": 600,
+    "instruments": 200,
+    "operations": 200,
+    "users": 100,
+    "sandbox": 200,
+    "orders": 300,
+    "stop_orders": 50,
+}
+DEFAULT_GROUP_LIMIT = 100
+
+# Processes calling the API with the same token: the web process and the
+# run_backtest_workers workers by default. Each process limits itself to
+# its share of the quota, since the buckets are not shared between them.
+API_PROCESSES = int(os.environ.get('TINKOFF_API_PROCESSES', 1 + int(os.environ.get('BACKTEST_WORKERS', 2))))
+
+# Seconds of quota that may be spent at once
+BURST_SECONDS = 10
+
+# Read-only methods whose identical concurrent calls share one request
+COALESCED_PREFIXES = ("get_", "find_")
+COALESCED_METHODS = {"shares", "etfs", "bonds", "futures", "currencies", "options"}
+
+
+def _status_code(error: Exception):
+    code = getattr(error, "code", None)
+    return code() if callable(code) else code
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `capacity` tokens"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, self.rate * BURST_SECONDS)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token and return 0, or return seconds until one is available"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def block(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds`, e.g. after the server reported an exhausted quota"""
+        self._tokens = 0.0
+        self._updated_at = time.monotonic() + seconds
+        self._blocked_until = max(self._blocked_until, self._updated_at)
+
+
+class _Group:
+    def __init__(self, limit: float):
+        self.bucket = TokenBucket(limit)
+        self.cond = threading.Condition()
+        self.queue = []
+        self.in_flight = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key
+    wait for it and share its result or exception"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        result, _ = self.do_shared(key, fn)
+        return result
+
+    def do_shared(self, key: Hashable, fn: Callable[[], Any]):
+        """Like do(), also returns whether the result came from another caller's call"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class RequestScheduler:
+    """Central rate limiter for the Tinkoff API requests of one process.
+
+    Requests are grouped by API service, each group has its own token bucket
+    sized from GROUP_LIMITS divided by `processes`, the number of processes
+    sharing the account's quota; buckets are per process. Waiting requests are served in priority order
+    (INTERACTIVE before BACKGROUND), FIFO within a priority, and run in the
+    calling thread once a token is available. Identical read-only requests
+    that are already in flight are coalesced. A RESOURCE_EXHAUSTED response
+    pauses the group until the quota resets.
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None, default_limit: float = DEFAULT_GROUP_LIMIT, processes: int = 1):
+        processes = max(1, processes)
+        self.limits = {name: limit / processes for name, limit in (GROUP_LIMITS if limits is None else limits).items()}
+        self.default_limit = default_limit / processes
+        self._groups: Dict[str, _Group] = {}
+        self._groups_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._single_flight = SingleFlight()
+        self._local = threading.local()
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Run the requests made by this thread inside the block with `priority`"""
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def call(self, group: str, fn: Callable[..., Any], *args, priority: Optional[int] = None, coalesce_key: Optional[Hashable] = None, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` once the rate limit of `group` allows it"""
+        if priority is None:
+            priority = getattr(self._local, "priority", None)
+            if priority is None:
+                priority = self.INTERACTIVE
+
+        if coalesce_key is None:
+            return self._run(group, fn, args, kwargs, priority)
+
+        result, shared = self._single_flight.do_shared(
+            (group, coalesce_key),
+            lambda: self._run(group, fn, args, kwargs, priority)
+        )
+        if shared:
+            state = self._group(group)
+            with state.cond:
+                state.coalesced += 1
+        return result
+
+    def wrap(self, services: Any, priority: Optional[int] = None) -> 'ScheduledServices':
+        """Route the unary requests made through a Client's services object via this scheduler"""
+        return ScheduledServices(services, self, priority)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, in-flight requests and wait times per group"""
+        result = {}
+        with self._groups_lock:
+            groups = dict(self._groups)
+        for name, state in groups.items():
+            with state.cond:
+                result[name] = {
+                    "limit_per_minute": self.limits.get(name, self.default_limit),
+                    "queue_depth": len(state.queue),
+                    "in_flight": state.in_flight,
+                    "requests": state.requests,
+                    "coalesced": state.coalesced,
+                    "rate_limited": state.rate_limited,
+                    "wait_total": state.wait_total,
+                    "wait_max": state.wait_max,
+                    "wait_avg": state.wait_total / state.requests if state.requests else 0.0,
+                }
+        return result
+
+    def _group(self, name: str) -> _Group:
+        with self._groups_lock:
+            state = self._groups.get(name)
+            if state is None:
+                state = self._groups[name] = _Group(self.limits.get(name, self.default_limit))
+            return state
+
+    def _run(self, group: str, fn: Callable[..., Any], args, kwargs, priority: int) -> Any:
+        state = self._group(group)
+        ticket = (priority, next(self._sequence))
+        queued_at = time.monotonic()
+
+        with state.cond:
+            heapq.heappush(state.queue, ticket)
+            while True:
+                if state.queue[0] == ticket:
+                    delay = state.bucket.reserve()
+                    if not delay:
+                        heapq.heappop(state.queue)
+                        break
+                    state.cond.wait(delay)
+                else:
+                    state.cond.wait()
+
+            waited = time.monotonic() - queued_at
+            state.requests += 1
+            state.in_flight += 1
+            state.wait_total += waited
+            state.wait_max = max(state.wait_max, waited)
+            # The next request in line may be able to take a token right away
+            state.cond.notify_all()
+
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            code = _status_code(e)
+            if code is not None and getattr(code, "name", None) == "RESOURCE_EXHAUSTED":
+                reset = getattr(getattr(e, "metadata", None), "ratelimit_reset", None) or 1
+                logger.warning(f"Tinkoff API quota exhausted for {group}, pausing for {reset}s")
+                with state.cond:
+                    state.rate_limited += 1
+                    state.bucket.block(float(reset))
+            raise
+        finally:
+            with state.cond:
+                state.in_flight -= 1
+
+
+class _ScheduledService:
+    def __init__(self, service: Any, group: str, scheduler: RequestScheduler, priority: Optional[int]):
+        self._service = service
+        self._group = group
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def __getattr__(self, name: str):
+        method = getattr(self._service, name)
+        if not callable(method) or name.startswith("_"):
+            return method
+
+        coalesced = name.startswith(COALESCED_PREFIXES) or name in COALESCED_METHODS
+
+        def scheduled(*args, **kwargs):
+            coalesce_key = (name, repr(args), repr(sorted(kwargs.items()))) if coalesced else None
+            return self._scheduler.call(
+                self._group, method, *args,
+                priority=self._priority, coalesce_key=coalesce_key, **kwargs
+            )
+
+        return scheduled
+
+
+class ScheduledServices:
+    """Proxy of a tinkoff.invest Services object whose unary services go
+    through a RequestScheduler. Helper methods such as get_all_candles are
+    bound to the proxy, so the requests they make are scheduled too; streams
+    are passed through."""
+
+    def __init__(self, services: Any, scheduler: RequestScheduler, priority: Optional[int] = None):
+        self._services = services
+        self._scheduler = scheduler
+        self._priority = priority
+
+    def __getattr__(self, name: str):
+        if name in GROUP_LIMITS or name in self._scheduler.limits:
+            return _ScheduledService(getattr(self._services, name), name, self._scheduler, self._priority)
+
+        helper = getattr(type(self._services), name, None)
+        if inspect.isfunction(helper):
+            return helper.__get__(self)
+        return getattr(self._services, name)
+
+
+request_scheduler = RequestScheduler(processes=API_PROCESSES)
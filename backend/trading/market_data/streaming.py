@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Callable, Iterable, Optional, Set
+
+from tinkoff.invest import CandleInstrument, LastPriceInstrument, SubscriptionInterval
+
+from .instruments import _quotation_to_decimal
+
+logger = logging.getLogger("TinkoffProvider")
+
+# One-minute candles kept per instrument
+CANDLE_HISTORY = 24 * 60
+
+# Events buffered per subscriber before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class InstrumentState:
+    """Latest price and recent one-minute candles of one instrument"""
+
+    def __init__(self, figi: str, history: int = CANDLE_HISTORY):
+        self.figi = figi
+        self.price = None
+        self.price_time: Optional[float] = None
+        self.candles: deque = deque(maxlen=history)
+        self.updated_at: Optional[float] = None
+
+    def apply_price(self, price, price_time: float) -> bool:
+        if self.price_time is not None and price_time < self.price_time:
+            return False
+        self.price = price
+        self.price_time = price_time
+        self.updated_at = time.monotonic()
+        return True
+
+    def apply_candle(self, candle: Dict[str, Any]) -> bool:
+        # The stream sends the current candle again on every trade
+        if self.candles and self.candles[-1]["time"] == candle["time"]:
+            self.candles[-1] = candle
+        elif self.candles and self.candles[-1]["time"] > candle["time"]:
+            return False
+        else:
+            self.candles.append(candle)
+        self.updated_at = time.monotonic()
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.figi,
+            "price": self.price,
+            "time": self.price_time,
+            "candle": self.candles[-1] if self.candles else None
+        }
+
+
+class Subscription:
+    """Queue of stream events for one consumer running in an asyncio loop.
+
+    Events are delivered from the stream thread with call_soon_threadsafe;
+    a consumer that falls behind loses the oldest events rather than blocking
+    the stream.
+    """
+
+    def __init__(self, hub: 'MarketDataStreamHub', figis: Set[str], loop: asyncio.AbstractEventLoop, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.hub = hub
+        self.figis = figis
+        self.dropped = 0
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._maxsize = maxsize
+
+    async def get(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The consumer's loop is already closed
+            pass
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        if self._queue.qsize() >= self._maxsize:
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+
+class MarketDataStreamHub:
+    """Background market data stream shared by all watchers of the app.
+
+    `stream_factory` is a context manager factory yielding a
+    MarketDataStreamManager (`services.create_market_data_stream()`), or any
+    object with the same `last_price`/`candles` subscribe/unsubscribe API that
+    iterates over MarketDataResponse messages. Instruments are subscribed
+    while at least one watcher needs them; last prices and one-minute candles
+    are kept in memory and fanned out to subscribers. The stream reconnects
+    with exponential backoff and re-subscribes after failures.
+    """
+
+    def __init__(
+        self,
+        stream_factory: Callable[[], Any],
+        history: int = CANDLE_HISTORY,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self._stream_factory = stream_factory
+        self.history = history
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._states: Dict[str, InstrumentState] = {}
+        self._watchers: Dict[str, int] = {}
+        self._subscriptions: Set[Subscription] = set()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+        self._stream = None
+        self._subscribed: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def watched(self) -> Set[str]:
+        with self._lock:
+            return set(self._watchers)
+
+    def get_state(self, figi: str) -> Optional[InstrumentState]:
+        return self._states.get(figi)
+
+    def last_price(self, figi: str) -> Optional[Dict[str, Any]]:
+        """Streamed price of a watched instrument, None if none arrived yet"""
+        state = self._states.get(figi)
+        if state is None or state.price_time is None or figi not in self._subscribed:
+            return None
+        return {"symbol": figi, "price": state.price, "time": state.price_time}
+
+    def watch(self, figis: Iterable[str]) -> None:
+        """Keep `figis` subscribed until a matching unwatch()"""
+        added = []
+        with self._lock:
+            for figi in set(figis):
+                self._watchers[figi] = self._watchers.get(figi, 0) + 1
+                if self._watchers[figi] == 1:
+                    self._states.setdefault(figi, InstrumentState(figi, self.history))
+                    added.append(figi)
+        if added:
+            self._sync_subscriptions()
+        self.start()
+
+    def unwatch(self, figis: Iterable[str]) -> None:
+        removed = False
+        with self._lock:
+            for figi in set(figis):
+                count = self._watchers.get(figi, 0) - 1
+                if count > 0:
+                    self._watchers[figi] = count
+                elif figi in self._watchers:
+                    del self._watchers[figi]
+                    removed = True
+        if removed:
+            self._sync_subscriptions()
+
+    def subscribe(self, figis: Iterable[str], loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        """Watch `figis` and receive their updates; must be closed when done"""
+        subscription = Subscription(self, set(figis), loop or asyncio.get_event_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        self.watch(subscription.figis)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+        self.unwatch(subscription.figis)
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `listener(event)` from the stream thread for every update"""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running or not self._watchers:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="market-data-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._stop_stream()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def handle(self, response: Any) -> None:
+        """Apply one MarketDataResponse to the state and notify subscribers"""
+        last_price = getattr(response, "last_price", None)
+        if last_price is not None:
+            self._on_last_price(last_price)
+
+        candle = getattr(response, "candle", None)
+        if candle is not None:
+            self._on_candle(candle)
+
+    def _on_last_price(self, last_price: Any) -> None:
+        state = self._states.get(last_price.figi)
+        if state is None or last_price.time is None:
+            return
+        price = _quotation_to_decimal(last_price.price)
+        price_time = last_price.time.timestamp()
+        if state.apply_price(price, price_time):
+            self._publish({"type": "price", "symbol": last_price.figi, "price": price, "time": price_time})
+
+    def _on_candle(self, candle: Any) -> None:
+        state = self._states.get(candle.figi)
+        if state is None:
+            return
+        record = {
+            "time": candle.time.timestamp(),
+            "open": _quotation_to_decimal(candle.open),
+            "high": _quotation_to_decimal(candle.high),
+            "low": _quotation_to_decimal(candle.low),
+            "close": _quotation_to_decimal(candle.close),
+            "volume": candle.volume
+        }
+        if state.apply_candle(record):
+            self._publish(dict(record, type="candle", symbol=candle.figi))
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Market data stream listener failed")
+
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if event["symbol"] in s.figis]
+        for subscription in subscriptions:
+            subscription._deliver(event)
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            with self._lock:
+                # The thread is cleared under the same lock that saw nothing
+                # to watch, so a concurrent watch() either sees this thread
+                # running or starts a new one
+                if self._stop.is_set() or not self._watchers:
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    break
+            try:
+                with self._stream_factory() as stream:
+                    self._stream = stream
+                    self._subscribed = set()
+                    self._sync_subscriptions()
+                    logger.info("Market data stream connected")
+                    for response in stream:
+                        failures = 0
+                        self.handle(response)
+                        if self._stop.is_set():
+                            break
+                    # A stream closed by the server is retried with the same
+                    # backoff as a failed one instead of in a tight loop
+                    if not self._stop.is_set() and self.watched():
+                        failures += 1
+                        logger.warning(f"Market data stream closed by the server (attempt {failures})")
+            except Exception:
+                failures += 1
+                logger.exception(f"Market data stream failed (attempt {failures})")
+            finally:
+                self._stream = None
+                self._subscribed = set()
+
+            if failures:
+                self._stop.wait(min(self.backoff_max, self.backoff_base * 2 ** (failures - 1)))
+
+        logger.info("Market data stream stopped")
+
+    def _sync_subscriptions(self) -> None:
+        """Bring the live stream's subscriptions in line with the watched set"""
+        stream = self._stream
+        if stream is None:
+            return
+
+        with self._lock:
+            watched = set(self._watchers)
+            added = sorted(watched - self._subscribed)
+            removed = sorted(self._subscribed - watched)
+            self._subscribed = watched
+
+        try:
+            if added:
+                stream.last_price.subscribe([LastPriceInstrument(figi=figi) for figi in added])
+                stream.candles.subscribe([
+                    CandleInstrument(figi=figi, interval=SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_MINUTE)
+                    for figi in added
+                ])
+            if removed:
+                stream.last_price.unsubscribe([LastPriceInstrument(figi=figi) for figi in removed])
+                stream.candles.unsubscribe([
+                    CandleInstrument(figi=figi, interval=SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_MINUTE)
+                    for figi in removed
+                ])
+        except Exception:
+            logger.exception("Failed to update market data stream subscriptions")
+
+        if not watched:
+            self._stop_stream()
+
+    def _stop_stream(self) -> None:
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.stop()
+            except Exception:
+                logger.exception("Failed to stop market data stream")
@@ -1,16 +1,23 @@
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Any, Optional, Union
 import uuid
+from contextlib import contextmanager
 
-from tinkoff.invest import Client, HistoricCandle, Quotation, SecurityTradingStatus, MoneyValue, InstrumentIdType, GetOperationsByCursorRequest
+from tinkoff.invest import Client, HistoricCandle, Quotation, MoneyValue, GetOperationsByCursorRequest
 from tinkoff.invest.constants import INVEST_GRPC_API, INVEST_GRPC_API_SANDBOX
 from tinkoff.invest.sandbox.client import SandboxClient
 
-from tinkoff.invest.services import InstrumentsService
 from tinkoff.invest.utils import quotation_to_decimal, decimal_to_quotation
 from .base_provider import BaseMarketDataProvider
+from .client_pool import TinkoffClientPool
+from .instruments import InstrumentRegistry
+from .streaming import MarketDataStreamHub
+from .rolling_stats import RollingWindowStats
+from .scheduler import RequestScheduler, request_scheduler
 
 logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
@@ -20,6 +27,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TinkoffProvider")
 
+# GetOperationsByCursor page size, the API maximum
+OPERATIONS_PAGE_SIZE = 1000
+
+# FIGIs per GetLastPrices call
+LAST_PRICES_BATCH_SIZE = 500
+
 def quotation_to_decimal(quotation: Optional[Quotation]) -> Optional[Decimal]:
     """Convert Quotation to Decimal"""
     if quotation is None:
@@ -30,20 +43,67 @@ def quotation_to_decimal(quotation: Optional[Quotation]) -> Optional[Decimal]:
 class TinkoffMarketDataProvider(BaseMarketDataProvider):
     """Tinkoff market data provider implementation"""
     
-    def __init__(self, token: str, sandbox: bool = True):
+    def __init__(
+        self,
+        token: str,
+        sandbox: bool = True,
+        pool_size: int = 1,
+        instruments_cache: Optional[str] = None,
+        instruments_refresh_interval: float = 6 * 60 * 60,
+        portfolio_ttl: float = 5.0,
+        price_ttl: float = 1.0,
+        stats_ttl: float = 60.0,
+        scheduler: Optional[RequestScheduler] = None
+    ):
         logger.debug(f"Initializing TinkoffMarketDataProvider (sandbox={sandbox})")
         self.token = token
         self.sandbox = sandbox
         self.account_id = None
         self._connected = False
+        self._pool = TinkoffClientPool(self._create_client, size=pool_size)
+        self.scheduler = scheduler or request_scheduler
+        self.instruments = InstrumentRegistry(
+            self._get_client,
+            cache_path=instruments_cache,
+            refresh_interval=instruments_refresh_interval
+        )
+        self.portfolio_ttl = portfolio_ttl
+        self._portfolio_cache: Dict[str, Any] = {}
+        self._portfolio_lock = threading.Lock()
+        self._portfolio_account_locks: Dict[str, threading.Lock] = {}
+        self.price_ttl = price_ttl
+        self._price_cache: Dict[str, Any] = {}
+        self._price_fetch_lock = threading.Lock()
+        self.stream = MarketDataStreamHub(self._open_market_data_stream)
+        self.stream.add_listener(self._update_daily_stats)
+        self.stats_ttl = stats_ttl
+        self._daily_stats: Dict[str, RollingWindowStats] = {}
+        self._stats_lock = threading.Lock()
+        self._stats_symbol_locks: Dict[str, threading.Lock] = {}
     
-    def _get_client(self):
-        """Get a fresh client instance"""
+    def _create_client(self):
+        """Create an unopened client instance for the pool"""
         if self.sandbox:
             return SandboxClient(self.token)
         else:
             return Client(self.token)
     
+    @contextmanager
+    def _get_client(self):
+        """Borrow a long-lived client from the channel pool, rate limited by the scheduler"""
+        with self._pool.client() as services:
+            yield self.scheduler.wrap(services)
+    
+    @contextmanager
+    def _open_market_data_stream(self):
+        """Open a bidirectional market data stream over a pooled channel"""
+        with self._get_client() as client:
+            stream = client.create_market_data_stream()
+            try:
+                yield stream
+            finally:
+                stream.stop()
+    
     def get_sandbox_accounts(self) -> List[Dict[str, Any]]:
         """Get available sandbox accounts"""
         logger.info("Getting available sandbox accounts")
@@ -78,7 +138,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
         logger.info(f"Connecting to Tinkoff API (sandbox={self.sandbox}, account_name={account_name})")
         try:
             if self.sandbox:
-                with SandboxClient(self.token) as client:
+                with self._get_client() as client:
                     try:
                         existing_accounts = client.sandbox.get_sandbox_accounts()
                         logger.info(f"Found {len(existing_accounts.accounts)} existing sandbox accounts")
@@ -119,7 +179,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
                     except Exception:
                         logger.exception("Error verifying sandbox accounts")
             else:
-                with Client(self.token) as client:
+                with self._get_client() as client:
                     logger.warning("Working with real account is not implemented yet")
                     accounts_response = client.users.get_accounts()
                     logger.info(f"Found {len(accounts_response.accounts)} real accounts")
@@ -138,6 +198,12 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
         try:
             self._connected = False
             self.account_id = None
+            self.stream.stop()
+            self.instruments.stop()
+            self._pool.close()
+            self.invalidate_portfolio()
+            self._price_cache.clear()
+            self._daily_stats.clear()
             logger.info("Successfully disconnected from Tinkoff API (accounts preserved)")
             return True
         except Exception:
@@ -152,91 +218,160 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
     def get_price(self, symbol: str) -> Dict[str, Any]:
         """Get current price for a symbol (figi)"""
         #logger.info(f"Getting price for symbol: {symbol}")
+        price_data = self.get_prices([symbol]).get(symbol)
+        if price_data is None:
+            logger.warning(f"No price data available for symbol: {symbol}")
+            raise Exception(f"No price data for {symbol}")
+        return price_data
+    
+    def get_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get current prices for several symbols (figis) with one GetLastPrices call
+        
+        Instruments watched by the market data stream are served from it.
+        Other prices are memoized per FIGI for `price_ttl` seconds. Concurrent
+        callers wait for an in-flight request instead of issuing their own, so
+        pollers asking for the same watchlist share one RPC. Symbols without
+        price data are left out of the result.
+        """
         if not self.is_connected():
             logger.error("Not connected to Tinkoff API")
             raise Exception("Not connected to Tinkoff API")
         
+        symbols = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+        result, missing = self._cached_prices(symbols)
+        if not missing:
+            return result
+        
+        with self._price_fetch_lock:
+            # Another caller may have fetched these while we were waiting
+            cached, missing = self._cached_prices(missing)
+            result.update(cached)
+            if missing:
+                result.update(self._fetch_prices(missing))
+        
+        return result
+    
+    def _cached_prices(self, symbols: List[str]):
+        now = time.monotonic()
+        cached, missing = {}, []
+        for symbol in symbols:
+            streamed = self.stream.last_price(symbol)
+            if streamed is not None:
+                cached[symbol] = streamed
+                continue
+            entry = self._price_cache.get(symbol)
+            if entry is not None and now < entry[0]:
+                if entry[1] is not None:
+                    cached[symbol] = entry[1]
+            else:
+                missing.append(symbol)
+        return cached, missing
+    
+    def _fetch_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        result = {}
         try:
             with self._get_client() as client:
-                response = client.market_data.get_last_prices(figi=[symbol])
-                
-                if not response.last_prices:
-                    logger.warning(f"No price data available for symbol: {symbol}")
-                    raise Exception(f"No price data for {symbol}")
-                
-                price_data = response.last_prices[0]
-                price_value = quotation_to_decimal(price_data.price)
-                time_value = price_data.time.timestamp()
-                
-                #logger.info(f"Retrieved price for {symbol}: {price_value}")
-                #logger.debug(f"Price timestamp: {datetime.fromtimestamp(time_value)}")
-                
-                return {
-                    "symbol": symbol,
-                    "price": price_value,
-                    "time": time_value
-                }
+                for start in range(0, len(symbols), LAST_PRICES_BATCH_SIZE):
+                    response = client.market_data.get_last_prices(figi=symbols[start:start + LAST_PRICES_BATCH_SIZE])
+                    for price_data in response.last_prices:
+                        if price_data.time is None:
+                            continue
+                        result[price_data.figi] = {
+                            "symbol": price_data.figi,
+                            "price": quotation_to_decimal(price_data.price),
+                            "time": price_data.time.timestamp()
+                        }
         except Exception as e:
-            logger.error(f"Failed to get price for {symbol}: {str(e)}", exc_info=True)
+            logger.error(f"Failed to get prices for {len(symbols)} symbols: {str(e)}", exc_info=True)
             raise
+        
+        # Symbols without a price are remembered too, so they are not re-requested every poll
+        expires_at = time.monotonic() + self.price_ttl
+        for symbol in symbols:
+            self._price_cache[symbol] = (expires_at, result.get(symbol))
+        
+        return result
     
     def get_daily_stats(self, symbol: str) -> Dict[str, Any]:
-        """Get 24h statistics for a symbol (figi)"""
+        """Get 24h statistics for a symbol (figi)
+        
+        Stats are served from an in-memory rolling window that the market data
+        stream keeps current for watched instruments. The window is rebuilt
+        from candles only when no update has arrived for `stats_ttl` seconds.
+        """
         logger.info(f"Getting 24h statistics for symbol: {symbol}")
         if not self.is_connected():
             logger.error("Not connected to Tinkoff API")
             raise Exception("Not connected to Tinkoff API")
         
+        with self._stats_lock:
+            symbol_lock = self._stats_symbol_locks.setdefault(symbol, threading.Lock())
+        
+        with symbol_lock:
+            stats = self._daily_stats.get(symbol)
+            if stats is None or stats.updated_at is None or time.monotonic() - stats.updated_at >= self.stats_ttl:
+                stats = self._load_daily_stats(symbol)
+                self._daily_stats[symbol] = stats
+            
+            result = stats.stats()
+        
+        if result is None:
+            logger.warning(f"No candle data available for symbol: {symbol}")
+            raise Exception(f"No candle data for {symbol}")
+        
+        logger.info(f"Statistics for {symbol}: Open={result['openPrice']}, Close={result['closePrice']}, Change={result['priceChangePercent']:.2f}%")
+        return result
+    
+    def _load_daily_stats(self, symbol: str) -> RollingWindowStats:
+        from tinkoff.invest.schemas import CandleInterval
+        
+        # Watched instruments are seeded with one-minute candles that the
+        # stream then keeps current. Polled ones are rebuilt every stats_ttl,
+        # so they are seeded with 24 hourly candles instead of 1440 one-minute
+        # ones; their window start moves in whole hours.
+        if symbol in self.stream.watched():
+            interval = CandleInterval.CANDLE_INTERVAL_1_MIN
+        else:
+            interval = CandleInterval.CANDLE_INTERVAL_HOUR
+        
         try:
             with self._get_client() as client:
                 from_ = datetime.now() - timedelta(days=1)
                 to = datetime.now()
                 
-                from tinkoff.invest.utils import now
-                from tinkoff.invest.schemas import CandleInterval
-                
                 logger.debug(f"Requesting candles for FIGI {symbol} from {from_} to {to}")
                 response = client.market_data.get_candles(
                     figi=symbol,
                     from_=from_,
                     to=to,
-                    interval=CandleInterval.CANDLE_INTERVAL_1_HOUR
+                    interval=interval
                 )
-                
-                candles = response.candles
-                
-                if not candles:
-                    logger.warning(f"No candle data available for symbol: {symbol}")
-                    raise Exception(f"No candle data for {symbol}")
-                
-                logger.debug(f"Retrieved {len(candles)} candles for {symbol}")
-                
-                open_price = quotation_to_decimal(candles[0].open)
-                close_price = quotation_to_decimal(candles[-1].close)
-                
-                high_prices = [quotation_to_decimal(c.high) for c in candles]
-                low_prices = [quotation_to_decimal(c.low) for c in candles]
-                
-                volume = sum(c.volume for c in candles)
-                
-                price_change = close_price - open_price
-                price_change_percent = ((close_price - open_price) / open_price) * 100 if open_price else 0
-                
-                logger.info(f"Statistics for {symbol}: Open={open_price}, Close={close_price}, Change={price_change_percent:.2f}%")
-                
-                return {
-                    "symbol": symbol,
-                    "openPrice": open_price,
-                    "closePrice": close_price,
-                    "highPrice": max(high_prices),
-                    "lowPrice": min(low_prices),
-                    "volume": volume,
-                    "priceChange": price_change,
-                    "priceChangePercent": price_change_percent
-                }
         except Exception as e:
             logger.error(f"Failed to get daily stats for {symbol}: {str(e)}", exc_info=True)
             raise
+        
+        logger.debug(f"Retrieved {len(response.candles)} candles for {symbol}")
+        stats = RollingWindowStats(symbol)
+        for candle in response.candles:
+            stats.apply_candle(
+                candle.time.timestamp(),
+                quotation_to_decimal(candle.open),
+                quotation_to_decimal(candle.high),
+                quotation_to_decimal(candle.low),
+                quotation_to_decimal(candle.close),
+                candle.volume
+            )
+        return stats
+    
+    def _update_daily_stats(self, event: Dict[str, Any]) -> None:
+        """Market data stream listener keeping rolling 24h stats current"""
+        stats = self._daily_stats.get(event["symbol"])
+        if stats is None:
+            return
+        if event["type"] == "candle":
+            stats.apply_candle(event["time"], event["open"], event["high"], event["low"], event["close"], event["volume"])
+        elif event["type"] == "price":
+            stats.apply_trade(event["time"], event["price"])
     
     def get_time(self) -> Dict[str, Any]:
         """Get time"""
@@ -293,46 +428,14 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
             raise Exception("Not connected to Tinkoff API")
         
         try:
-            with self._get_client() as client:
-                instruments: InstrumentsService = client.instruments
-                tickers = []
-                
-                logger.debug(f"Searching for ticker {ticker} in shares")
-                method_instruments = instruments.shares().instruments
-                logger.debug(f"Found {len(method_instruments)} instruments in shares")
-	
-                for item in method_instruments:
-                    tickers.append({
-                        "name": item.name,
-                        "ticker": item.ticker,
-                        "class_code": item.class_code,
-                        "figi": item.figi,
-                        "uid": item.uid,
-                        "type": "shares",
-						"min_price_increment": quotation_to_decimal(item.min_price_increment),
-						"scale": 9 - len(str(item.min_price_increment.nano)) + 1,
-						"lot": item.lot,
-						"trading_status": str(SecurityTradingStatus(item.trading_status).name),
-						"api_trade_available_flag": item.api_trade_available_flag,
-						"currency": item.currency,
-						"exchange": item.exchange,
-						"buy_available_flag": item.buy_available_flag,
-						"sell_available_flag": item.sell_available_flag,
-						"short_enabled_flag": item.short_enabled_flag,
-						"klong": quotation_to_decimal(item.klong),
-						"kshort": quotation_to_decimal(item.kshort),
-					})
+            ticker_info = self.instruments.get_by_ticker(ticker, class_code)
             
-                logger.debug(f"Collected information for {len(tickers)} total instruments")
-                
-                ticker_info = next((t for t in tickers if t["ticker"] == ticker), None)
-                
-                if not ticker_info:
-                    logger.warning(f"No instrument found with ticker: {ticker}")
-                    raise Exception(f"No instrument found with ticker: {ticker}")
-                
-                logger.info(f"Found instrument for ticker {ticker}: FIGI={ticker_info['figi']}, Type={ticker_info['type']}")
-                return ticker_info
+            if not ticker_info:
+                logger.warning(f"No instrument found with ticker: {ticker}")
+                raise Exception(f"No instrument found with ticker: {ticker}")
+            
+            logger.info(f"Found instrument for ticker {ticker}: FIGI={ticker_info['figi']}, Type={ticker_info['type']}")
+            return ticker_info
         except Exception as e:
             logger.error(f"Failed to get FIGI for ticker {ticker}: {str(e)}", exc_info=True)
             raise
@@ -345,19 +448,14 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
             raise Exception("Not connected to Tinkoff API")
         
         try:
-            with self._get_client() as client:
-                instrument_response = client.instruments.get_instrument_by(
-                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-                        id=figi
-                )
-                instrument = instrument_response.instrument
-                   
-                if not instrument:
-                    logger.warning(f"No instrument found with figi: {figi}")
-                    raise Exception(f"No instrument found with figi: {figi}")
-                
-                logger.info(f"Found instrument for figi {figi}: {instrument.ticker}")
-                return instrument.ticker
+            instrument = self.instruments.get_by_figi(figi)
+               
+            if not instrument:
+                logger.warning(f"No instrument found with figi: {figi}")
+                raise Exception(f"No instrument found with figi: {figi}")
+            
+            logger.info(f"Found instrument for figi {figi}: {instrument['ticker']}")
+            return instrument["ticker"]
         except Exception as e:
             logger.error(f"Failed to get ticker for FIGI {figi}: {str(e)}", exc_info=True)
             raise
@@ -370,19 +468,14 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
             raise Exception("Not connected to Tinkoff API")
         
         try:
-            with self._get_client() as client:
-                instrument_response = client.instruments.get_instrument_by(
-                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-                        id=figi
-                )
-                instrument = instrument_response.instrument
-                   
-                if not instrument:
-                    logger.warning(f"No instrument found with figi: {figi}")
-                    raise Exception(f"No instrument found with figi: {figi}")
-                
-                logger.info(f"Found instrument for figi {figi}: {instrument.ticker}")
-                return instrument.name
+            instrument = self.instruments.get_by_figi(figi)
+               
+            if not instrument:
+                logger.warning(f"No instrument found with figi: {figi}")
+                raise Exception(f"No instrument found with figi: {figi}")
+            
+            logger.info(f"Found instrument for figi {figi}: {instrument['ticker']}")
+            return instrument["name"]
         except Exception as e:
             logger.error(f"Failed to get name for FIGI {figi}: {str(e)}", exc_info=True)
             raise
@@ -396,9 +489,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
         try:
             logger.info(f"Setting sandbox balance: {money} {currency}")
             
-            with SandboxClient(self.token) as client:
-                logger.debug(f"Created fresh sandbox client for balance setting")
-                
+            with self._get_client() as client:
                 money_decimal = Decimal(money)
                 money_quotation = decimal_to_quotation(money_decimal)
                 logger.debug(f"Converted {money} to quotation: {money_quotation}")
@@ -413,6 +504,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
                     )
                 )
                 logger.info(f"Successfully set sandbox balance to {money} {currency}")
+                self.invalidate_portfolio()
                 
                 return True
         except Exception as e:
@@ -420,17 +512,42 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
             raise
     
     def get_portfolio(self) -> Dict[str, Any]:
-        """Get portfolio data for the current account"""
-        logger.info(f"Getting portfolio for account: {self.account_id}")
+        """Get portfolio data for the current account
+        
+        The processed snapshot is memoized per account for `portfolio_ttl`
+        seconds, and concurrent callers for the same account share one fetch.
+        The returned dict is shared between callers and must not be modified.
+        """
         if not self.is_connected():
             logger.error("Not connected to Tinkoff API")
             raise Exception("Not connected to Tinkoff API")
         
+        account_id = self.account_id
+        with self._portfolio_lock:
+            account_lock = self._portfolio_account_locks.setdefault(account_id, threading.Lock())
+        
+        with account_lock:
+            cached = self._portfolio_cache.get(account_id)
+            if cached is not None and time.monotonic() < cached[0]:
+                logger.debug(f"Using cached portfolio for account: {account_id}")
+                return cached[1]
+            
+            result = self._fetch_portfolio(account_id)
+            self._portfolio_cache[account_id] = (time.monotonic() + self.portfolio_ttl, result)
+            return result
+    
+    def invalidate_portfolio(self) -> None:
+        """Drop memoized portfolio snapshots, e.g. after an order"""
+        self._portfolio_cache.clear()
+    
+    def _fetch_portfolio(self, account_id: str) -> Dict[str, Any]:
+        logger.info(f"Getting portfolio for account: {account_id}")
+        
         try:
             with self._get_client() as client:
-                logger.debug(f"Requesting portfolio data for account {self.account_id}")
+                logger.debug(f"Requesting portfolio data for account {account_id}")
                 
-                response = client.operations.get_portfolio(account_id=self.account_id)
+                response = client.operations.get_portfolio(account_id=account_id)
                 
                 logger.debug("Processing portfolio summary data")
                 result = {
@@ -447,21 +564,23 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
                 }
                 
                 logger.debug(f"Processing {len(response.positions)} portfolio positions")
+                instruments = self.instruments.resolve_figis(position.figi for position in response.positions)
+                
                 for position in response.positions:
                     figi = position.figi
                     logger.debug(f"Processing position: {figi}")
                     
-                    instrument_response = client.instruments.get_instrument_by(
-                        id_type=InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI,
-                        id=figi
-                    )
-                    instrument = instrument_response.instrument
+                    instrument = instruments.get(figi)
+                    if instrument is None:
+                        logger.warning(f"No instrument found with figi: {figi}")
                     
                     pos_data = {
                         "figi": figi,
-                        "ticker": instrument.ticker,
-                        "name": instrument.name,
-                        "instrument_type": self._get_instrument_type_name(instrument.instrument_type),
+                        "ticker": instrument["ticker"] if instrument else None,
+                        "name": instrument["name"] if instrument else None,
+                        "instrument_type": self._get_instrument_type_name(
+                            instrument["instrument_type"] if instrument else position.instrument_type
+                        ),
                         "quantity": quotation_to_decimal(position.quantity),
                         "average_position_price": self._process_money_value(position.average_position_price),
                         "current_price": self._process_money_value(position.current_price),
@@ -587,7 +706,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
         
         return operation_types.get(str(operation_type), f"Неизвестная операция ({operation_type})")
 
-    def get_operations_by_cursor(self, instrument_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_operations_by_cursor(self, instrument_id: str, limit: int = OPERATIONS_PAGE_SIZE) -> List[Dict[str, Any]]:
         """Fetch operations by cursor for a given instrument"""
         logger.info(f"Fetching operations for instrument: {instrument_id}")
         if not self.is_connected():
@@ -616,15 +735,18 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
                     
             logger.info(f"Fetched {len(all_operations)} operations")
             
+            instruments = self.instruments.resolve_figis(op.figi for op in all_operations)
+            
             result = []
             for op in all_operations:
+                instrument = instruments.get(op.figi)
                 operation_dict = {
                     "id": op.id,
                     "date": op.date.isoformat(),
                     "type": op.type,
                     "operationTypeDescription": op.description,
-                    "name": self.get_name_by_figi(op.figi),
-                    "ticker": self.get_ticker_by_figi(op.figi),
+                    "name": instrument["name"] if instrument else None,
+                    "ticker": instrument["ticker"] if instrument else None,
                     "figi": op.figi,
                     "quantity": str(op.quantity),
                     "state": str(op.state),
@@ -680,6 +802,7 @@ class TinkoffMarketDataProvider(BaseMarketDataProvider):
                     order_type=order_type_enum
                 )
                 logger.info(f"Sandbox order placed: {result}")
+                self.invalidate_portfolio()
                 return {
                     'order_id': result.order_id,
                     'execution_report_status': str(result.execution_report_status),
@@ -1,6 +1,9 @@
+import uuid
+
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class BaseDateModel(models.Model):
@@ -28,3 +31,37 @@ class Position(BaseDateModel):
 class Target(models.Model):
     position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='targets')
     value = models.FloatField(validators=[MinValueValidator(0)])
+
+
+class BacktestJob(BaseDateModel):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    PENDING_STATUSES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='backtest_jobs')
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    params = models.JSONField(encoder=JSONEncoder)
+    progress = models.FloatField(default=0)
+    result = models.JSONField(encoder=JSONEncoder, null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    trace = models.TextField(blank=True, default='')
+
+    worker = models.CharField(max_length=128, blank=True, default='')
+    started_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+    expires_date = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.id} ({self.status})'
@@ -1 +1,1102 @@
-from django.test import TestCase
+import asyncio
+import json
+import math
+import queue
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import grpc
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from tinkoff.invest import CandleInterval, InstrumentIdType, RequestError
+
+from . import backtests
+from .api import analysis, views
+from .backtests import runner, worker
+from .api.stream import MarketDataEventStream
+from .indicators import IndicatorEngine, IndicatorCache, INCREMENTAL_INDICATORS, indicator_from_state, series_to_pairs
+from .market_data.candles import CandleSeries
+from .market_data.client_pool import TinkoffClientPool
+from .market_data.instruments import InstrumentRegistry
+from .market_data.resample import MOEX_TIMEZONE, parse_timeframe, resample
+from .market_data.rolling_stats import DAY, RollingWindowStats
+from .market_data import scheduler as scheduler_module
+from .market_data.scheduler import RequestScheduler
+from .market_data.streaming import MarketDataStreamHub
+from .market_data.tinkoff_provider import TinkoffMarketDataProvider
+from .models import BacktestJob
+
+
+def _rows(closes, volumes=None):
+    volumes = volumes or [100] * len(closes)
+    return [
+        {
+            "datetime": f"2024-01-{i + 1:02d}T00:00:00+00:00",
+            "open": close,
+            "high": close + 1,
+            "low": close - 1,
+            "close": close,
+            "volume": volume,
+            "is_complete": True
+        }
+        for i, (close, volume) in enumerate(zip(closes, volumes))
+    ]
+
+
+class IndicatorEngineTests(SimpleTestCase):
+    closes = [10.0, 11.0, 12.5, 12.0, 11.5, 13.0, 14.0, 13.5, 15.0, 16.0, 15.5, 17.0]
+
+    def setUp(self):
+        self.data = _rows(self.closes)
+        self.engine = IndicatorEngine.from_rows(self.data)
+
+    def test_sma_matches_window_average(self):
+        values = self.engine.sma(3)
+        self.assertTrue(math.isnan(values[1]))
+        for i in range(2, len(self.closes)):
+            self.assertAlmostEqual(values[i], sum(self.closes[i - 2:i + 1]) / 3)
+
+    def test_ema_is_seeded_with_sma(self):
+        values = self.engine.ema(4)
+        expected = sum(self.closes[:4]) / 4
+        self.assertAlmostEqual(values[3], expected)
+        expected = (self.closes[4] - expected) * (2 / 5) + expected
+        self.assertAlmostEqual(values[4], expected)
+
+    def test_not_enough_data_returns_none(self):
+        self.assertIsNone(self.engine.sma(50))
+        self.assertIsNone(self.engine.macd(12, 26, 9))
+        self.assertEqual(series_to_pairs([], None), [])
+
+    def test_stochastic_and_williams_flat_range(self):
+        engine = IndicatorEngine([5.0] * 5, high=[5.0] * 5, low=[5.0] * 5)
+        self.assertEqual(engine.stochastic(3, 2)["k_line"][2], 50)
+        self.assertEqual(engine.williams_r(3)[2], -50)
+
+    def test_obv_and_vwap(self):
+        engine = IndicatorEngine([1.0, 2.0, 2.0, 1.0], volume=[10, 20, 30, 40])
+        self.assertEqual(engine.obv().tolist(), [0, 20, 20, -20])
+
+        vwap = IndicatorEngine([1.0, 2.0], volume=[0, 10]).vwap()
+        self.assertTrue(math.isnan(vwap[0]))
+        self.assertAlmostEqual(vwap[1], 2.0)
+
+    def test_rolling_kernels_match_window_reductions(self):
+        from numpy.lib.stride_tricks import sliding_window_view
+        from .indicators import engine as engine_module
+
+        values = 250 + np.random.default_rng(5).normal(0, 3, 1000).cumsum()
+        values[[10, 500]] = np.nan
+        for window in (1, 7, 64, 1000):
+            windows = sliding_window_view(values, window)
+            for kernel, reduction in ((engine_module._rolling_mean, windows.mean), (engine_module._rolling_std, windows.std),
+                                      (engine_module._rolling_max, windows.max), (engine_module._rolling_min, windows.min)):
+                result = kernel(values, window)
+                self.assertTrue(np.isnan(result[:window - 1]).all())
+                np.testing.assert_allclose(result[window - 1:], reduction(axis=1), rtol=1e-9, atol=1e-9)
+
+    def test_series_to_pairs_replaces_nan(self):
+        pairs = series_to_pairs([row["datetime"] for row in self.data], self.engine.sma(2))
+        self.assertIsNone(pairs[0][1])
+        self.assertEqual(pairs[1][0], self.data[1]["datetime"])
+        self.assertAlmostEqual(pairs[1][1], 10.5)
+
+
+def _quotation(value):
+    units = int(value)
+    return SimpleNamespace(units=units, nano=round((value - units) * 1_000_000_000))
+
+
+class CandleSeriesTests(SimpleTestCase):
+    def setUp(self):
+        self.candles = [
+            SimpleNamespace(
+                time=datetime(2024, 1, day, 7, tzinfo=timezone.utc),
+                open=_quotation(100.5), high=_quotation(101.25),
+                low=_quotation(99.75), close=_quotation(100.0 + day),
+                volume=1000 * day, is_complete=day < 3
+            )
+            for day in (1, 2, 3)
+        ]
+
+    def test_from_historic_candles_builds_columns(self):
+        series = CandleSeries.from_historic_candles(iter(self.candles))
+
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.close.dtype.name, "float64")
+        self.assertEqual(series.volume.tolist(), [1000, 2000, 3000])
+        self.assertEqual(series.is_complete.tolist(), [True, True, False])
+        self.assertEqual(series.nbytes, 3 * 49)
+
+    def test_to_rows_matches_candle_format(self):
+        rows = CandleSeries.from_historic_candles(self.candles).to_rows()
+
+        self.assertEqual(rows[0], {
+            'datetime': self.candles[0].time.isoformat(),
+            'open': 100.5,
+            'high': 101.25,
+            'low': 99.75,
+            'close': 101.0,
+            'volume': 1000,
+            'is_complete': True
+        })
+
+    def test_slice_and_engine(self):
+        series = CandleSeries.from_historic_candles(self.candles)[1:]
+        engine = IndicatorEngine.from_series(series)
+
+        self.assertEqual(len(series), 2)
+        self.assertAlmostEqual(engine.sma(2)[1], 102.5)
+        self.assertFalse(CandleSeries.empty())
+
+
+def _series(closes, complete):
+    return CandleSeries(
+        [i * 60 for i in range(len(closes))], closes, [close + 1 for close in closes],
+        [close - 1 for close in closes], closes, [100] * len(closes),
+        [i < complete for i in range(len(closes))]
+    )
+
+
+class IndicatorCacheTests(SimpleTestCase):
+    closes = [10.0 + (i % 7) * 0.5 + i * 0.1 for i in range(60)]
+
+    def test_matches_engine_when_tail_changes(self):
+        cache = IndicatorCache(tail_ttl=0)
+        for size, complete in ((40, 39), (40, 39), (45, 44), (60, 60)):
+            series = _series(self.closes[:size], complete)
+            cached = cache.bind(("FIGI", "1day", 0, None), series)
+            engine = IndicatorEngine.from_series(series)
+
+            # Window indicators of the tail are computed from a slice of the
+            # candles, their cumulative sums round differently in the last bits
+            np.testing.assert_allclose(cached.sma(5), engine.sma(5), rtol=1e-12)
+            self.assertTrue(np.array_equal(cached.rsi(14), engine.rsi(14), equal_nan=True))
+            stochastic = cached.stochastic(14, 3)
+            np.testing.assert_allclose(stochastic["d_line"], engine.stochastic(14, 3)["d_line"], rtol=1e-12)
+
+            self.assertTrue(np.array_equal(cached.obv(), engine.obv()))
+            macd = cached.macd(12, 26, 9)
+            self.assertTrue(np.array_equal(macd["signal"], engine.macd(12, 26, 9)["signal"], equal_nan=True))
+
+        self.assertEqual(cache.misses, 5)
+        self.assertEqual(cache.partial_hits, 15)
+
+    def test_closed_series_is_served_from_cache(self):
+        cache = IndicatorCache()
+        series = _series(self.closes, len(self.closes))
+        first = cache.bind(("FIGI", "1day", 0, None), series).ema(10)
+        second = cache.bind(("FIGI", "1day", 0, None), series).ema(10)
+
+        self.assertTrue(np.array_equal(first, second, equal_nan=True))
+        self.assertFalse(second.flags.writeable)
+        self.assertEqual(cache.hits, 1)
+
+    def test_evicts_least_recently_used_over_budget(self):
+        series = _series(self.closes, len(self.closes))
+        cache = IndicatorCache(max_bytes=series.close.nbytes * 2)
+        for figi in ("A", "B", "C"):
+            cache.bind((figi, "1day", 0, None), series).sma(5)
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+
+class IncrementalIndicatorTests(SimpleTestCase):
+    closes = [10.0 + (i % 5) * 0.7 - (i % 3) * 0.4 + i * 0.05 for i in range(80)]
+    params = {
+        'sma': (10,), 'ema': (10,), 'macd': (12, 26, 9), 'rsi': (14,), 'obv': (), 'vwap': (),
+        'bollinger_bands': (20, 2), 'stochastic': (14, 3), 'williams_r': (14,)
+    }
+
+    def _assert_same(self, expected, actual):
+        if isinstance(expected, dict):
+            for name in expected:
+                self._assert_same(expected[name], actual[name])
+            return
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+    def test_resumed_indicators_match_engine(self):
+        series = _series(self.closes, len(self.closes))
+        engine = IndicatorEngine.from_series(series)
+
+        for name, params in self.params.items():
+            indicator = INCREMENTAL_INDICATORS[name](*params)
+            parts = []
+            for start, end in ((0, 1), (1, 30), (30, 31), (31, 80)):
+                # Round trip through JSON between batches, as a persisted state would
+                indicator = indicator_from_state(json.loads(json.dumps(indicator.state_dict())))
+                parts.append(indicator.extend(series[start:end]))
+
+            if isinstance(parts[0], dict):
+                actual = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+            else:
+                actual = np.concatenate(parts)
+            with self.subTest(indicator=name):
+                self._assert_same(getattr(engine, name)(*params), actual)
+
+    def test_update_returns_latest_value(self):
+        ema = INCREMENTAL_INDICATORS['ema'](3)
+        self.assertTrue(math.isnan(ema.update(1.0)))
+        self.assertTrue(math.isnan(ema.update(2.0)))
+        self.assertEqual(ema.update(3.0), 2.0)
+        self.assertEqual(ema.update(4.0), 3.0)
+
+
+class _FakeRpcError(Exception):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+class _FakeClient:
+    def __init__(self, log, fail=False):
+        self.log = log
+        self.fail = fail
+
+    def __enter__(self):
+        if self.fail:
+            raise _FakeRpcError("connection refused")
+        self.log.append("open")
+        return self
+
+    def __exit__(self, *args):
+        self.log.append("close")
+
+
+class TinkoffClientPoolTests(SimpleTestCase):
+    def test_reuses_channel_until_closed(self):
+        log = []
+        pool = TinkoffClientPool(lambda: _FakeClient(log), health_check=lambda services: None)
+
+        for _ in range(3):
+            with pool.client() as client:
+                self.assertIsInstance(client, _FakeClient)
+        pool.close()
+
+        self.assertEqual(log, ["open", "close"])
+
+    def test_reconnects_after_unavailable_with_backoff(self):
+        log = []
+        failures = [True, False]
+        pool = TinkoffClientPool(
+            lambda: _FakeClient(log, fail=failures.pop(0) if failures else False),
+            backoff_base=60, health_check=lambda services: None
+        )
+
+        with self.assertRaises(_FakeRpcError):
+            with pool.client():
+                pass
+        with self.assertRaises(ConnectionError):
+            with pool.client():
+                pass
+
+        pool.close()
+        with self.assertRaises(_FakeRpcError):
+            with pool.client():
+                raise _FakeRpcError("stream reset")
+        with pool.client():
+            pass
+
+        self.assertEqual(log, ["open", "close", "open"])
+
+
+def _share(ticker, figi, class_code="TQBR"):
+    return SimpleNamespace(
+        name=f"{ticker} share", ticker=ticker, class_code=class_code, figi=figi, uid=f"uid-{figi}",
+        min_price_increment=_quotation(0.01), lot=10, trading_status=0, api_trade_available_flag=True,
+        currency="rub", exchange="MOEX", buy_available_flag=True, sell_available_flag=True,
+        short_enabled_flag=False, klong=_quotation(2), kshort=_quotation(2)
+    )
+
+
+class InstrumentRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = Path(self.tmp.name) / "instruments.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @contextmanager
+    def _client(self):
+        def shares():
+            self.calls.append("shares")
+            return SimpleNamespace(instruments=[_share("SBER", "BBG004730N88"), _share("SBER", "SBERF", "SPBXM")])
+
+        def get_instrument_by(id_type, id):
+            self.calls.append(id)
+            if id != "USD000UTSTOM":
+                raise RequestError(grpc.StatusCode.NOT_FOUND, "instrument not found", None)
+            return SimpleNamespace(instrument=SimpleNamespace(**{**vars(_share("USDRUB", id, "CETS")), "instrument_type": "currency"}))
+
+        empty = lambda: SimpleNamespace(instruments=[])
+        yield SimpleNamespace(instruments=SimpleNamespace(
+            shares=shares, etfs=empty, bonds=empty, futures=empty, get_instrument_by=get_instrument_by
+        ))
+
+    def _registry(self):
+        registry = InstrumentRegistry(self._client, cache_path=self.cache_path)
+        self.addCleanup(registry.stop)
+        return registry
+
+    def test_lookups_are_served_from_memory(self):
+        registry = self._registry()
+
+        self.assertEqual(registry.get_by_ticker("SBER", "TQBR")["figi"], "BBG004730N88")
+        self.assertEqual(registry.get_by_ticker("SBER", "SPBXM")["figi"], "SBERF")
+        self.assertEqual(registry.get_by_figi("BBG004730N88")["name"], "SBER share")
+        self.assertEqual(registry.get_by_uid("uid-SBERF")["class_code"], "SPBXM")
+        self.assertEqual(self.calls, ["shares"])
+
+    def test_resolve_figis_looks_up_each_figi_once(self):
+        registry = self._registry()
+        registry._fetch_one = lambda id_type, figi: self.calls.append(figi)
+
+        resolved = registry.resolve_figis(["BBG004730N88", "BBG004730N88", "UNKNOWN", "UNKNOWN", ""])
+
+        self.assertEqual(resolved["BBG004730N88"]["ticker"], "SBER")
+        self.assertIsNone(resolved["UNKNOWN"])
+        self.assertEqual(self.calls, ["shares", "UNKNOWN"])
+
+    def test_fetched_instruments_and_misses_are_remembered(self):
+        registry = self._registry()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(registry._fetch_one, [InstrumentIdType.INSTRUMENT_ID_TYPE_FIGI] * 2, ["USD000UTSTOM"] * 2))
+        for _ in range(2):
+            registry.resolve_figis(["USD000UTSTOM", "GONE"])
+
+        self.assertEqual(len(registry._by_ticker_only["USDRUB"]), 1)
+        self.assertEqual(registry.get_by_ticker("USDRUB")["type"], "currency")
+        self.assertEqual(self.calls.count("GONE"), 1)
+        self.assertIsNone(registry.get_by_figi("GONE"))
+        self.assertEqual(self.calls.count("GONE"), 1)
+
+    def test_cold_start_from_disk(self):
+        self._registry().ensure_loaded()
+        registry = self._registry()
+
+        instrument = registry.get_by_ticker("SBER", "TQBR")
+        self.assertEqual(instrument["min_price_increment"], Decimal("0.01"))
+        self.assertEqual(self.calls, ["shares"])
+
+
+class PortfolioSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.provider = TinkoffMarketDataProvider("token", portfolio_ttl=60)
+        self.provider._connected = True
+        self.provider.account_id = "account"
+        self.fetched = []
+        self.provider._fetch_portfolio = lambda account_id: self.fetched.append(account_id) or {"positions": []}
+
+    def test_back_to_back_calls_share_one_fetch(self):
+        self.assertIs(self.provider.get_portfolio(), self.provider.get_portfolio())
+        self.assertEqual(self.fetched, ["account"])
+
+    def test_invalidate_forces_refetch(self):
+        self.provider.get_portfolio()
+        self.provider.invalidate_portfolio()
+        self.provider.get_portfolio()
+        self.assertEqual(self.fetched, ["account", "account"])
+
+
+class LastPricesTests(SimpleTestCase):
+    def setUp(self):
+        self.provider = TinkoffMarketDataProvider("token", price_ttl=60)
+        self.provider._connected = True
+        self.provider.account_id = "account"
+        self.calls = []
+
+        def get_last_prices(figi):
+            self.calls.append(list(figi))
+            time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            return SimpleNamespace(last_prices=[
+                SimpleNamespace(figi=f, price=_quotation(100), time=time) for f in figi if f != "UNKNOWN"
+            ])
+
+        services = SimpleNamespace(market_data=SimpleNamespace(get_last_prices=get_last_prices))
+
+        @contextmanager
+        def client():
+            yield services
+
+        self.provider._get_client = client
+
+    def test_one_rpc_for_many_symbols(self):
+        prices = self.provider.get_prices(["A", "B", "A", "UNKNOWN"])
+        self.assertEqual(self.calls, [["A", "B", "UNKNOWN"]])
+        self.assertEqual(set(prices), {"A", "B"})
+        self.assertEqual(prices["A"]["price"], Decimal(100))
+
+    def test_cached_prices_are_not_refetched(self):
+        self.provider.get_prices(["A", "UNKNOWN"])
+        self.provider.get_prices(["A", "B", "UNKNOWN"])
+        self.assertEqual(self.provider.get_price("B")["symbol"], "B")
+        self.assertEqual(self.calls, [["A", "UNKNOWN"], ["B"]])
+        with self.assertRaises(Exception):
+            self.provider.get_price("UNKNOWN")
+
+
+class _FakeMarketDataStream:
+    """Stands in for MarketDataStreamManager: records subscriptions and
+    replays responses pushed by the test"""
+
+    def __init__(self):
+        self.responses = queue.Queue()
+        self.subscribed = set()
+        self.last_price = SimpleNamespace(subscribe=self._subscribe, unsubscribe=self._unsubscribe)
+        self.candles = SimpleNamespace(subscribe=lambda instruments: None, unsubscribe=lambda instruments: None)
+
+    def _subscribe(self, instruments):
+        self.subscribed.update(instrument.figi for instrument in instruments)
+
+    def _unsubscribe(self, instruments):
+        self.subscribed.difference_update(instrument.figi for instrument in instruments)
+
+    def push_price(self, figi, price, second=0):
+        time = datetime(2024, 1, 1, 10, 0, second, tzinfo=timezone.utc)
+        self.responses.put(SimpleNamespace(last_price=SimpleNamespace(figi=figi, price=_quotation(price), time=time), candle=None))
+
+    def stop(self):
+        self.responses.put(None)
+
+    def __iter__(self):
+        while True:
+            response = self.responses.get(timeout=5)
+            if response is None:
+                return
+            yield response
+
+
+class MarketDataStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.stream = _FakeMarketDataStream()
+
+        @contextmanager
+        def open_stream():
+            yield self.stream
+
+        self.hub = MarketDataStreamHub(open_stream)
+        self.addCleanup(self.hub.stop)
+
+    def _wait(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail("condition not reached")
+
+    def test_watched_instruments_follow_stream_prices(self):
+        self.hub.watch(["A"])
+        self._wait(lambda: self.stream.subscribed == {"A"})
+        self.stream.push_price("A", 100, second=1)
+        self.stream.push_price("A", 99, second=0)
+        self._wait(lambda: self.hub.last_price("A") is not None)
+        self.assertEqual(self.hub.last_price("A")["price"], Decimal(100))
+
+        self.hub.unwatch(["A"])
+        self._wait(lambda: not self.hub.running)
+        self.assertEqual(self.stream.subscribed, set())
+        self.assertIsNone(self.hub.last_price("A"))
+
+    def test_event_stream_fans_out_updates(self):
+        provider = SimpleNamespace(is_connected=lambda: True, stream=self.hub)
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def authenticate(token):
+            return token == "secret"
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event: price" in message.get("body", b""):
+                disconnect.set()
+
+        async def run(query_string):
+            app = MarketDataEventStream(authenticate=authenticate, provider_source=lambda name: provider)
+            scope = {"type": "http", "method": "GET", "path": "/", "query_string": query_string, "headers": []}
+            task = asyncio.ensure_future(app(scope, receive, send))
+            if query_string.startswith(b"token=secret"):
+                await asyncio.get_event_loop().run_in_executor(None, self._wait, lambda: self.stream.subscribed == {"A"})
+                self.stream.push_price("A", 101)
+            await asyncio.wait_for(task, 5)
+
+        asyncio.run(run(b"token=wrong&symbols=A"))
+        self.assertEqual(sent[0]["status"], 401)
+
+        sent.clear()
+        asyncio.run(run(b"token=secret&symbols=A"))
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn(b'"price": "101"', b"".join(message.get("body", b"") for message in sent))
+        self._wait(lambda: not self.hub.watched())
+
+
+    def test_stream_closed_by_server_reconnects_with_backoff(self):
+        opened = []
+
+        @contextmanager
+        def open_stream():
+            opened.append(time.monotonic())
+            stream = _FakeMarketDataStream()
+            stream.stop()
+            yield stream
+
+        hub = MarketDataStreamHub(open_stream, backoff_base=0.2)
+        self.addCleanup(hub.stop)
+        hub.watch(["A"])
+        threading.Event().wait(0.5)
+        hub.unwatch(["A"])
+        self._wait(lambda: not hub.running)
+
+        # 0.2s then 0.4s between reconnects, not a tight loop
+        self.assertLessEqual(len(opened), 3)
+
+    def test_watch_after_the_stream_thread_exits_restarts_it(self):
+        for _ in range(3):
+            self.hub.watch(["A"])
+            self._wait(lambda: self.stream.subscribed == {"A"})
+            self.hub.unwatch(["A"])
+            self._wait(lambda: self.hub._thread is None)
+            self.assertFalse(self.hub.running)
+
+
+class RollingWindowStatsTests(SimpleTestCase):
+    def test_matches_recomputation_over_window(self):
+        rng = np.random.default_rng(7)
+        stats = RollingWindowStats("A", window=600)
+        candles = {}
+        for step in range(400):
+            minute = 60 * (step // 2)
+            low = Decimal(int(rng.integers(50, 100)))
+            high = low + Decimal(int(rng.integers(0, 20)))
+            candle = (minute, low, high, low, high, int(rng.integers(1, 100)))
+            # Every candle is sent twice, the second time as a revision
+            candles[minute] = candle
+            stats.apply_candle(*candle)
+
+            now = minute + 30
+            window = [c for t, c in sorted(candles.items()) if t >= now - 600]
+            result = stats.stats(now=now)
+            self.assertEqual(result["openPrice"], window[0][1])
+            self.assertEqual(result["closePrice"], window[-1][4])
+            self.assertEqual(result["highPrice"], max(c[2] for c in window))
+            self.assertEqual(result["lowPrice"], min(c[3] for c in window))
+            self.assertEqual(result["volume"], sum(c[5] for c in window))
+
+    def test_trades_update_current_bucket(self):
+        stats = RollingWindowStats("A")
+        stats.apply_candle(0, Decimal(10), Decimal(12), Decimal(9), Decimal(11), 5)
+        stats.apply_trade(30, Decimal(13), 2)
+        stats.apply_trade(75, Decimal(8))
+        result = stats.stats(now=100)
+        self.assertEqual((result["highPrice"], result["lowPrice"], result["closePrice"]), (Decimal(13), Decimal(8), Decimal(8)))
+        self.assertEqual(result["volume"], 7)
+        self.assertEqual(result["priceChange"], Decimal(-2))
+        self.assertIsNone(stats.stats(now=DAY + 100))
+
+
+class DailyStatsTests(SimpleTestCase):
+    def setUp(self):
+        self.provider = TinkoffMarketDataProvider("token", stats_ttl=60)
+        self.provider._connected = True
+        self.provider.account_id = "account"
+        self.requests = []
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+        def get_candles(figi, from_, to, interval):
+            self.requests.append((figi, interval))
+            return SimpleNamespace(candles=[
+                SimpleNamespace(time=start, open=_quotation(10), high=_quotation(12), low=_quotation(9), close=_quotation(11), volume=5)
+            ])
+
+        services = SimpleNamespace(market_data=SimpleNamespace(get_candles=get_candles))
+
+        @contextmanager
+        def client():
+            yield services
+
+        self.provider._get_client = client
+        self.start = start.timestamp()
+
+    def test_stats_are_served_from_memory_and_follow_the_stream(self):
+        self.assertEqual(self.provider.get_daily_stats("A")["closePrice"], Decimal(11))
+        self.provider._update_daily_stats({
+            "type": "candle", "symbol": "A", "time": self.start + 60,
+            "open": Decimal(11), "high": Decimal(15), "low": Decimal(11), "close": Decimal(14), "volume": 3
+        })
+        stats = self.provider.get_daily_stats("A")
+        self.assertEqual((stats["highPrice"], stats["closePrice"], stats["volume"]), (Decimal(15), Decimal(14), 8))
+        self.assertEqual(self.requests, [("A", CandleInterval.CANDLE_INTERVAL_HOUR)])
+
+    def test_watched_instruments_are_seeded_with_minute_candles(self):
+        with mock.patch.object(self.provider.stream, "watched", return_value={"B"}):
+            self.provider.get_daily_stats("B")
+
+        self.assertEqual(self.requests, [("B", CandleInterval.CANDLE_INTERVAL_1_MIN)])
+
+
+@contextmanager
+def _counting_flight_waiters():
+    """Collects the SingleFlight callers that are waiting for another caller's result"""
+    waiting = []
+
+    class Event(threading.Event):
+        def wait(self, timeout=None):
+            waiting.append(self)
+            return super().wait(timeout)
+
+    def flight_init(flight):
+        flight.done, flight.result, flight.error = Event(), None, None
+
+    with mock.patch.object(scheduler_module._Flight, "__init__", flight_init):
+        yield waiting
+
+
+class RequestSchedulerTests(SimpleTestCase):
+    def test_interactive_requests_overtake_queued_background_ones(self):
+        scheduler = RequestScheduler(limits={"market_data": 600})
+        bucket = scheduler._group("market_data").bucket
+        bucket._tokens = 0
+        bucket.rate = 20.0
+        order = []
+
+        def request(name, priority):
+            scheduler.call("market_data", order.append, name, priority=priority)
+
+        threads = [threading.Thread(target=request, args=(f"background-{i}", RequestScheduler.BACKGROUND)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        self._wait_for_queue(scheduler, 3)
+        interactive = threading.Thread(target=request, args=("interactive", RequestScheduler.INTERACTIVE))
+        interactive.start()
+        for thread in threads + [interactive]:
+            thread.join(5)
+
+        self.assertEqual(order[0], "interactive")
+        self.assertEqual(scheduler.metrics()["market_data"]["requests"], 4)
+
+    def test_identical_reads_are_coalesced_through_services_proxy(self):
+        scheduler = RequestScheduler()
+        release = threading.Event()
+        calls = []
+
+        class Services:
+            market_data = SimpleNamespace(get_last_prices=lambda figi: calls.append(figi) or release.wait(5) and len(calls))
+
+            def last_prices_twice(self, figi):
+                return self.market_data.get_last_prices(figi=figi)
+
+        client = scheduler.wrap(Services())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.last_prices_twice(["A"]))) for _ in range(3)]
+        with _counting_flight_waiters() as waiting:
+            for thread in threads:
+                thread.start()
+            for _ in range(500):
+                if len(waiting) == 2:
+                    break
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(calls, [["A"]])
+        self.assertEqual(results, [1, 1, 1])
+        self.assertEqual(scheduler.metrics()["market_data"]["coalesced"], 2)
+
+    def test_quota_is_split_between_processes(self):
+        scheduler = RequestScheduler(limits={"market_data": 600}, default_limit=90, processes=3)
+        scheduler.call("market_data", lambda: None)
+        scheduler.call("users", lambda: None)
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["market_data"]["limit_per_minute"], 200)
+        self.assertEqual(metrics["users"]["limit_per_minute"], 30)
+        self.assertAlmostEqual(scheduler._group("market_data").bucket.rate, 200 / 60)
+
+    def _wait_for_queue(self, scheduler, depth):
+        for _ in range(500):
+            metrics = scheduler.metrics().get("market_data")
+            if metrics and metrics["queue_depth"] == depth:
+                return
+            threading.Event().wait(0.01)
+        self.fail("scheduler queue did not settle")
+
+
+class CandleFetchCoalescingTests(SimpleTestCase):
+    def test_concurrent_identical_fetches_share_one_request(self):
+        release = threading.Event()
+        calls = []
+        series = _series([10.0, 11.0, 12.0], 3)
+
+        def fetch_candles(client, figi, from_date, to_date, interval):
+            calls.append(figi)
+            release.wait(5)
+            return series
+
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(analysis.get_tinkoff_market_data("FIGI", start, client=object())))
+            for _ in range(3)
+        ]
+        with mock.patch.object(analysis, "_fetch_candles", fetch_candles), _counting_flight_waiters() as waiting:
+            for thread in threads:
+                thread.start()
+            for _ in range(500):
+                if len(waiting) == 2:
+                    break
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+            self.assertEqual(calls, ["FIGI"])
+            self.assertTrue(all(result is series for result in results))
+
+            analysis.get_tinkoff_market_data("FIGI", start, client=object())
+            self.assertEqual(calls, ["FIGI", "FIGI"])
+
+
+def _moscow(value):
+    return int(MOEX_TIMEZONE.localize(datetime.strptime(value, "%Y-%m-%d %H:%M")).timestamp())
+
+
+def _hourly(start, end):
+    times = np.arange(_moscow(start), _moscow(end), 3600)
+    index = np.arange(len(times), dtype=np.float64)
+    return CandleSeries(times, index, index + 10, index - 10, index + 0.5, np.ones(len(times)), np.ones(len(times), dtype=bool))
+
+
+class ResampleTests(SimpleTestCase):
+    def test_parse_timeframe(self):
+        self.assertEqual(parse_timeframe("1hour"), parse_timeframe("1h"))
+        self.assertEqual(str(parse_timeframe("3d")), "3day")
+        self.assertEqual(parse_timeframe("1month").seconds, None)
+        for invalid in ("", "2y", "25hour", "0min"):
+            with self.assertRaises(ValueError):
+                parse_timeframe(invalid)
+        self.assertEqual(analysis.resolve_timeframe("bogus"), parse_timeframe(analysis.DEFAULT_TIMEFRAME))
+
+    def test_intraday_buckets_restart_at_moscow_midnight(self):
+        series = _hourly("2024-03-04 18:00", "2024-03-05 03:00")
+
+        result = resample(series, "5h", until=_moscow("2024-03-06 00:00"))
+
+        self.assertEqual(result.time.tolist(), [_moscow("2024-03-04 15:00"), _moscow("2024-03-04 20:00"), _moscow("2024-03-05 00:00")])
+        self.assertEqual(result.open.tolist(), [0, 2, 6])
+        self.assertEqual(result.close.tolist(), [1.5, 5.5, 8.5])
+        self.assertEqual(result.high.tolist(), [11, 15, 18])
+        self.assertEqual(result.low.tolist(), [-10, -8, -4])
+        self.assertEqual(result.volume.tolist(), [2, 4, 3])
+
+    def test_week_and_month_buckets(self):
+        days = np.arange(_moscow("2024-01-01 07:00"), _moscow("2024-03-01 07:00"), DAY)
+        series = CandleSeries(days, np.ones(len(days)), np.ones(len(days)), np.ones(len(days)), np.ones(len(days)), np.ones(len(days)), np.ones(len(days), dtype=bool))
+
+        weeks = resample(series, "1week", until=_moscow("2024-03-01 07:00"))
+        months = resample(series, "1month", until=_moscow("2024-03-01 07:00"))
+
+        self.assertEqual(weeks.time[0], _moscow("2024-01-01 00:00"))
+        self.assertTrue(np.all(np.diff(weeks.time) == 7 * DAY))
+        self.assertEqual(months.time.tolist(), [_moscow("2024-01-01 00:00"), _moscow("2024-02-01 00:00")])
+        self.assertEqual(months.volume.tolist(), [31, 29])
+        self.assertFalse(weeks.is_complete[-1])
+        self.assertTrue(months.is_complete.all())
+
+    def test_derived_timeframes_fetch_base_interval(self):
+        calls = []
+
+        def market_data(figi, from_date, to_date, interval, client=None):
+            calls.append((from_date, interval))
+            return _hourly("2024-01-01 00:00", "2024-01-02 00:00")
+
+        with mock.patch.object(analysis, "get_tinkoff_market_data", market_data):
+            series = analysis.get_candle_series(
+                "FIGI", datetime(2024, 1, 1, 3, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc),
+                parse_timeframe("4hour")
+            )
+
+        # 06:00 MSK moves back to the 04:00 MSK bucket start
+        self.assertEqual(calls, [(datetime(2024, 1, 1, 1, tzinfo=timezone.utc), CandleInterval.CANDLE_INTERVAL_HOUR)])
+        self.assertEqual(len(series), 6)
+        self.assertEqual(analysis.get_base_interval(parse_timeframe("1week"))[1], CandleInterval.CANDLE_INTERVAL_DAY)
+        self.assertEqual(analysis.get_base_interval(parse_timeframe("30min"))[1], CandleInterval.CANDLE_INTERVAL_15_MIN)
+
+
+BACKTEST_PARAMS = {
+    "ticker": "SBER",
+    "start_date": "2024-01-01",
+    "end_date": "2024-12-31",
+    "capital": 100000,
+    "risk_percent": 0.02,
+    "stop_loss_method": "weekly_minmax",
+    "take_profit_method": "weekly_minmax",
+}
+
+
+class BacktestJobQueueTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("trader", password="secret")
+
+    def test_jobs_are_claimed_once_in_order(self):
+        first = backtests.enqueue(self.user, BACKTEST_PARAMS)
+        second = backtests.enqueue(self.user, BACKTEST_PARAMS)
+
+        self.assertEqual(backtests.claim_next("host/0").id, first.id)
+        self.assertEqual(backtests.claim_next("host/1").id, second.id)
+        self.assertIsNone(backtests.claim_next("host/0"))
+        self.assertEqual(BacktestJob.objects.get(id=first.id).worker, "host/0")
+        self.assertEqual(backtests.pending_count(self.user), 2)
+
+    def test_run_job_stores_progress_and_result(self):
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        job = backtests.claim_next("host/0")
+        seen = []
+
+        def runner(params, progress):
+            progress(0.5)
+            seen.append(BacktestJob.objects.get(id=job.id).progress)
+            return {"summary": {"final_balance": 101000.0}, "trades": [], "balance_curve": []}
+
+        self.assertEqual(backtests.run_job(job, runner), BacktestJob.DONE)
+        job.refresh_from_db()
+        self.assertEqual(seen, [0.5])
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.result["summary"], {"final_balance": 101000.0})
+        self.assertIsNotNone(job.expires_date)
+
+    def test_failed_and_cancelled_jobs(self):
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        job = backtests.claim_next("host/0")
+
+        def broken(params, progress):
+            raise ValueError("no data")
+
+        self.assertEqual(backtests.run_job(job, broken), BacktestJob.FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.error, "no data")
+        self.assertIn("ValueError", job.trace)
+
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        job = backtests.claim_next("host/0")
+
+        def cancelled_midway(params, progress):
+            self.assertTrue(backtests.cancel(job))
+            progress(0.5)
+            self.fail("progress should raise once the job is cancelled")
+
+        self.assertEqual(backtests.run_job(job, cancelled_midway), BacktestJob.CANCELLED)
+        self.assertEqual(BacktestJob.objects.get(id=job.id).status, BacktestJob.CANCELLED)
+        self.assertFalse(backtests.cancel(job))
+
+    def test_interrupted_jobs_are_requeued_and_dead_workers_fail_theirs(self):
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        interrupted = backtests.claim_next("host/0")
+        crashed = backtests.claim_next("host/1")
+
+        self.assertEqual(backtests.jobs.release_worker_jobs(requeue=True, worker="host/0"), 1)
+        self.assertEqual(backtests.jobs.release_worker_jobs(requeue=False, prefix="host/"), 1)
+
+        self.assertEqual(BacktestJob.objects.get(id=interrupted.id).status, BacktestJob.QUEUED)
+        self.assertEqual(BacktestJob.objects.get(id=crashed.id).status, BacktestJob.FAILED)
+
+    def test_jobs_without_heartbeat_are_requeued(self):
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        alive = backtests.claim_next("host/0")
+        killed = backtests.claim_next("old-container/0")
+        later = BacktestJob.objects.get(id=killed.id).modified_date + timedelta(seconds=301)
+
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(backtests.heartbeat(["host/0"]), 1)
+        self.assertEqual(backtests.requeue_stale(300, now=later), 1)
+
+        self.assertEqual(BacktestJob.objects.get(id=alive.id).status, BacktestJob.RUNNING)
+        self.assertEqual(BacktestJob.objects.get(id=killed.id).status, BacktestJob.QUEUED)
+        self.assertEqual(backtests.pending_count(self.user), 2)
+
+    def test_supervisor_survives_failed_queries(self):
+        pool = worker.BacktestWorkerPool(size=1, poll_interval=0, host="host")
+        calls = []
+
+        def process(alive):
+            return SimpleNamespace(is_alive=lambda: alive, exitcode=-9, join=lambda timeout=None: None, terminate=lambda: None)
+
+        def start_worker(name):
+            # Connections closed before each fork
+            calls.append(("start", connections.close_all.call_count))
+            pool._processes[name] = process(alive=len(calls) > 1)
+
+        def evict_expired():
+            calls.append("evict")
+            if calls.count("evict") == 1:
+                raise RuntimeError("server closed the connection unexpectedly")
+            pool._stop_event.set()
+
+        with mock.patch.object(worker, "jobs", mock.Mock(evict_expired=evict_expired, release_worker_jobs=mock.Mock(return_value=0))), \
+                mock.patch.object(worker, "connections") as connections, \
+                mock.patch.object(worker, "close_old_connections"), \
+                mock.patch.object(worker.signal, "signal"), \
+                mock.patch.object(pool, "_start_worker", start_worker), \
+                self.assertLogs(worker.logger, "ERROR"):
+            pool.run()
+
+        self.assertEqual(calls, [("start", 1), ("start", 2), "evict", "evict"])
+
+    def test_expired_results_are_evicted(self):
+        backtests.enqueue(self.user, BACKTEST_PARAMS)
+        job = backtests.claim_next("host/0")
+        backtests.complete(job.id, {"summary": {}, "trades": [], "balance_curve": []})
+        queued = backtests.enqueue(self.user, BACKTEST_PARAMS)
+
+        job.refresh_from_db()
+        self.assertEqual(backtests.evict_expired(job.expires_date - timedelta(seconds=1)), 0)
+        self.assertEqual(backtests.evict_expired(job.expires_date), 1)
+        self.assertEqual(list(BacktestJob.objects.values_list("id", flat=True)), [queued.id])
+
+
+FAKE_BACKTEST_SERVICE = """
+imports = []
+imports.append(1)
+
+
+class TinkoffDataClient:
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+
+
+class ResultCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+
+
+def run_backtest(config, client=None, progress=None, cache=None):
+    progress(0.5)
+    return {"config": config, "client": client, "cache": cache}
+
+
+def cached_result(config, client, cache):
+    return {"cached": config["TICKER"]} if config["TICKER"] == "CACHED" else None
+"""
+
+
+class BacktestRunnerTests(SimpleTestCase):
+    def test_service_is_imported_once_and_gets_the_config(self):
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, "backtest_service.py").write_text(FAKE_BACKTEST_SERVICE)
+            progress = []
+            try:
+                with mock.patch.object(runner, "RISKMANAGEMENT_PATH", Path(directory)), \
+                        mock.patch.object(runner, "_service", None), mock.patch.object(runner, "_data_client", None), \
+                        mock.patch.object(runner, "_result_cache", None):
+                    first = runner.run_backtest(BACKTEST_PARAMS, progress.append)
+                    second = runner.run_backtest({**BACKTEST_PARAMS, "ticker": "GAZP"}, progress.append)
+                    cached = runner.run_backtest({**BACKTEST_PARAMS, "ticker": "CACHED"}, progress.append)
+                    service = runner.load_service()
+            finally:
+                sys.modules.pop("backtest_service", None)
+                sys.path.remove(directory)
+
+        self.assertEqual(service.imports, [1])
+        self.assertEqual(progress, [0.1, 0.5, 0.1, 0.5])
+        self.assertEqual(first["config"], runner.backtest_config(BACKTEST_PARAMS))
+        self.assertEqual(first["config"]["STOP_LOSS_METHOD"], "weekly_minmax")
+        self.assertEqual(second["config"]["TICKER"], "GAZP")
+        self.assertIs(first["client"], second["client"])
+        self.assertIs(first["client"].scheduler, runner.request_scheduler)
+        self.assertEqual(first["cache"].root, str(runner.BACKTEST_CACHE_PATH))
+        self.assertEqual(cached, {"cached": "CACHED"})
+
+    def test_missing_service_raises(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(runner, "RISKMANAGEMENT_PATH", Path(directory)), \
+                mock.patch.object(runner, "_service", None):
+            with self.assertRaisesRegex(RuntimeError, "Import error"):
+                runner.run_backtest(BACKTEST_PARAMS)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BacktestViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("trader", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submit_poll_and_cancel(self):
+        task_id = self.client.post("/api/backtest/", BACKTEST_PARAMS, format="json").json()["taskId"]
+
+        response = self.client.get(f"/api/backtest/{task_id}/").json()
+        self.assertEqual(response, {"status": "pending", "state": "queued", "progress": 0.0})
+
+        self.assertEqual(self.client.post(f"/api/backtest/{task_id}/cancel/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/backtest/{task_id}/").json()["status"], "cancelled")
+        self.assertEqual(self.client.post(f"/api/backtest/{task_id}/cancel/").status_code, 400)
+
+    def test_result_of_finished_job(self):
+        job = backtests.enqueue(self.user, BACKTEST_PARAMS)
+        backtests.claim_next("host/0")
+        backtests.complete(job.id, {"summary": {"trade_count": 3}, "trades": [], "balance_curve": []})
+
+        response = self.client.get(f"/api/backtest/{job.id}/").json()
+
+        self.assertEqual(response["status"], "done")
+        self.assertEqual(response["summary"], {"tradeCount": 3})
+
+    def test_validation_limits_and_ownership(self):
+        self.assertEqual(self.client.post("/api/backtest/", {"ticker": "SBER"}, format="json").status_code, 400)
+
+        for _ in range(views.BACKTEST_MAX_PENDING_PER_USER):
+            self.assertEqual(self.client.post("/api/backtest/", BACKTEST_PARAMS, format="json").status_code, 200)
+        self.assertEqual(self.client.post("/api/backtest/", BACKTEST_PARAMS, format="json").status_code, 429)
+
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user("other", password="secret"))
+        job = BacktestJob.objects.first()
+        self.assertEqual(other.get(f"/api/backtest/{job.id}/").status_code, 404)
+        self.assertEqual(other.get("/api/backtest/not-a-uuid/").status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AnalysisViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("analyst", password="secret"))
+
+    def test_batch_rejects_non_string_tickers(self):
+        response = self.client.post("/api/analysis/generate-batch/", {"tickers": [["SBER"]]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_ticker_data_uses_the_shared_default_range(self):
+        ranges = []
+
+        def get_candle_series(figi, from_date, to_date, timeframe, client=None):
+            ranges.append((from_date, to_date))
+            return _series([10.0, 11.0], 2)
+
+        with mock.patch.object(analysis, "get_ticker_figi", return_value="FIGI"), \
+                mock.patch.object(analysis, "get_candle_series", get_candle_series):
+            self.assertEqual(self.client.get("/api/analysis/ticker-data/", {"ticker": "SBER"}).status_code, 200)
+            self.assertEqual(self.client.get("/api/analysis/ticker-data/", {"ticker": "SBER", "start_date": "2024-13-01"}).status_code, 400)
+
+        start, _ = ranges[0]
+        self.assertEqual((start.hour, start.minute, start.second, start.microsecond), (0, 0, 0, 0))
+        self.assertEqual(start.tzinfo, timezone.utc)